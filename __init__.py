@@ -23,9 +23,24 @@ async def list_immediate_subdirectories_wrapper(request):
 
 @server.PromptServer.instance.routes.get('/jnodes_get_comfyui_subdirectory_images')
 async def get_comfyui_subdirectory_images_wrapper(request):
+    if request.rel_url.query.get("stream", "") == "true":
+        return await stream_comfyui_subdirectory_images(request)
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(None, lambda: get_comfyui_subdirectory_images_request(request))
 
+@server.PromptServer.instance.routes.get('/jnodes_search')
+async def search_media_index_wrapper(request):
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, lambda: search_media_index_request(request))
+
+@server.PromptServer.instance.routes.post('/jnodes_get_item_metadata')
+async def get_item_metadata_wrapper(request):
+    return await get_item_metadata_request(request)
+
+@server.PromptServer.instance.routes.get('/jnodes_metadata_blob')
+async def get_metadata_blob_wrapper(request):
+    return get_metadata_blob_request(request)
+
 @server.PromptServer.instance.routes.get('/jnodes_list_model_subdirectories')
 async def list_model_subdirectories_wrapper(request):
     loop = asyncio.get_event_loop()
@@ -44,6 +59,14 @@ async def save_model_user_info_wrapper(request):
 async def view_image_wrapper(request):
     return await view_image(request)
 
+@server.PromptServer.instance.routes.post("/jnodes_view_images_batch")
+async def view_images_batch_wrapper(request):
+    return await view_images_batch(request)
+
+@server.PromptServer.instance.routes.get("/jnodes_view_video_preview")
+async def view_video_preview_wrapper(request):
+    return await view_video_preview(request)
+
 @server.PromptServer.instance.routes.post("/jnodes_save_image_as_model_preview")
 async def save_image_as_model_preview_wrapper(request):
     return await save_image_as_model_preview(request)
@@ -62,8 +85,7 @@ async def request_open_file_manager_wrapper(request):
 
 @server.PromptServer.instance.routes.post('/jnodes_request_task_cancellation')
 async def request_task_cancellation_wrapper(request):
-    request_task_cancellation()
-    return web.json_response({"success": True})
+    return await request_task_cancellation_request(request)
 
 @server.PromptServer.instance.routes.post('/jnodes_find_files')
 async def find_files_wrapper(request):
@@ -104,7 +126,7 @@ async def delete_item_wrapper(request):
 @server.PromptServer.instance.routes.get('/jnodes_get_browser_video_extensions')
 def get_browser_video_extensions_wrapper(request):
     from .py.utils import ACCEPTED_BROWSER_VIDEO_EXTENSIONS
-    return web.json_response({"success": True, "extensions": ACCEPTED_BROWSER_VIDEO_EXTENSIONS})
+    return json_response({"success": True, "extensions": ACCEPTED_BROWSER_VIDEO_EXTENSIONS})
 
 @server.PromptServer.instance.routes.post('/jnodes_edit_image_metadata')
 async def edit_image_metadata_wrapper(request):
@@ -0,0 +1,378 @@
+"""
+Benchmark for the drawer's directory scan engine (GetSubdirectoryImages).
+
+Generates a synthetic output tree of images carrying ComfyUI-style prompt/workflow metadata and short video clips,
+then times every extraction strategy with no media index, an empty (cold) index and a populated (warm) index.
+Results are printed as a table and written as JSON so runs on different machines or commits can be compared.
+
+Run it with the Python environment ComfyUI uses, from anywhere:
+
+    python custom_nodes/ComfyUI-JNodes/benchmarks/benchmark_scan.py --images 5000 --videos 100 --output report.json
+
+The ComfyUI directory defaults to the one this custom node is installed in (see --comfyui-directory).
+Videos are made with ffmpeg from PATH or imageio-ffmpeg and are skipped if neither is available.
+The OS file cache isn't dropped between runs, so "cold" means cold for the media index, not for the disk.
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib
+import statistics
+import subprocess
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_FORMATS = ("png", "jpeg", "webp")
+VIDEO_FORMATS = ("mp4", "webm")
+INDEX_MODES = ("no_index", "cold_index", "warm_index")
+
+# Distinct files generated per format; the rest of the corpus are copies, which cost the same to scan
+TEMPLATES_PER_FORMAT = 4
+
+NODE_TYPES = [
+    "CheckpointLoaderSimple", "CLIPTextEncode", "KSampler", "VAEDecode", "EmptyLatentImage",
+    "LoraLoader", "SaveImage", "JNodes_SaveVideo", "ImageScale", "ControlNetApply",
+]
+
+PROMPT_WORDS = [
+    "masterpiece", "portrait", "landscape", "cinematic", "lighting", "detailed", "forest", "city", "night",
+    "sunset", "watercolor", "photograph", "bokeh", "dramatic", "soft", "vibrant", "mountain", "river",
+]
+
+def import_scan_engine(comfyui_directory):
+    """
+    Import the scan engine modules without running the custom node's __init__.py, which registers routes
+    on a PromptServer that doesn't exist outside of ComfyUI.
+    """
+    if comfyui_directory not in sys.path:
+        sys.path.insert(0, comfyui_directory)
+
+    package_name = "jnodes_benchmark_target"
+    package = types.ModuleType(package_name)
+    package.__path__ = [REPOSITORY_DIRECTORY]
+    sys.modules[package_name] = package
+
+    scan = importlib.import_module(f"{package_name}.py.server_backend_get_subdirectory_images")
+    media_index = importlib.import_module(f"{package_name}.py.server_backend_media_index")
+    scan_pool = importlib.import_module(f"{package_name}.py.server_backend_scan_pool")
+    return scan, media_index, scan_pool
+
+def make_workflow(node_count, rng):
+    """A workflow shaped like the ones ComfyUI embeds in its outputs."""
+    nodes = []
+    links = []
+    for node_id in range(1, node_count + 1):
+        node_type = rng.choice(NODE_TYPES)
+        widgets_values = [rng.randint(0, 2 ** 32), rng.choice(["euler", "dpmpp_2m", "uni_pc"]), round(rng.uniform(1, 12), 1)]
+        if node_type == "CLIPTextEncode":
+            widgets_values = [", ".join(rng.choice(PROMPT_WORDS) for _ in range(rng.randint(20, 60)))]
+
+        nodes.append({
+            "id": node_id,
+            "type": node_type,
+            "pos": [rng.randint(0, 3000), rng.randint(0, 2000)],
+            "size": [rng.randint(200, 500), rng.randint(80, 400)],
+            "flags": {},
+            "order": node_id,
+            "mode": 0,
+            "inputs": [{"name": "model", "type": "MODEL", "link": node_id * 2}],
+            "outputs": [{"name": "LATENT", "type": "LATENT", "links": [node_id * 2 + 1], "slot_index": 0}],
+            "properties": {"Node name for S&R": node_type},
+            "widgets_values": widgets_values,
+        })
+        if node_id > 1:
+            links.append([node_id * 2, node_id - 1, 0, node_id, 0, "MODEL"])
+
+    return {"last_node_id": node_count, "last_link_id": node_count * 2, "nodes": nodes, "links": links, "groups": [], "version": 0.4}
+
+def make_prompt(workflow):
+    """The API-format prompt matching a workflow."""
+    return {
+        str(node["id"]): {"class_type": node["type"], "inputs": {f"input_{index}": value for index, value in enumerate(node["widgets_values"])}}
+        for node in workflow["nodes"]
+    }
+
+def make_test_image(size, rng):
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((size, size))
+    noise = Image.effect_noise((size, size), rng.randint(10, 60))
+    return Image.merge("RGB", (gradient, noise, gradient.rotate(90)))
+
+def save_image_template(path, image_format, size, workflow_nodes, rng):
+    import piexif
+    import piexif.helper
+    from PIL.PngImagePlugin import PngInfo
+
+    workflow = make_workflow(workflow_nodes, rng)
+    prompt = make_prompt(workflow)
+    image = make_test_image(size, rng)
+
+    if image_format == "png":
+        pnginfo = PngInfo()
+        pnginfo.add_text("prompt", json.dumps(prompt))
+        pnginfo.add_text("workflow", json.dumps(workflow))
+        image.save(path, pnginfo=pnginfo, compress_level=4)
+    else:
+        # Stored the same way JNodes' own SaveVideo node stores metadata in WebP
+        user_comment = piexif.helper.UserComment.dump(json.dumps({"prompt": prompt, "workflow": workflow}), encoding="unicode")
+        exif_bytes = piexif.dump({"Exif": {piexif.ExifIFD.UserComment: user_comment}})
+        image.save(path, format=image_format.upper(), exif=exif_bytes, quality=90)
+
+def get_ffmpeg_path():
+    ffmpeg_path = shutil.which("ffmpeg")
+    if ffmpeg_path is None:
+        try:
+            from imageio_ffmpeg import get_ffmpeg_exe
+            ffmpeg_path = get_ffmpeg_exe()
+        except Exception:
+            pass
+    return ffmpeg_path
+
+def escape_ffmetadata_value(value):
+    return value.replace("\\", "\\\\").replace("\n", r"\n").replace(";", r"\;").replace("#", r"\#").replace("=", r"\=")
+
+def save_video_template(path, video_format, size, seconds, workflow_nodes, rng, ffmpeg_path):
+    workflow = make_workflow(workflow_nodes, rng)
+    metadata_path = f"{path}.ffmetadata"
+    with open(metadata_path, "w", encoding="utf-8") as metadata_file:
+        metadata_file.write(";FFMETADATA1\n")
+        metadata_file.write("comment=" + escape_ffmetadata_value(json.dumps({"prompt": make_prompt(workflow), "workflow": workflow})))
+
+    codec_arguments = ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+    if video_format == "webm":
+        codec_arguments = ["-c:v", "libvpx-vp9", "-b:v", "0", "-crf", "40", "-deadline", "realtime"]
+
+    try:
+        subprocess.run(
+            [ffmpeg_path, "-y", "-v", "error", "-i", metadata_path,
+             "-f", "lavfi", "-i", f"testsrc2=size={size}x{size}:rate=24", "-t", str(seconds),
+             "-map", "1:v", "-map_metadata", "0", *codec_arguments, path],
+            check=True, capture_output=True)
+    finally:
+        os.remove(metadata_path)
+
+def make_directory_tree(root, depth, fanout):
+    """Every directory of a tree with `fanout` subdirectories per level, `depth` levels below root."""
+    directories = [root]
+    level = [root]
+    for depth_index in range(depth):
+        next_level = []
+        for parent in level:
+            for child_index in range(fanout):
+                child = os.path.join(parent, f"level{depth_index}_{child_index}")
+                os.makedirs(child, exist_ok=True)
+                next_level.append(child)
+        directories.extend(next_level)
+        level = next_level
+    return directories
+
+def generate_corpus(root, args):
+    """Fill root with the synthetic tree. Returns a description of what was generated."""
+    rng = random.Random(args.seed)
+    os.makedirs(root, exist_ok=True)
+    template_directory = tempfile.mkdtemp(prefix="jnodes_templates_")
+
+    try:
+        templates = {}
+        for image_format in args.image_formats:
+            extension = "jpg" if image_format == "jpeg" else image_format
+            templates[extension] = []
+            for template_index in range(TEMPLATES_PER_FORMAT):
+                path = os.path.join(template_directory, f"template_{template_index}.{extension}")
+                save_image_template(path, image_format, args.image_size, args.workflow_nodes, rng)
+                templates[extension].append(path)
+
+        video_count = args.videos
+        ffmpeg_path = get_ffmpeg_path() if video_count > 0 else None
+        if video_count > 0 and ffmpeg_path is None:
+            print("ffmpeg not found (install it or imageio-ffmpeg), generating no videos")
+            video_count = 0
+
+        video_extensions = []
+        if video_count > 0:
+            for video_format in args.video_formats:
+                templates[video_format] = []
+                for template_index in range(min(TEMPLATES_PER_FORMAT, video_count)):
+                    path = os.path.join(template_directory, f"template_{template_index}.{video_format}")
+                    save_video_template(path, video_format, args.video_size, args.video_seconds, args.workflow_nodes, rng, ffmpeg_path)
+                    templates[video_format].append(path)
+                video_extensions.append(video_format)
+
+        image_extensions = [extension for extension in templates if extension not in video_extensions]
+        directories = make_directory_tree(root, args.depth, args.fanout)
+
+        total_bytes = 0
+        def place_copies(count, extensions, prefix):
+            nonlocal total_bytes
+            for file_index in range(count):
+                extension = extensions[file_index % len(extensions)]
+                template = templates[extension][file_index % len(templates[extension])]
+                directory = directories[file_index % len(directories)]
+                destination = os.path.join(directory, f"{prefix}_{file_index:07d}.{extension}")
+                shutil.copyfile(template, destination)
+                total_bytes += os.path.getsize(destination)
+
+        place_copies(args.images, image_extensions, "ComfyUI")
+        if video_extensions:
+            place_copies(video_count, video_extensions, "AnimateDiff")
+
+        return {
+            "path": root,
+            "images": args.images,
+            "videos": video_count,
+            "image_formats": image_extensions,
+            "video_formats": video_extensions,
+            "directories": len(directories),
+            "depth": args.depth,
+            "fanout": args.fanout,
+            "image_size": args.image_size,
+            "workflow_nodes": args.workflow_nodes,
+            "total_bytes": total_bytes,
+        }
+    finally:
+        shutil.rmtree(template_directory, ignore_errors=True)
+
+def time_scan(scan, media_index_module, corpus_root, strategy, index_mode, index_path):
+    """Run one full scan and return (seconds, number of records)."""
+    scanner = scan.GetSubdirectoryImages(corpus_root, True, use_index=False, strategy=strategy)
+
+    media_index = None
+    if index_mode != "no_index":
+        if index_mode == "cold_index" and os.path.exists(index_path):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(index_path + suffix):
+                    os.remove(index_path + suffix)
+        media_index = media_index_module.MediaIndex(index_path)
+        scanner.media_index = media_index
+
+    try:
+        start_time = time.perf_counter()
+        results = scanner.get_subdirectory_images()
+        return time.perf_counter() - start_time, len(results)
+    finally:
+        if media_index is not None:
+            media_index.close()
+
+def run_benchmark(args):
+    scan, media_index_module, scan_pool = import_scan_engine(args.comfyui_directory)
+
+    work_directory = tempfile.mkdtemp(prefix="jnodes_scan_benchmark_")
+    corpus_root = args.corpus or os.path.join(work_directory, "corpus")
+    index_path = os.path.join(work_directory, "media_index.sqlite3")
+
+    # "auto" learns from these runs, so keep it from reading or changing the timings of the real ComfyUI install
+    os.environ["JNODES_SCAN_TIMINGS"] = os.path.join(work_directory, "scan_timings.json")
+
+    try:
+        if args.corpus and os.path.isdir(args.corpus) and os.listdir(args.corpus):
+            print(f"Using existing corpus at {corpus_root}")
+            corpus = {"path": corpus_root, "generated": False}
+        else:
+            print(f"Generating {args.images} images and {args.videos} videos in {corpus_root}...")
+            start_time = time.perf_counter()
+            corpus = generate_corpus(corpus_root, args)
+            corpus["generated"] = True
+            print(f"Generated corpus in {time.perf_counter() - start_time:.1f}s")
+
+        report = {
+            "host": {
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "scan_worker_count": scan_pool.get_scan_worker_count(),
+            },
+            "corpus": corpus,
+            "repeat": args.repeat,
+            "results": [],
+            "summary": {},
+        }
+
+        if "processes" in args.strategies or "auto" in args.strategies:
+            # Started once per ComfyUI session, so keep it out of the scan timings
+            start_time = time.perf_counter()
+            scan_pool.get_scan_worker_pool()
+            report["host"]["scan_pool_startup_seconds"] = time.perf_counter() - start_time
+
+        for strategy in args.strategies:
+            report["summary"][strategy] = {}
+            for index_mode in args.index_modes:
+                timings = []
+                for repeat_index in range(args.repeat):
+                    # Warm runs need an index that a previous scan filled
+                    if index_mode == "warm_index" and repeat_index == 0:
+                        time_scan(scan, media_index_module, corpus_root, strategy, "cold_index", index_path)
+
+                    seconds, record_count = time_scan(scan, media_index_module, corpus_root, strategy, index_mode, index_path)
+                    timings.append(seconds)
+                    report["results"].append({
+                        "strategy": strategy,
+                        "index_mode": index_mode,
+                        "repeat": repeat_index,
+                        "seconds": seconds,
+                        "records": record_count,
+                        "records_per_second": record_count / seconds if seconds > 0 else None,
+                    })
+
+                median_seconds = statistics.median(timings)
+                report["summary"][strategy][index_mode] = {"median_seconds": median_seconds, "min_seconds": min(timings)}
+                print(f"{strategy:>10} {index_mode:>11}: median {median_seconds:8.3f}s  min {min(timings):8.3f}s  ({record_count} records)")
+
+        return report
+    finally:
+        scan_pool.reset_scan_worker_pool()
+        if not args.keep_corpus:
+            shutil.rmtree(work_directory, ignore_errors=True)
+        elif not args.corpus:
+            print(f"Kept corpus at {corpus_root}")
+
+def parse_list(value, allowed):
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    for item in items:
+        if item not in allowed:
+            raise argparse.ArgumentTypeError(f"'{item}' is not one of {', '.join(allowed)}")
+    return items
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the JNodes drawer directory scan engine on a synthetic corpus.")
+    parser.add_argument("--comfyui-directory", default=os.path.abspath(os.path.join(REPOSITORY_DIRECTORY, "..", "..")),
+                        help="The ComfyUI installation to import folder_paths and friends from (default: the one this node is installed in)")
+    parser.add_argument("--corpus", help="Directory for the corpus. Scanned as-is if it isn't empty, otherwise generated there and kept")
+    parser.add_argument("--keep-corpus", action="store_true", help="Keep the generated corpus instead of deleting it")
+    parser.add_argument("--images", type=int, default=2000, help="Number of images to generate")
+    parser.add_argument("--videos", type=int, default=20, help="Number of video clips to generate")
+    parser.add_argument("--image-formats", type=lambda value: parse_list(value, IMAGE_FORMATS), default=list(IMAGE_FORMATS))
+    parser.add_argument("--video-formats", type=lambda value: parse_list(value, VIDEO_FORMATS), default=list(VIDEO_FORMATS))
+    parser.add_argument("--image-size", type=int, default=256, help="Width and height of generated images")
+    parser.add_argument("--video-size", type=int, default=256, help="Width and height of generated videos")
+    parser.add_argument("--video-seconds", type=float, default=1.0, help="Length of generated videos")
+    parser.add_argument("--workflow-nodes", type=int, default=40, help="Nodes in each embedded workflow, which sets the metadata size")
+    parser.add_argument("--depth", type=int, default=2, help="Levels of subdirectories below the corpus root")
+    parser.add_argument("--fanout", type=int, default=3, help="Subdirectories per directory")
+    parser.add_argument("--strategies", type=lambda value: parse_list(value, ("auto", "sequential", "threads", "processes")),
+                        default=["sequential", "threads", "processes", "auto"])
+    parser.add_argument("--index-modes", type=lambda value: parse_list(value, INDEX_MODES), default=list(INDEX_MODES))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy and index mode; the median is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    report = run_benchmark(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f"Wrote report to {args.output}")
+
+if __name__ == "__main__":
+    main()
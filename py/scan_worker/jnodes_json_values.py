@@ -0,0 +1,104 @@
+# Conversion of extracted metadata to plain JSON types, and the JSON encoding used for records everywhere.
+# Lives next to jnodes_scan_worker.py so pool workers can normalize records before they're pickled back,
+# which means it may only depend on the standard library (and orjson, if installed).
+
+import re
+import json
+import math
+import numbers
+
+# orjson is optional; without it the json module is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Lone UTF-16 surrogates, e.g. from text chunks decoded with "surrogateescape". They can't be encoded as UTF-8.
+SURROGATE_PATTERN = re.compile(r'[\ud800-\udfff]')
+
+# Integers outside this range lose precision in JavaScript and can't be written by fast JSON encoders
+MAX_JSON_INTEGER = 2 ** 63 - 1
+
+def strip_surrogates(text):
+    """Remove lone surrogates from a string so it can be encoded as UTF-8."""
+    try:
+        text.encode("utf-8")
+        return text
+    except UnicodeEncodeError:
+        return SURROGATE_PATTERN.sub('', text)
+
+def decode_bytes_value(value):
+    """Bytes in metadata are almost always text (EXIF strings, PNG iTXt), so decode them rather than showing a repr."""
+    try:
+        return strip_surrogates(bytes(value).decode("utf-8").rstrip("\x00"))
+    except UnicodeDecodeError:
+        # Binary blobs such as MakerNote can be huge and are meaningless to the drawer
+        return f"<{len(value)} bytes>"
+
+def normalize_json_value(value):
+    """
+    Convert a metadata value to types that any JSON encoder accepts and that round-trip through the media index.
+
+    Tuples and sets become lists, bytes are decoded, rationals (such as PIL's IFDRational) become floats,
+    NaN and infinities become None, dictionary keys become strings and lone surrogates are removed from text.
+    Anything else unknown is converted with str().
+    """
+    if value is None or isinstance(value, bool):
+        return value
+
+    if isinstance(value, str):
+        return strip_surrogates(value)
+
+    if isinstance(value, dict):
+        return {
+            strip_surrogates(key) if isinstance(key, str) else str(key): normalize_json_value(nested_value)
+            for key, nested_value in value.items()
+        }
+
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [normalize_json_value(nested_value) for nested_value in value]
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return decode_bytes_value(value)
+
+    if isinstance(value, numbers.Integral):
+        value = int(value)
+        return value if -MAX_JSON_INTEGER <= value <= MAX_JSON_INTEGER else str(value)
+
+    if isinstance(value, numbers.Real):
+        try:
+            value = float(value)
+        except ZeroDivisionError: # Rationals with a zero denominator
+            return None
+        return value if math.isfinite(value) else None
+
+    return strip_surrogates(str(value))
+
+def dumps_json(value):
+    """
+    Encode a value as compact UTF-8 JSON bytes, with orjson when it is installed.
+
+    Values a JSON encoder can't write as they are (NaN, lone surrogates, bytes, non-string keys and so on,
+    e.g. from media index entries written by older versions) are converted with normalize_json_value and
+    encoded again, so the result is always valid JSON that browsers can parse directly.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError: # orjson.JSONEncodeError
+            return orjson.dumps(normalize_json_value(value))
+
+    try:
+        return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError): # ValueError includes UnicodeEncodeError
+        return json.dumps(normalize_json_value(value), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def loads_json(data):
+    """Decode JSON from bytes or str, with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass # e.g. NaN written by older versions, which only the json module accepts
+
+    return json.loads(data)
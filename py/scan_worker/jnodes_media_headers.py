@@ -0,0 +1,308 @@
+import os
+import json
+import zlib
+import struct
+
+import piexif
+import piexif.helper
+from PIL import Image, ExifTags
+
+# Text chunks and EXIF blocks larger than this are left to PIL rather than read here
+MAX_HEADER_METADATA_BYTES = 64 * 1024 * 1024
+
+# Compressed text chunks that would decompress to more than this are left to PIL too, so a small chunk can't expand without bound
+MAX_TEXT_CHUNK_BYTES = 64 * 1024 * 1024
+
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+
+class HeaderParseError(Exception):
+    """Raised when a file doesn't look like what its extension says, so the caller can fall back to PIL."""
+
+def _read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise HeaderParseError("Unexpected end of file")
+    return data
+
+def decode_exif_tags(exif_tags):
+    """
+    Map numeric EXIF tags to their names and, if UserComment holds JSON, return that JSON instead.
+    Mirrors what `extract_jpg_exif` does with `Image._getexif()`.
+    """
+    exif_data = {ExifTags.TAGS.get(tag, tag): value for tag, value in exif_tags.items()}
+    # Decode UserComment if it's JSON
+    if "UserComment" in exif_data:
+        try:
+            exif_data = json.loads(piexif.helper.UserComment.load(exif_data["UserComment"]))
+        except (json.JSONDecodeError, ValueError, TypeError):
+            pass
+    return exif_data
+
+def decode_exif_block(exif_bytes):
+    """Decode a raw EXIF block (with or without the 'Exif\\0\\0' prefix) into named tags."""
+    try:
+        exif = Image.Exif()
+        exif.load(exif_bytes)
+
+        # Like Image._getexif, merge the primary IFD with the Exif sub-IFD where UserComment lives,
+        # and replace the GPS IFD's offset with its tags
+        exif_tags = dict(exif.items())
+        exif_tags.update(exif.get_ifd(EXIF_IFD_POINTER))
+        if GPS_IFD_POINTER in exif_tags:
+            exif_tags[GPS_IFD_POINTER] = exif.get_ifd(GPS_IFD_POINTER)
+    except (SyntaxError, KeyError, TypeError, OSError, ValueError, IndexError, struct.error) as e:
+        # PIL reports malformed TIFF structures with any of these
+        raise HeaderParseError(f"Malformed EXIF block: {e}") from e
+
+    return decode_exif_tags(exif_tags)
+
+def _decompress_text(data):
+    """Inflate a zTXt or compressed iTXt payload, up to MAX_TEXT_CHUNK_BYTES."""
+    decompressor = zlib.decompressobj()
+    text = decompressor.decompress(data, MAX_TEXT_CHUNK_BYTES)
+    if decompressor.unconsumed_tail:
+        raise HeaderParseError("PNG text chunk is too large once decompressed")
+    return text
+
+def read_png_header(file):
+    """
+    Read IHDR and the chunks before the first IDAT chunk that PIL puts in `Image.info`: text chunks, plus
+    pHYs ("dpi" or "aspect"), gAMA ("gamma") and eXIf ("exif"), converted the way PIL converts them.
+
+    Color chunks (iCCP, sRGB, cHRM), tRNS and APNG frame control are skipped, so unlike PIL's info the result
+    has no "icc_profile", "srgb", "chromaticity", "transparency" or animation keys. Nothing in the drawer uses them.
+    """
+    if _read_exactly(file, 8) != b"\x89PNG\r\n\x1a\n":
+        raise HeaderParseError("Not a PNG file")
+
+    dimensions = None
+    metadata = {}
+    metadata_bytes = 0
+
+    while True:
+        length, chunk_type = struct.unpack(">I4s", _read_exactly(file, 8))
+
+        if chunk_type in (b"IDAT", b"IEND"):
+            break
+
+        if chunk_type == b"IHDR":
+            data = _read_exactly(file, length)
+            file.seek(4, os.SEEK_CUR) # CRC
+            width, height = struct.unpack(">II", data[:8])
+            dimensions = [width, height]
+            if data[12]:
+                metadata["interlace"] = 1
+            continue
+
+        if chunk_type in (b"pHYs", b"gAMA"):
+            data = _read_exactly(file, length)
+            file.seek(4, os.SEEK_CUR) # CRC
+            if chunk_type == b"gAMA":
+                metadata["gamma"] = struct.unpack(">I", data[:4])[0] / 100000.0
+            else:
+                pixels_per_unit_x, pixels_per_unit_y, unit = struct.unpack(">IIB", data[:9])
+                if unit == 1: # Meter
+                    metadata["dpi"] = (pixels_per_unit_x * 0.0254, pixels_per_unit_y * 0.0254)
+                elif unit == 0:
+                    metadata["aspect"] = (pixels_per_unit_x, pixels_per_unit_y)
+            continue
+
+        if chunk_type not in (b"tEXt", b"zTXt", b"iTXt", b"eXIf"):
+            file.seek(length + 4, os.SEEK_CUR)
+            continue
+
+        metadata_bytes += length
+        if metadata_bytes > MAX_HEADER_METADATA_BYTES:
+            raise HeaderParseError("PNG text chunks are too large")
+
+        data = _read_exactly(file, length)
+        file.seek(4, os.SEEK_CUR) # CRC
+
+        if chunk_type == b"eXIf":
+            metadata["exif"] = b"Exif\x00\x00" + data
+            continue
+
+        keyword, _, value = data.partition(b"\x00")
+        keyword = keyword.decode("latin-1")
+
+        if chunk_type == b"tEXt":
+            metadata[keyword] = value.decode("latin-1")
+        elif chunk_type == b"zTXt":
+            # Compression method byte, then zlib data
+            metadata[keyword] = _decompress_text(value[1:]).decode("latin-1")
+        else:
+            compression_flag = value[0]
+            # Skip compression method, then the language tag and translated keyword
+            _, _, rest = value[2:].partition(b"\x00")
+            _, _, text = rest.partition(b"\x00")
+            if compression_flag:
+                text = _decompress_text(text)
+            metadata[keyword] = text.decode("utf-8")
+
+    if dimensions is None:
+        raise HeaderParseError("PNG is missing IHDR")
+
+    return dimensions, metadata
+
+# SOFn markers carry the frame dimensions; C4, C8 and CC share the range but are not frames
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def read_jpeg_header(file):
+    """Read segments up to the start of scan, collecting the frame size and the APP1 EXIF block."""
+    if _read_exactly(file, 2) != b"\xff\xd8":
+        raise HeaderParseError("Not a JPEG file")
+
+    dimensions = None
+    exif_bytes = None
+
+    while dimensions is None or exif_bytes is None:
+        marker_prefix = _read_exactly(file, 1)
+        if marker_prefix != b"\xff":
+            raise HeaderParseError("Invalid JPEG marker")
+
+        marker = _read_exactly(file, 1)[0]
+        while marker == 0xFF: # Fill bytes
+            marker = _read_exactly(file, 1)[0]
+
+        if marker == 0xD9 or marker == 0xDA: # End of image, start of scan
+            break
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01: # Markers without a length
+            continue
+
+        length = struct.unpack(">H", _read_exactly(file, 2))[0] - 2
+
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack(">BHH", _read_exactly(file, 5))
+            dimensions = [width, height]
+            file.seek(length - 5, os.SEEK_CUR)
+        elif marker == 0xE1 and exif_bytes is None:
+            data = _read_exactly(file, length)
+            if data.startswith(b"Exif\x00\x00"):
+                exif_bytes = data
+        else:
+            file.seek(length, os.SEEK_CUR)
+
+    if dimensions is None:
+        raise HeaderParseError("JPEG has no frame header before scan data")
+
+    return dimensions, decode_exif_block(exif_bytes) if exif_bytes else {}
+
+def read_webp_header(file):
+    """Read the RIFF chunk list, taking the canvas size from VP8X/VP8/VP8L and the EXIF chunk wherever it sits."""
+    riff, _, webp = struct.unpack("<4sI4s", _read_exactly(file, 12))
+    if riff != b"RIFF" or webp != b"WEBP":
+        raise HeaderParseError("Not a WebP file")
+
+    dimensions = None
+    exif_bytes = None
+    has_exif = True # Assume EXIF may be present until VP8X says otherwise
+
+    while True:
+        header = file.read(8)
+        if len(header) < 8:
+            break
+        chunk_type, length = struct.unpack("<4sI", header)
+        padded_length = length + (length & 1)
+
+        if chunk_type == b"VP8X":
+            data = _read_exactly(file, padded_length)
+            has_exif = bool(data[0] & 0x08)
+            width = int.from_bytes(data[4:7], "little") + 1
+            height = int.from_bytes(data[7:10], "little") + 1
+            dimensions = [width, height]
+        elif chunk_type == b"VP8 " and dimensions is None:
+            data = _read_exactly(file, 10)
+            width, height = struct.unpack("<HH", data[6:10])
+            dimensions = [width & 0x3FFF, height & 0x3FFF]
+            file.seek(padded_length - 10, os.SEEK_CUR)
+        elif chunk_type == b"VP8L" and dimensions is None:
+            data = _read_exactly(file, 5)
+            bits = int.from_bytes(data[1:5], "little")
+            dimensions = [(bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1]
+            file.seek(padded_length - 5, os.SEEK_CUR)
+        elif chunk_type == b"EXIF":
+            if length > MAX_HEADER_METADATA_BYTES:
+                raise HeaderParseError("WebP EXIF chunk is too large")
+            exif_bytes = _read_exactly(file, padded_length)[:length]
+        else:
+            file.seek(padded_length, os.SEEK_CUR)
+
+        if dimensions is not None and (exif_bytes is not None or not has_exif):
+            break
+
+    if dimensions is None:
+        raise HeaderParseError("WebP has no image chunk")
+
+    return dimensions, decode_exif_block(exif_bytes) if exif_bytes else {}
+
+def _read_gif_sub_blocks(file, keep):
+    data = bytearray()
+    while True:
+        size = _read_exactly(file, 1)[0]
+        if size == 0:
+            return bytes(data)
+        if keep:
+            data += _read_exactly(file, size)
+            if len(data) > MAX_HEADER_METADATA_BYTES:
+                raise HeaderParseError("GIF comment is too large")
+        else:
+            file.seek(size, os.SEEK_CUR)
+
+def read_gif_header(file):
+    """Read the logical screen descriptor and any comment extension that precedes the first frame."""
+    signature = _read_exactly(file, 6)
+    if signature not in (b"GIF87a", b"GIF89a"):
+        raise HeaderParseError("Not a GIF file")
+
+    width, height, flags = struct.unpack("<HHB", _read_exactly(file, 5))
+    file.seek(2, os.SEEK_CUR) # Background color index, pixel aspect ratio
+    if flags & 0x80: # Global color table
+        file.seek(3 * (2 ** ((flags & 0x07) + 1)), os.SEEK_CUR)
+
+    comment = None
+    while True:
+        block_type = file.read(1)
+        if block_type != b"\x21": # Image descriptor, trailer or end of file
+            break
+        label = _read_exactly(file, 1)[0]
+        data = _read_gif_sub_blocks(file, keep=label == 0xFE and comment is None)
+        if label == 0xFE and comment is None:
+            comment = data
+
+    if comment:
+        comment = comment.decode("utf-8")
+        try:
+            comment = json.loads(comment)
+        except json.JSONDecodeError:
+            pass # Return raw text if it's not JSON
+
+    return [width, height], {"comment": comment}
+
+HEADER_READERS = {
+    ".png": read_png_header,
+    ".jpg": read_jpeg_header,
+    ".jpeg": read_jpeg_header,
+    ".jfif": read_jpeg_header,
+    ".webp": read_webp_header,
+    ".gif": read_gif_header,
+}
+
+def read_image_header(full_path):
+    """
+    Get an image's dimensions and embedded metadata by reading only its headers.
+
+    Returns:
+        tuple: (dimensions, metadata) in the same shape `process_acceptable_item` builds from PIL,
+        or None if the format isn't handled here or the file is unusual, in which case PIL should be used.
+        PNG metadata leaves out a few of PIL's non-text keys, see `read_png_header`.
+    """
+    reader = HEADER_READERS.get(os.path.splitext(full_path)[1].lower())
+    if reader is None:
+        return None
+
+    try:
+        with open(full_path, "rb") as file:
+            return reader(file)
+    except (HeaderParseError, struct.error, zlib.error, UnicodeDecodeError, ValueError, IndexError):
+        return None
@@ -0,0 +1,300 @@
+# Metadata extraction for Image Drawer scans.
+# Scan pool workers import this without the rest of the JNodes package (see server_backend_scan_pool.py),
+# so it must only depend on the standard library, PIL, piexif and the other modules in this directory.
+# Importing the JNodes package here would pull ComfyUI, torch and friends into every worker.
+
+import os
+import json
+import shutil
+import logging
+import mimetypes
+import subprocess
+
+import piexif
+import piexif.helper
+from PIL import Image, ExifTags
+
+from .jnodes_media_headers import read_image_header
+from .jnodes_json_values import normalize_json_value
+
+logger = logging.getLogger("JNodes")
+
+mimetypes.add_type('image/webp', '.webp')
+
+# Minimal copies of helpers from utils.py, which can't be imported here
+def is_video(filename):
+    mime_type, _ = mimetypes.guess_type(filename)
+    return mime_type and mime_type.startswith("video")
+
+def get_file_extension_without_dot(filename):
+    _, extension = os.path.splitext(filename)
+    return extension[1:].lower()
+
+def get_creation_time(file_path):
+    """Get file creation time if available, otherwise fallback to modification time."""
+    try:
+        stat = os.stat(file_path)
+        return stat.st_birthtime  # Works on some Linux filesystems
+    except AttributeError:
+        return os.path.getmtime(file_path)
+
+def get_creation_time_from_stat(stat):
+    """Like get_creation_time, but for an existing stat result."""
+    return getattr(stat, "st_birthtime", stat.st_mtime)
+
+def process_acceptable_item_with_stats(args):
+    """Single-argument form of process_acceptable_item for executor maps: (item, current_subdirectory, full_path, file_stats)."""
+    return process_acceptable_item(*args)
+
+def process_item(item, full_directory, current_subdirectory):
+    """
+    Process a single file or directory item.
+    Callers are expected to have already filtered out files that can't be displayed in the browser.
+
+    Args:
+        item (str): The name of the file or directory.
+    """
+
+    full_path = os.path.join(full_directory, item)
+
+    if os.path.isfile(full_path):
+
+        return True, process_acceptable_item(item, current_subdirectory, full_path)
+            
+    return False, full_path, item
+
+def extract_png_metadata(img):
+    """Extracts PNG metadata."""
+    metadata = {}
+    if isinstance(img.info, dict):
+        for key, value in img.info.items():
+            metadata[key] = value
+    return metadata
+
+def extract_jpg_exif(img):
+    """Extracts EXIF metadata from JPG/WebP."""
+    exif_data = {}
+    try:
+        exif_raw = img._getexif()
+        if exif_raw:
+            exif_data = {ExifTags.TAGS.get(tag, tag): value for tag, value in exif_raw.items()}
+            # Decode UserComment if it's JSON
+            if "UserComment" in exif_data:
+                try:
+                    exif_data = json.loads(piexif.helper.UserComment.load(exif_data["UserComment"]))
+                except json.JSONDecodeError:
+                    pass
+    except Exception as e:
+        logger.warning(f"Unable to extract EXIF data: {e}")
+    return exif_data
+
+def extract_gif_comment(img):
+    """Extracts JSON metadata stored in a GIF comment, if available."""
+    try:
+        comment = img.info.get("comment", "").decode("utf-8")
+        return json.loads(comment) if comment else None
+    except (json.JSONDecodeError, AttributeError):
+        return comment  # Return raw text if it's not JSON
+
+_ffprobe_path = None
+_ffprobe_path_resolved = False
+
+def get_ffprobe_path():
+    """Locate ffprobe once per process. Returns None if it is not installed."""
+    global _ffprobe_path, _ffprobe_path_resolved
+    if not _ffprobe_path_resolved:
+        _ffprobe_path = shutil.which("ffprobe")
+        _ffprobe_path_resolved = True
+    return _ffprobe_path
+
+def parse_ffprobe_rate(rate):
+    """Convert an ffprobe rational such as '30000/1001' to a float, or -1 if unknown."""
+    try:
+        numerator, _, denominator = str(rate).partition("/")
+        value = float(numerator) / float(denominator or 1)
+        return value if value > 0 else -1
+    except (ValueError, ZeroDivisionError):
+        return -1
+
+def extract_video_metadata_from_ffprobe(probe):
+    """Extracts the JSON comment tag from parsed ffprobe output."""
+    metadata = {}
+    format_tags = probe.get("format", {}).get("tags", {})
+
+    # Containers disagree on tag case (e.g. "comment" in mp4, "COMMENT" in webm)
+    comment = next((value for key, value in format_tags.items() if key.lower() == "comment"), None)
+    if comment is not None:
+        try:
+            metadata = json.loads(comment)
+        except json.JSONDecodeError:
+            metadata["comment"] = comment
+
+    return metadata
+
+def probe_video(full_path):
+    """
+    Get video metadata and stream info with a single ffprobe run.
+
+    Returns:
+        dict: {"metadata", "dimensions", "frame_count", "fps"}, or None if ffprobe is unavailable or failed.
+    """
+    ffprobe_path = get_ffprobe_path()
+    if not ffprobe_path:
+        return None
+
+    result = subprocess.run(
+        [ffprobe_path, "-v", "error", "-select_streams", "v:0", "-show_format", "-show_streams", "-print_format", "json", full_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+
+    probe = json.loads(result.stdout)
+    streams = probe.get("streams", [])
+    if not streams:
+        return None
+    stream = streams[0]
+
+    fps = parse_ffprobe_rate(stream.get("avg_frame_rate"))
+    if fps <= 0:
+        fps = parse_ffprobe_rate(stream.get("r_frame_rate"))
+
+    # nb_frames is missing for some containers (webm), so estimate it from the duration
+    frame_count = int(stream.get("nb_frames", 0) or 0)
+    if frame_count <= 0:
+        try:
+            duration = float(stream.get("duration") or probe.get("format", {}).get("duration") or 0)
+        except ValueError:
+            duration = 0
+        frame_count = int(round(duration * fps)) if duration > 0 and fps > 0 else -1
+
+    return {
+        "metadata": extract_video_metadata_from_ffprobe(probe),
+        "dimensions": [int(stream.get("width", 0) or 0), int(stream.get("height", 0) or 0)],
+        "frame_count": frame_count,
+        "fps": fps,
+    }
+
+def extract_video_metadata(full_path):
+    """Extracts video metadata using ffprobe via subprocess."""
+    metadata = {}
+    try:
+        # Run ffprobe and capture JSON output
+        result = subprocess.run(
+            [get_ffprobe_path() or "ffprobe", "-v", "error", "-show_format", "-print_format", "json", full_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+        # Parse JSON output
+        metadata = extract_video_metadata_from_ffprobe(json.loads(result.stdout))
+    except Exception as e:
+        logger.warning(f"Unable to extract video metadata: {e}")
+
+    return metadata
+
+def probe_video_with_opencv(full_path):
+    """Fallback for probe_video when ffprobe is unavailable; opens the file with OpenCV for stream info."""
+    import cv2 # Only imported when needed, it is slow to load in every worker
+
+    probe = {"metadata": extract_video_metadata(full_path), "dimensions": [0, 0], "frame_count": -1, "fps": -1}
+
+    try: # Attempt on GPU first
+        cap = cv2.cudacodec.VideoReader(full_path)
+    except:
+        cap = cv2.VideoCapture(full_path)
+    if cap.isOpened():
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        probe["dimensions"] = [width, height]
+
+        probe["frame_count"] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        probe["fps"] = cap.get(cv2.CAP_PROP_FPS)
+
+        cap.release()
+
+    return probe
+
+def extract_image_metadata_with_pil(full_path):
+    """Fallback for read_image_header; opens the image with PIL to get its dimensions and metadata."""
+    metadata = {}
+    with Image.open(full_path) as img:
+        dimensions = img.size
+        ext = full_path.lower()
+
+        if ext.endswith(".png"):
+            metadata = extract_png_metadata(img)
+        elif ext.endswith(".jpg") or ext.endswith(".jpeg") or ext.endswith(".webp"):
+            metadata = extract_jpg_exif(img)
+        elif ext.endswith(".gif"):
+            metadata["comment"] = extract_gif_comment(img)
+
+    return dimensions, metadata
+
+def process_acceptable_item(item, current_subdirectory, full_path, file_stats=None):
+    """
+    Build the drawer record for an image or video.
+
+    Args:
+        file_stats (tuple): Optional (file_size, file_age) from a stat the caller already made, to avoid another one.
+    """
+    if file_stats is not None:
+        file_size, file_age = file_stats
+    else:
+        file_size = os.path.getsize(full_path)
+        file_age = get_creation_time(full_path)
+    dimensions = [0, 0]
+    is_video_item = is_video(item)
+    frame_count = -1
+    fps = -1
+
+    metadata_read = True
+    metadata = {}
+
+    try:
+        if is_video_item:
+            probe = None
+            try:
+                probe = probe_video(full_path)
+            except Exception as e:
+                logger.warning(f"Unable to probe video '{full_path}' with ffprobe: {e}")
+
+            if probe is None:
+                probe = probe_video_with_opencv(full_path)
+
+            metadata = probe["metadata"]
+            dimensions = probe["dimensions"]
+            frame_count = probe["frame_count"]
+            fps = probe["fps"]
+        else:
+            header = read_image_header(full_path)
+            if header is not None:
+                dimensions, metadata = header
+            else:
+                dimensions, metadata = extract_image_metadata_with_pil(full_path)
+
+        # Convert json-incompatible metadata (bytes, tuples, rationals, NaN, surrogates) once, here,
+        # so the media index and every response can encode records as they are
+        metadata = normalize_json_value(metadata)
+
+    except Exception as e:
+        metadata_read = False
+        logger.warning(f"Unable to get metadata for '{full_path}': {e}")
+
+    return {
+        'item': item,
+        'format': f"{'video' if is_video_item else 'image'}/{get_file_extension_without_dot(item)}",
+        "file_age": file_age, 
+        'file_size': file_size,
+        'dimensions': dimensions,
+        'is_video': is_video_item,
+        'metadata_read': metadata_read,
+        "subdirectory": current_subdirectory,
+        'metadata': metadata,
+        'frame_count': frame_count, 
+        'fps': fps, 
+        'duration_in_seconds': frame_count / fps if frame_count > 1 and fps > 1 else -1
+    }
\ No newline at end of file
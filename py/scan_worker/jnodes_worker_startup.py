@@ -0,0 +1,22 @@
+# Run by runpy in each scan pool worker as it starts, before it takes any task (see server_backend_scan_pool.py).
+# Tasks name their functions by module paths inside the JNodes package, which a fresh worker can't import:
+# ComfyUI loads custom nodes from their directories rather than through sys.path, and the package's __init__.py
+# needs a running ComfyUI server. Registering this directory as the package's scan_worker subpackage, under empty
+# stand-ins for the packages above it, lets those names resolve while importing nothing but the modules here.
+#
+# runpy passes in scan_worker_package_name, the subpackage's full module name in the parent process, and
+# startup_barrier, which holds every worker here until all of them have been spawned.
+
+import os
+import sys
+import types
+
+package_names = scan_worker_package_name.split(".")
+for depth in range(1, len(package_names) + 1):
+    package_name = ".".join(package_names[:depth])
+    if package_name not in sys.modules:
+        package = types.ModuleType(package_name)
+        package.__path__ = [os.path.dirname(os.path.abspath(__file__))] if depth == len(package_names) else []
+        sys.modules[package_name] = package
+
+startup_barrier.wait()
@@ -3,7 +3,21 @@ import re
 
 from .logger import *
 from .utils import *
-from .server_backend_get_subdirectory_images import GetSubdirectoryImages
+from .server_backend_get_subdirectory_images import GetSubdirectoryImages, read_item_records
+from .server_backend_listing_pages import *
+from .server_backend_media_index import get_media_index, tokenize_search_text
+from .server_backend_background_indexing import queue_background_indexing
+from .server_backend_watcher import start_drawer_watcher
+from .server_backend_jobs import job_manager
+from .server_backend_metadata_blobs import MetadataDeduplicator, metadata_blob_store
+from .server_backend_serialization import json_response, dumps_json, make_stream_compressor, normalize_json_value
+from .server_backend_directory_tree import directory_tree_cache
+from .server_backend_previews import PREVIEW_FORMATS, is_preview_request, is_negotiated_preview_request, parse_preview_parameters, encode_image_preview, encode_image_channel
+from .server_backend_image_work import run_image_work, parse_image_work_priority, USER_ACTION_IMAGE_WORK_PRIORITY, ImageWorkQueueFullError, ImageWorkAbandonedError
+from .server_backend_video_previews import VIDEO_PREVIEW_KINDS, get_ffmpeg_path, parse_video_preview_parameters, encode_video_preview
+from .server_backend_single_flight import single_flight
+from .server_backend_http_caching import VIEW_IMAGE_CACHE_CONTROL, get_cache_validators, is_not_modified, make_not_modified_response, make_ranged_response
+from .server_backend_thumbnail_cache import get_thumbnail_cache, make_thumbnail_cache_key
 from app.user_manager import UserManager
 
 import folder_paths
@@ -18,32 +32,47 @@ from io import BytesIO
 import piexif
 import piexif.helper
 
+import asyncio
+import functools
 import json
+import uuid
 import shutil
 
 from safetensors import safe_open
 
 from pathlib import Path
 
-CANCELLATION_REQUESTED = False
+def get_request_job_id(request):
+    """The job id a client chose for a long-running request, passed as the "job_id" query parameter."""
+    return request.rel_url.query.get("job_id") or None
 
-def should_cancel_task():
-    return CANCELLATION_REQUESTED
+def request_task_cancellation(job_id=None):
+    """Cancel the job with the given id, or every running job if no id is given."""
+    if job_id:
+        job_manager.cancel_job(job_id)
+    else:
+        job_manager.cancel_all_jobs()
 
-def request_task_cancellation():
-    global CANCELLATION_REQUESTED
-    CANCELLATION_REQUESTED = True
+async def request_task_cancellation_request(request):
+    """
+    Cancel a job by the "job_id" given in the query string or JSON body.
+    Requests without a job id cancel everything that's running.
+    """
+    job_id = request.rel_url.query.get("job_id")
+    if not job_id and request.can_read_body:
+        try:
+            job_id = (await request.json()).get("job_id")
+        except (json.JSONDecodeError, AttributeError):
+            pass
 
-def reset_cancellation():
-    global CANCELLATION_REQUESTED
-    CANCELLATION_REQUESTED = False
+    request_task_cancellation(job_id)
+    return json_response({"success": True, "job_id": job_id})
 
 async def read_web_request_content(reader):
     data = await reader.read()
     return data.decode('utf-8')
 
 def get_model_items(request):
-    reset_cancellation()
     type = "loras"
     if "type" in request.rel_url.query:
         type = request.rel_url.query["type"]
@@ -56,11 +85,12 @@ def get_model_items(request):
     image_extension_filter = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp4', '.webm'}
     info_extension_filter = {'.info', '.txt', '.json'}
     
-    familiar_dictionaries = create_familiar_dictionaries(file_list, type, image_extension_filter, info_extension_filter)
+    with job_manager.run_job("model_items", get_request_job_id(request)) as job:
+        familiar_dictionaries = create_familiar_dictionaries(file_list, type, image_extension_filter, info_extension_filter, job)
     #logger.info(familiar_dictionaries)
-    return web.json_response(familiar_dictionaries)
+    return json_response(familiar_dictionaries, request=request)
 
-def create_familiar_dictionaries(names, type, image_extension_filter, info_extension_filter):
+def create_familiar_dictionaries(names, type, image_extension_filter, info_extension_filter, job=None):
     """
     Makes a dictionary (key: item_name) containing a nested dictionary: a list of familiar images and a list of familiar info files.
     Intended for loras but can be used for other items with a similar setup.
@@ -99,10 +129,12 @@ def create_familiar_dictionaries(names, type, image_extension_filter, info_exten
         return metadata
 
     familiar_dictionaries = {}
-    for item_name in names:
+    for item_index, item_name in enumerate(names):
 
-        if should_cancel_task():
-            break
+        if job:
+            if job.should_cancel():
+                break
+            job.report_progress(len(names), item_index)
 
         item_name = item_name.replace("\\", "/")
         # logger.info(f"item_name: {item_name}")
@@ -117,10 +149,13 @@ def create_familiar_dictionaries(names, type, image_extension_filter, info_exten
 
             metadata = None
             try:
+                # Several drawers (or tabs) listing the same models at once read each file once
+                stat = os.stat(file_path)
+                flight_key = ("model_metadata", file_path, stat.st_mtime_ns, stat.st_size)
                 if item_name.endswith(".safetensors"):
-                    metadata = load_safetensors_metadata(file_path)
+                    metadata = single_flight.call(flight_key, load_safetensors_metadata, file_path)
                 else:
-                    metadata = load_pt_metadata(file_path)
+                    metadata = single_flight.call(flight_key, load_pt_metadata, file_path)
 
                 if metadata:
                     try: # Sorted dictionaries only available in py 3.7+
@@ -151,8 +186,8 @@ def create_familiar_dictionaries(names, type, image_extension_filter, info_exten
                     file_name_no_ext = split[len(split) - 1]
                     split.pop()
                     containing_directory = "/".join(split)
-            familiar_images = find_items_with_similar_names(parent_directory, containing_directory, file_name_no_ext, image_extension_filter)
-            familiar_infos = find_items_with_similar_names(parent_directory, containing_directory, file_name_no_ext, info_extension_filter, True)
+            familiar_images = find_items_with_similar_names(parent_directory, containing_directory, file_name_no_ext, image_extension_filter, job=job)
+            familiar_infos = find_items_with_similar_names(parent_directory, containing_directory, file_name_no_ext, info_extension_filter, True, job)
             # logger.info(f"familiar_images: {familiar_images}")
             
             familiar_dictionaries[file_name_no_ext] = {
@@ -169,7 +204,7 @@ def create_familiar_dictionaries(names, type, image_extension_filter, info_exten
         
     return familiar_dictionaries
     
-def find_items_with_similar_names(folder_path, containing_directory, base_name, extension_filter, load = False):
+def find_items_with_similar_names(folder_path, containing_directory, base_name, extension_filter, load = False, job = None):
     # logger.info(
     #     f'folder_path, containing_directory, base_name, extension_filter, load: {folder_path, containing_directory, base_name, extension_filter, load}'
     # )
@@ -177,7 +212,7 @@ def find_items_with_similar_names(folder_path, containing_directory, base_name,
     
     for file_name in os.listdir(folder_path):
 
-        if should_cancel_task():
+        if job and job.should_cancel():
             break
 
         # logger.info(f"file_name in directory: {file_name}")
@@ -198,67 +233,29 @@ def find_items_with_similar_names(folder_path, containing_directory, base_name,
     familiars.sort(key=lambda x: x["file_name"])
     return familiars
 
-def list_subdirectories_recursively(root_directory):
-    results = []
-
-    def walk_through_subdirectories(in_directory):
-        """
-        Recursively list subdirectories within the specified directory.
-
-        Args:
-            in_directory (str): The directory to process.
-        """
-        if should_cancel_task():
-            return
-
-        full_directory = os.path.join(root_directory, in_directory)
-        if not os.path.isdir(full_directory):
-            return
-
-        results.append(in_directory)
-            
-        items = os.listdir(full_directory)
-                
-        for item in items:
-            if os.path.isdir(os.path.join(full_directory, item)):
-                walk_through_subdirectories(os.path.join(in_directory, item))
-
-    walk_through_subdirectories("")
-
-    results = sorted(results)
-
-    return results
+def list_subdirectories_recursively(root_directory, job=None):
+    """List every directory under root_directory (including "" for itself), sorted, from the directory tree cache."""
+    paths, _ = directory_tree_cache.get_tree(root_directory, job)
+    return paths
 
 def list_immediate_subdirectories(root_directory):
-    results = []
-
-    if not os.path.isdir(root_directory):
-        return results
-            
-    items = os.listdir(root_directory)
-
-    for item in items:
-        combined_path = os.path.join(root_directory, item)
-        if os.path.isdir(combined_path):
-            results.append(item)
-
-    results = sorted(results)
-
-    return results
+    listing = directory_tree_cache.get_listing(root_directory)
+    return list(listing.subdirectories) if listing else []
 
 def list_comfyui_subdirectories_request(request):
-    reset_cancellation()
     try:
 
         root_directory = convert_relative_comfyui_path_to_full_path(request.rel_url.query["root_directory"])
 
-        results = list_subdirectories_recursively(root_directory)
+        with job_manager.run_job("list_subdirectories", get_request_job_id(request)) as job:
+            results, details = directory_tree_cache.get_tree(root_directory, job)
 
-        return web.json_response({"success": len(results) > 0, "payload": results })
+        # "details" maps each path to its media counts and sizes, directly inside it and including subdirectories
+        return json_response({"success": len(results) > 0, "payload": results, "details": details }, request=request)
 
     except Exception as e:
         log_exception("Error listing subdirectories:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 def list_immediate_subdirectories_request(request):
 
@@ -268,35 +265,366 @@ def list_immediate_subdirectories_request(request):
 
         results = list_immediate_subdirectories(root_directory)
 
-        return web.json_response({"success": len(results) > 0, "payload": results })
+        # Counts of the media files directly inside each subdirectory
+        details = {}
+        for subdirectory in results:
+            listing = directory_tree_cache.get_listing(os.path.join(root_directory, subdirectory))
+            if listing:
+                details[subdirectory] = {"media_count": listing.media_count, "media_bytes": listing.media_bytes}
+
+        return json_response({"success": len(results) > 0, "payload": results, "details": details })
 
     except Exception as e:
         log_exception("Error listing subdirectories:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 def list_model_subdirectories_request(request):
     try:
         type = request.rel_url.query.get("type", "loras")
         root_directory = convert_relative_comfyui_path_to_full_path(type)
         results = list_subdirectories_recursively(root_directory)
-        return web.json_response({"success": len(results) > 0, "payload": results})
+        return json_response({"success": len(results) > 0, "payload": results})
     except Exception as e:
         log_exception("Error listing model subdirectories:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
+
+# Listing record fields that come from a file's stat, so listings asking for nothing else never read file contents
+STAT_ONLY_LISTING_FIELDS = {'item', 'subdirectory', 'format', 'file_age', 'file_size', 'is_video'}
+
+# The most items one /jnodes_get_item_metadata request may ask for
+MAX_ITEM_METADATA_REQUEST_ITEMS = 1000
+
+def parse_listing_fields(fields):
+    """
+    Read a "fields" list (a comma separated string or a list) naming the record fields a client wants.
+    Returns None for full records. 'item' and 'subdirectory' are always included so records can be identified.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    fields = {field.strip() for field in fields or [] if field and field.strip()}
+    return fields | {'item', 'subdirectory'} if fields else None
+
+def project_record(record, fields):
+    """Keep only the requested fields of a listing record. Records are returned as-is when fields is None."""
+    if fields is None:
+        return record
+    return {key: value for key, value in record.items() if key in fields}
+
+def make_subdirectory_images_scanner(request, job, **kwargs):
+    root_directory = request.rel_url.query["root_directory"] or ""
+    selected_subdirectory = request.rel_url.query["selected_subdirectory"] or ""
+    recursive = request.rel_url.query["recursive"] == "true"
+    if request.rel_url.query.get("watch") == "true":
+        # Keep open drawers up to date with files written or deleted after this listing
+        start_drawer_watcher(root_directory, selected_subdirectory, recursive)
+    fields = parse_listing_fields(request.rel_url.query.get("fields"))
+    return GetSubdirectoryImages(
+        os.path.join(convert_relative_comfyui_path_to_full_path(root_directory), selected_subdirectory), recursive,
+        external_cancel_check=job.should_cancel, progress_callback=job.report_progress,
+        stat_only=fields is not None and fields <= STAT_ONLY_LISTING_FIELDS, unindexed_paths_callback=queue_background_indexing,
+        **kwargs)
+
+def make_metadata_deduplicator(request, fields):
+    """
+    With "dedupe_metadata=true", large metadata values such as workflows are replaced by hashes in listed records
+    and each distinct value is sent once under "metadata_blobs". Returns None when the client didn't ask for it,
+    or when the listed fields (see parse_listing_fields) leave metadata out so there's nothing to deduplicate.
+    """
+    if request.rel_url.query.get("dedupe_metadata") != "true" or (fields is not None and 'metadata' not in fields):
+        return None
+    return MetadataDeduplicator()
 
 def get_comfyui_subdirectory_images_request(request):
-    reset_cancellation()
+    if "limit" in request.rel_url.query or "cursor" in request.rel_url.query:
+        return get_comfyui_subdirectory_images_page_request(request)
+
+    try:
+        with job_manager.run_job("list_images", get_request_job_id(request)) as job:
+            results = make_subdirectory_images_scanner(request, job).get_subdirectory_images()
+
+        fields = parse_listing_fields(request.rel_url.query.get("fields"))
+        if fields is not None:
+            results = [project_record(record, fields) for record in results]
+
+        deduplicator = make_metadata_deduplicator(request, fields)
+        if deduplicator:
+            return json_response({
+                "success": True, "payload": deduplicator.deduplicate_records(results),
+                "metadata_blobs": deduplicator.blobs, "job_id": job.id }, request=request)
+
+        return json_response({"success": True, "payload": results, "job_id": job.id }, request=request)
+    except Exception as e:
+        log_exception("Error listing subdirectory images:", e)
+        return json_response({"success": False, "error": str(e)})
+
+def get_comfyui_subdirectory_images_page_request(request):
+    """
+    Paged variant of get_comfyui_subdirectory_images_request.
+
+    The first request (no cursor) scans the directory and keeps the results as a snapshot.
+    Following requests pass back "next_cursor" and are served from that snapshot without rescanning.
+    Query parameters: sort (see LISTING_SORT_KEYS), order ("asc" or "desc"), limit and cursor.
+    Pass the same "fields" with every page; sorting by a field that wasn't extracted sorts by its default value.
+    """
+    try:
+        query = request.rel_url.query
+        limit = min(max(int(query.get("limit", DEFAULT_LISTING_PAGE_SIZE)), 1), MAX_LISTING_PAGE_SIZE)
+
+        if "cursor" in query and query["cursor"]:
+            snapshot_id, sort, order, offset = decode_listing_cursor(query["cursor"])
+            snapshot = listing_snapshot_cache.get(snapshot_id)
+            if snapshot is None:
+                return json_response({"success": False, "cursor_expired": True, "error": "Listing cursor has expired"})
+        else:
+            sort = query.get("sort", DEFAULT_LISTING_SORT)
+            order = query.get("order", DEFAULT_LISTING_ORDER)
+            offset = 0
+            if sort not in LISTING_SORT_KEYS:
+                return json_response({"success": False, "error": f"Unsupported sort '{sort}'"})
+            if order not in ("asc", "desc"):
+                return json_response({"success": False, "error": f"Unsupported order '{order}'"})
+
+            with job_manager.run_job("list_images", get_request_job_id(request)) as job:
+                snapshot = listing_snapshot_cache.add(make_subdirectory_images_scanner(request, job).get_subdirectory_images())
+
+        page = snapshot.get_page(sort, order, offset, limit)
+        fields = parse_listing_fields(query.get("fields"))
+        next_offset = offset + len(page)
+        next_cursor = encode_listing_cursor(snapshot.id, sort, order, next_offset) if next_offset < len(snapshot.results) else None
+
+        response = {
+            "success": True,
+            "payload": [project_record(record, fields) for record in page],
+            "total": len(snapshot.results),
+            "offset": offset,
+            "next_cursor": next_cursor,
+        }
+
+        deduplicator = make_metadata_deduplicator(request, fields)
+        if deduplicator:
+            response["payload"] = deduplicator.deduplicate_records(response["payload"])
+            response["metadata_blobs"] = deduplicator.blobs
+
+        return json_response(response, request=request)
+    except Exception as e:
+        log_exception("Error listing subdirectory images:", e)
+        return json_response({"success": False, "error": str(e)})
+
+async def stream_comfyui_subdirectory_images(request):
+    """
+    Streaming variant of get_comfyui_subdirectory_images_request.
+    Writes newline-delimited JSON so the drawer can render items while the scan is still running.
+    Each line is {"type": "item", "payload": record}, and the stream ends with {"type": "end", "success": bool, "job_id": str}.
+    With "dedupe_metadata=true", each distinct large metadata value is sent once as {"type": "blob", "hash": str, "value": str}
+    before the first item that references it.
+    """
+    fields = parse_listing_fields(request.rel_url.query.get("fields"))
+    deduplicator = make_metadata_deduplicator(request, fields)
+
+    compressor = make_stream_compressor(request)
+    headers = {"Content-Type": "application/x-ndjson", "Cache-Control": "no-store", "Vary": "Accept-Encoding"}
+    if compressor:
+        headers["Content-Encoding"] = compressor.encoding
+
+    response = web.StreamResponse(headers=headers)
+    await response.prepare(request)
+
+    async def write_lines(lines, is_last=False):
+        data = b"\n".join(lines) + b"\n"
+        if compressor:
+            data = compressor.compress(data) + (compressor.finish() if is_last else b"")
+        await response.write(data)
+        if is_last:
+            await response.write_eof()
+
+    job = job_manager.start_job("list_images", get_request_job_id(request))
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    end_of_stream = object()
+    scan_status = {"success": True}
+
+    def on_result(record):
+        loop.call_soon_threadsafe(queue.put_nowait, record)
+
     try:
-        root_directory = request.rel_url.query["root_directory"] or ""
-        selected_subdirectory = request.rel_url.query["selected_subdirectory"] or ""
-        recursive = request.rel_url.query["recursive"] == "true"
-        results = GetSubdirectoryImages(
-            os.path.join(convert_relative_comfyui_path_to_full_path(root_directory), selected_subdirectory), recursive,
-            external_cancel_check=should_cancel_task).get_subdirectory_images()
-        return web.json_response({"success": True, "payload": results })
+        scanner = make_subdirectory_images_scanner(request, job, result_callback=on_result)
     except Exception as e:
         log_exception("Error listing subdirectory images:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        job_manager.finish_job(job)
+        await write_lines([dumps_json({"type": "end", "success": False, "error": str(e), "job_id": job.id})], is_last=True)
+        return response
+
+    def scan():
+        try:
+            scanner.get_subdirectory_images()
+        except Exception as e:
+            log_exception("Error listing subdirectory images:", e)
+            scan_status["success"] = False
+            scan_status["error"] = str(e)
+        finally:
+            job_manager.finish_job(job)
+            loop.call_soon_threadsafe(queue.put_nowait, end_of_stream)
+
+    loop.run_in_executor(None, scan)
+
+    try:
+        is_finished = False
+        while not is_finished:
+            # Wait for at least one record, then flush whatever else is ready in the same write
+            lines = []
+            record = await queue.get()
+            while True:
+                if record is end_of_stream:
+                    is_finished = True
+                    break
+                record = project_record(record, fields)
+                if deduplicator:
+                    record = deduplicator.deduplicate_record(record)
+                    for blob_hash, value in deduplicator.take_new_blobs().items():
+                        lines.append(dumps_json({"type": "blob", "hash": blob_hash, "value": value}))
+                lines.append(dumps_json({"type": "item", "payload": record}))
+                if queue.empty() or len(lines) >= 256:
+                    break
+                record = queue.get_nowait()
+
+            if lines:
+                await write_lines(lines)
+
+        await write_lines([dumps_json({"type": "end", **scan_status, "job_id": job.id})], is_last=True)
+    except (ConnectionResetError, asyncio.CancelledError):
+        # The client went away, stop scanning on its behalf
+        job.cancel()
+        raise
+
+    return response
+
+async def get_item_metadata_request(request):
+    """
+    Get the full records of specific files, e.g. ones listed with "fields" when the drawer needs their metadata.
+
+    The JSON body holds "root_directory", "items" (a list of {"subdirectory", "item"} relative to the root)
+    and optionally "fields". The payload lists one record per requested item, in order, or null for files
+    that don't exist. With "dedupe_metadata=true" in the query, large metadata values are sent once under
+    "metadata_blobs" like in listings (see make_metadata_deduplicator).
+    """
+    try:
+        body = await request.json()
+        root_directory = os.path.abspath(convert_relative_comfyui_path_to_full_path(body.get("root_directory") or "output"))
+        items = body.get("items") or []
+        fields = parse_listing_fields(body.get("fields"))
+
+        if len(items) > MAX_ITEM_METADATA_REQUEST_ITEMS:
+            return json_response(
+                {"success": False, "error": f"Too many items, at most {MAX_ITEM_METADATA_REQUEST_ITEMS} may be requested at once"})
+
+        full_paths = []
+        for entry in items:
+            item = entry.get("item") or ""
+            full_path = os.path.abspath(os.path.join(root_directory, entry.get("subdirectory") or "", item))
+
+            # Only files inside the root directory that the drawer could have listed may be read
+            try:
+                is_inside_root = os.path.commonpath([root_directory, full_path]) == root_directory
+            except ValueError: # Different drives
+                is_inside_root = False
+            if not is_inside_root or not is_acceptable_image_or_video_for_browser_display(item):
+                full_path = None
+            full_paths.append(full_path)
+
+        loop = asyncio.get_running_loop()
+        records = await loop.run_in_executor(None, lambda: read_item_records([path for path in full_paths if path]))
+
+        metadata_deduplicator = make_metadata_deduplicator(request, fields)
+
+        def make_response():
+            payload = []
+            for entry, full_path in zip(items, full_paths):
+                record = records.get(os.path.normpath(full_path)) if full_path else None
+                if record is not None:
+                    record = project_record({**record, "item": entry.get("item"), "subdirectory": entry.get("subdirectory") or ""}, fields)
+                    if metadata_deduplicator:
+                        record = metadata_deduplicator.deduplicate_record(record)
+                payload.append(record)
+
+            response = {"success": True, "payload": payload}
+            if metadata_deduplicator:
+                response["metadata_blobs"] = metadata_deduplicator.blobs
+            return json_response(response, request=request)
+
+        # Large batches are deduplicated, encoded and compressed off the event loop
+        return await loop.run_in_executor(None, make_response)
+    except Exception as e:
+        log_exception("Error getting item metadata:", e)
+        return json_response({"success": False, "error": str(e)})
+
+def get_metadata_blob_request(request):
+    """
+    Get one metadata value deduplicated out of a listing by its "hash".
+    Blobs are content addressed, so responses never change and can be cached indefinitely.
+    """
+    blob_hash = request.rel_url.query.get("hash", "")
+    value = metadata_blob_store.get(blob_hash)
+    if value is None:
+        return json_response({"success": False, "error": f"Unknown metadata blob '{blob_hash}'"}, status=404)
+
+    etag = f'"{blob_hash}"'
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "ETag": etag}
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers=headers)
+
+    return web.Response(text=value, content_type="text/plain", charset="utf-8", headers=headers)
+
+def search_media_index_request(request):
+    """
+    Search the metadata of previously scanned images and videos.
+
+    Query parameters: q (the search text), mode ("and" or "or"), root_directory, selected_subdirectory,
+    recursive, limit and offset. Words ending in '*' match by prefix.
+    Returns one page of matches, newest first, identified the same way as listing records (subdirectory + item).
+    """
+    try:
+        query = request.rel_url.query
+        media_index = get_media_index()
+        if media_index is None:
+            return json_response({"success": False, "error": "Media index is unavailable"})
+
+        query_tokens = []
+        for word in query.get("q", "").split():
+            tokens = tokenize_search_text(word)
+            if tokens:
+                query_tokens.extend(tokens[:-1])
+                query_tokens.append(tokens[-1] + "*" if word.endswith("*") else tokens[-1])
+
+        match_all = query.get("mode", "and").lower() != "or"
+        recursive = query.get("recursive", "true") == "true"
+        limit = min(max(int(query.get("limit", DEFAULT_LISTING_PAGE_SIZE)), 1), MAX_LISTING_PAGE_SIZE)
+        offset = max(int(query.get("offset", 0)), 0)
+
+        directory = os.path.normpath(os.path.join(
+            convert_relative_comfyui_path_to_full_path(query.get("root_directory", "") or "output"),
+            query.get("selected_subdirectory", "")))
+
+        paths, total = media_index.search(query_tokens, match_all, directory, recursive, limit, offset)
+
+        results = []
+        for path in paths:
+            subdirectory = os.path.relpath(os.path.dirname(path), directory)
+            results.append({
+                "item": os.path.basename(path),
+                "subdirectory": "" if subdirectory == "." else subdirectory.replace("\\", "/"),
+            })
+
+        next_offset = offset + len(paths)
+        return json_response({
+            "success": True,
+            "payload": results,
+            "total": total,
+            "next_offset": next_offset if next_offset < total else None,
+        }, request=request)
+    except Exception as e:
+        log_exception("Error searching media index:", e)
+        return json_response({"success": False, "error": str(e)})
 
 async def request_open_file_manager(request):
     try:
@@ -304,15 +632,16 @@ async def request_open_file_manager(request):
 
         if result["success"] == True:
             open_file_manager(os.path.normpath(result["payload"]["file"]))
-            return web.json_response({"success": True})
+            return json_response({"success": True})
     except Exception as e:
         logger.error(e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
-async def validate_and_return_file_from_request(request):
+def validate_and_return_file(query):
+    """Find the file named by "type", "subfolder" and "filename" in a query (or any mapping of the same parameters)."""
     type = "loras"
-    if "type" in request.rel_url.query:
-        type = request.rel_url.query["type"]
+    if "type" in query:
+        type = query["type"]
         
     base_dirs = None
     
@@ -333,12 +662,12 @@ async def validate_and_return_file_from_request(request):
     
     for base_dir in base_dirs:
         subfolder = ''
-        if "subfolder" in request.rel_url.query:
-            subfolder = request.rel_url.query["subfolder"]
+        if "subfolder" in query:
+            subfolder = query["subfolder"]
             base_dir = os.path.join(base_dir, subfolder)
         
-        if "filename" in request.rel_url.query:
-            filename = request.rel_url.query["filename"]
+        if "filename" in query:
+            filename = query["filename"]
 
             # validation for security: prevent accessing arbitrary path
             if filename[0] == '/' or filename.startswith('..') or filename.startswith('./'):
@@ -357,92 +686,244 @@ async def validate_and_return_file_from_request(request):
 
     return { "success": False, "response": 400 }
 
+async def validate_and_return_file_from_request(request):
+    return validate_and_return_file(request.rel_url.query)
+
+def is_request_abandoned(request):
+    """Whether the client that sent a request went away. aiohttp doesn't cancel handlers when that happens."""
+    transport = request.transport
+    return transport is None or transport.is_closing()
+
+async def load_cached_rendition(cache_key, extension, encode, priority=0, is_abandoned=None):
+    """
+    Get an encoded rendition of a file from the thumbnail cache, or make it with encode() on the image work pool
+    and cache it. Identical requests arriving while it's being made share the one result. Making it is queued by
+    priority, and dropped with ImageWorkAbandonedError if every request for it is abandoned before it starts.
+    """
+    def read_cached_rendition():
+        thumbnail_cache = get_thumbnail_cache() # The first call lists the cache directory, so it's kept off the event loop too
+        return thumbnail_cache.read(cache_key) if thumbnail_cache else None
+
+    async def load(is_abandoned=None):
+        body = await asyncio.get_running_loop().run_in_executor(None, read_cached_rendition)
+        if body is not None:
+            return body
+
+        def encode_and_cache():
+            body = encode()
+            thumbnail_cache = get_thumbnail_cache()
+            if thumbnail_cache:
+                thumbnail_cache.put(cache_key, body, extension)
+            return body
+
+        return await run_image_work(encode_and_cache, priority=priority, is_abandoned=is_abandoned)
+
+    return await single_flight.run(("rendition", cache_key), load, is_abandoned=is_abandoned)
+
+async def load_image_preview(file_path, parameters, cache_key, priority=0, is_abandoned=None):
+    """Get an encoded preview of an image. See load_cached_rendition."""
+    extension = PREVIEW_FORMATS[parameters["image_format"]][2]
+    encode = functools.partial(encode_image_preview, file_path, **parameters)
+    return await load_cached_rendition(cache_key, extension, encode, priority, is_abandoned)
+
+async def view_image_preview(request, file_path, filename):
+    """
+    Serve a re-encoded preview of an image, from the thumbnail cache when this rendition was made before.
+    Cache misses are encoded on the image work pool and stored for next time.
+    """
+    parameters = parse_preview_parameters(request.rel_url.query, request.headers.get("Accept"))
+    content_type = PREVIEW_FORMATS[parameters["image_format"]][1]
+
+    filename = filename.replace('"', '\\"')  # Escape double quotes
+    headers = {"Content-Disposition": f'filename="{filename}"'}
+    if is_negotiated_preview_request(request.rel_url.query):
+        headers["Vary"] = "Accept" # So browsers don't reuse a preview for a request that accepts other formats
+
+    stat = await asyncio.get_running_loop().run_in_executor(None, os.stat, file_path)
+    cache_key = make_thumbnail_cache_key(file_path, stat, **parameters)
+    headers.update(get_cache_validators(stat, cache_key))
+    if is_not_modified(request, headers["ETag"], stat):
+        return make_not_modified_response(headers)
+
+    try:
+        body = await load_image_preview(
+            file_path, parameters, cache_key, parse_image_work_priority(request.rel_url.query.get('priority')),
+            lambda: is_request_abandoned(request))
+    except (ImageWorkQueueFullError, ImageWorkAbandonedError):
+        return web.Response(status=503, headers={"Retry-After": "1"})
+
+    return make_ranged_response(request, body, content_type, headers)
+
 async def view_image(request):
+    """
+    Serve a file from one of ComfyUI's folders. Every response carries validators, so browsers revalidate
+    what they've cached and get 304 while the file is unchanged, and supports byte ranges for seeking.
+    Originals are served by FileResponse, which handles both itself.
+    Re-encoded images are queued by their "priority" parameter (see ImageWorkExecutor).
+    """
 
     result = await validate_and_return_file_from_request(request)
 
     if result["success"] == True:
-        if 'preview' in request.rel_url.query:
-            with Image.open(result["payload"]["file"]) as img:
-                preview_info = request.rel_url.query['preview'].split(';')
-                image_format = preview_info[0]
-                if image_format not in ['webp', 'jpeg', 'jpg'] or 'a' in request.rel_url.query.get('channel', ''):
-                    image_format = 'webp'
-
-                quality = 90
-                if preview_info[-1].isdigit():
-                    quality = int(preview_info[-1])
-
-                buffer = BytesIO()
-                if image_format in ['jpeg', 'jpg'] or request.rel_url.query.get('channel', '') == 'rgb':
-                    img = img.convert("RGB")
-                img.save(buffer, format=image_format, quality=quality)
-                buffer.seek(0)
-
-                filename = result["payload"]["filename"]
-                filename = filename.replace('"', '\\"')  # Escape double quotes
-
-                return web.Response(
-                    body=buffer.read(),
-                    content_type=f'image/{image_format}',
-                    headers={"Content-Disposition": f'filename="{filename}"'}
-                )
+        if is_preview_request(request.rel_url.query):
+            return await view_image_preview(request, result["payload"]["file"], result["payload"]["filename"])
 
         if 'channel' not in request.rel_url.query:
             channel = 'rgba'
         else:
             channel = request.rel_url.query["channel"]
 
-        if channel == 'rgb':
-            with Image.open(result["payload"]["file"]) as img:
-                if img.mode == "RGBA":
-                    r, g, b, a = img.split()
-                    new_img = Image.merge('RGB', (r, g, b))
-                else:
-                    new_img = img.convert("RGB")
-
-                buffer = BytesIO()
-                new_img.save(buffer, format='PNG')
-                buffer.seek(0)
-
-                filename = result["payload"]["filename"]
-                filename = filename.replace('"', '\\"')  # Escape double quotes
+        filename = result["payload"]["filename"]
+        filename = filename.replace('"', '\\"')  # Escape double quotes
+        headers = {"Content-Disposition": f'filename="{filename}"'}
 
-                return web.Response(
-                    body=buffer.read(),
-                    content_type=f'image/{image_format}',
-                    headers={"Content-Disposition": f'filename="{filename}"'}
-                )
+        if channel in ('rgb', 'a'):
+            file_path = result["payload"]["file"]
+            stat = await asyncio.get_running_loop().run_in_executor(None, os.stat, file_path)
+            cache_key = make_thumbnail_cache_key(file_path, stat, channel=channel)
+            headers.update(get_cache_validators(stat, cache_key))
+            if is_not_modified(request, headers["ETag"], stat):
+                return make_not_modified_response(headers)
 
-        elif channel == 'a':
-            with Image.open(result["payload"]["file"]) as img:
-                if img.mode == "RGBA":
-                    _, _, _, a = img.split()
-                else:
-                    a = Image.new('L', img.size, 255)
-
-                # alpha img
-                alpha_img = Image.new('RGBA', img.size)
-                alpha_img.putalpha(a)
-                alpha_buffer = BytesIO()
-                alpha_img.save(alpha_buffer, format='PNG')
-                alpha_buffer.seek(0)
-
-                filename = result["payload"]["filename"]
-                filename = filename.replace('"', '\\"')  # Escape double quotes
-
-                return web.Response(
-                    body=alpha_buffer.read(),
-                    content_type=f'image/{image_format}',
-                    headers={"Content-Disposition": f'filename="{filename}"'}
-                )
+            try:
+                body = await single_flight.run(
+                    ("rendition", cache_key), run_image_work, encode_image_channel, file_path, channel,
+                    priority=parse_image_work_priority(request.rel_url.query.get('priority')),
+                    is_abandoned=lambda: is_request_abandoned(request))
+            except (ImageWorkQueueFullError, ImageWorkAbandonedError):
+                return web.Response(status=503, headers={"Retry-After": "1"})
+
+            return make_ranged_response(request, body, 'image/png', headers)
         else:
-            filename = result["payload"]["filename"]
-            filename = filename.replace('"', '\\"')  # Escape double quotes
-            return web.FileResponse(result["payload"]["file"], headers={"Content-Disposition": f'filename="{filename}"'})
+            headers["Cache-Control"] = VIEW_IMAGE_CACHE_CONTROL
+            return web.FileResponse(result["payload"]["file"], headers=headers)
 
     return web.Response(status= result["response"] if result["response"] else 404)
 
+MAX_BATCH_PREVIEWS = 256
+
+async def view_images_batch(request):
+    """
+    Send the previews of many images in one response, so a client showing many tiles at once isn't a request each.
+
+    Takes {"items": [{"type", "subfolder", "filename", and any of /jnodes_view_image's preview parameters
+    ("w", "h", "fit", "preview", "channel")}], "priority", "accept"}, at most MAX_BATCH_PREVIEWS of them.
+    "accept" lists the image types auto previews may use, as an Accept header would.
+    Answers multipart/form-data with one part per preview named by its index in items, so browsers can read it
+    with Response.formData(). Previews are made in parallel on the image work pool and come from the thumbnail
+    cache when warm. Each part is written as soon as its preview is ready, in the order they finish, so the
+    response isn't held back by the slowest one. Items that can't be found or encoded are left out.
+    Responses can't be cached, so previews a browser shows again are better loaded from /jnodes_view_image.
+    """
+    try:
+        request_json = json.loads(await read_web_request_content(request.content))
+        items = request_json.get("items", [])
+        if not isinstance(items, list) or len(items) > MAX_BATCH_PREVIEWS:
+            return json_response({"success": False, "error": f"Expected a list of at most {MAX_BATCH_PREVIEWS} items"}, status=400)
+
+        priority = parse_image_work_priority(request_json.get("priority"))
+
+        # The Accept header of a batch is about the multipart response, so the formats previews may use come in the body
+        accept_header = request_json.get("accept")
+    except Exception as e:
+        log_exception("Error loading previews:", e)
+        return json_response({"success": False, "error": str(e)})
+
+    is_abandoned = lambda: is_request_abandoned(request)
+    loop = asyncio.get_running_loop()
+
+    def find_item(query):
+        result = validate_and_return_file(query)
+        if result["success"] != True:
+            return None
+        file_path = result["payload"]["file"]
+        return file_path, os.stat(file_path)
+
+    async def load_item(index, item):
+        if not isinstance(item, dict):
+            return None
+        query = {key: str(value) for key, value in item.items() if value is not None}
+        try:
+            found = await loop.run_in_executor(None, find_item, query)
+            if found is None:
+                return None
+            file_path, stat = found
+            parameters = parse_preview_parameters(query, accept_header)
+            cache_key = make_thumbnail_cache_key(file_path, stat, **parameters)
+            return index, parameters, await load_image_preview(file_path, parameters, cache_key, priority, is_abandoned)
+        except (ImageWorkQueueFullError, ImageWorkAbandonedError):
+            return None
+        except Exception as e:
+            log_exception(f"Error making a preview of '{query.get('filename')}':", e)
+            return None
+
+    boundary = uuid.uuid4().hex
+    response = web.StreamResponse(headers={"Content-Type": f"multipart/form-data; boundary={boundary}", "Cache-Control": "no-store"})
+    await response.prepare(request)
+
+    loading_items = [asyncio.ensure_future(load_item(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_preview in asyncio.as_completed(loading_items):
+            preview = await next_preview
+            if preview is None:
+                continue
+            index, parameters, body = preview
+            _, content_type, extension = PREVIEW_FORMATS[parameters["image_format"]]
+            part_headers = (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{index}"; filename="{index}{extension}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n')
+            await response.write(part_headers.encode() + body + b"\r\n")
+
+        await response.write(f"--{boundary}--\r\n".encode())
+        await response.write_eof()
+    finally:
+        # If the client went away, previews it no longer waits for are dropped before they start
+        for loading_item in loading_items:
+            loading_item.cancel()
+
+    return response
+
+async def view_video_preview(request):
+    """
+    Serve a poster frame or a short low resolution loop of a video (see VIDEO_PREVIEW_KINDS), so drawer tiles
+    don't each decode the original. Previews are made with ffmpeg on the image work pool and kept in the
+    thumbnail cache. Takes the same file parameters as /jnodes_view_image, plus "kind" and "w".
+    """
+    result = await validate_and_return_file_from_request(request)
+    if result["success"] != True:
+        return web.Response(status= result["response"] if result["response"] else 404)
+
+    parameters = parse_video_preview_parameters(request.rel_url.query)
+    if parameters is None:
+        return web.Response(status=400)
+    content_type, extension = VIDEO_PREVIEW_KINDS[parameters["kind"]]
+
+    if get_ffmpeg_path() is None:
+        return web.Response(status=404) # Tiles fall back to the original
+
+    file_path = result["payload"]["file"]
+    filename = os.path.splitext(result["payload"]["filename"])[0] + extension
+    filename = filename.replace('"', '\\"')  # Escape double quotes
+    headers = {"Content-Disposition": f'filename="{filename}"'}
+
+    stat = await asyncio.get_running_loop().run_in_executor(None, os.stat, file_path)
+    cache_key = make_thumbnail_cache_key(file_path, stat, **parameters)
+    headers.update(get_cache_validators(stat, cache_key))
+    if is_not_modified(request, headers["ETag"], stat):
+        return make_not_modified_response(headers)
+
+    try:
+        body = await load_cached_rendition(
+            cache_key, extension, functools.partial(encode_video_preview, file_path, **parameters),
+            parse_image_work_priority(request.rel_url.query.get('priority')), lambda: is_request_abandoned(request))
+    except (ImageWorkQueueFullError, ImageWorkAbandonedError):
+        return web.Response(status=503, headers={"Retry-After": "1"})
+    except Exception as e:
+        log_exception(f"Error making a video preview of '{file_path}':", e)
+        return web.Response(status=404)
+
+    return make_ranged_response(request, body, content_type, headers)
+
 async def save_image_as_model_preview(request):
 
     try:
@@ -472,14 +953,14 @@ async def save_image_as_model_preview(request):
                             while chunk := await response.content.read(1024):
                                 file.write(chunk)
                     else:
-                        return web.json_response({"success": False, "error": "Failed to download image"})
+                        return json_response({"success": False, "error": "Failed to download image"})
 
             
-            return web.json_response({"success": True, "file_name": new_image_file_name})
+            return json_response({"success": True, "file_name": new_image_file_name})
 
     except Exception as e:
         logger.error(e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 async def copy_item(request):
    
@@ -492,17 +973,17 @@ async def copy_item(request):
                         os.makedirs(path_to_dir, exist_ok=True)
                     shutil.copy(path_from, path_to)
                     logger.info(f"Successfully copied file from '{path_from}' to '{path_to}'")
-                    return web.json_response({"success": True})
+                    return json_response({"success": True})
                 except Exception as e:
                     logger.error(f"Error occurred while copying file from '{path_from}' to '{path_to}': {e}")
-                    return web.json_response({"success": False, "message": "Failed to copy file."})
+                    return json_response({"success": False, "message": "Failed to copy file."})
             else:
                 message = f"'{path_from}' is not a valid file."
                 logger.warning(message)
-                return web.json_response({"success": False, "message": message})
+                return json_response({"success": False, "message": message})
         except Exception as e:
             log_exception(f"Error occurred while deleting '{path}':", e)
-            return web.json_response({"success": False, "message": message})
+            return json_response({"success": False, "message": message})
 
     result = await validate_and_return_file_from_request(request)
 
@@ -513,7 +994,10 @@ async def copy_item(request):
             path_to = resolve_file_path(path_to)
 
         if path_from and path_to:
-            return copy_file(path_from, path_to)
+            try:
+                return await run_image_work(copy_file, path_from, path_to, priority=USER_ACTION_IMAGE_WORK_PRIORITY)
+            except ImageWorkQueueFullError:
+                return web.Response(status=503, headers={"Retry-After": "1"})
 
     logger.warning("File could not be copied: file not found or filename and destination not defined")
     return web.Response(status=404)
@@ -554,15 +1038,20 @@ async def upload_image(request):
                     filepath = os.path.join(full_output_folder, filename)
                     i += 1
 
-            with open(filepath, "wb") as f:
-                f.write(image.file.read())
+            def write_upload():
+                with open(filepath, "wb") as f:
+                    shutil.copyfileobj(image.file, f)
+
+            await run_image_work(write_upload, priority=USER_ACTION_IMAGE_WORK_PRIORITY)
 
-            return web.json_response({"name" : filename, "subfolder": subfolder, "type": image_upload_type})
+            return json_response({"name" : filename, "subfolder": subfolder, "type": image_upload_type})
         else:
             return web.Response(status=400)
+    except ImageWorkQueueFullError as e:
+        return json_response({"success": False, "error": str(e)}, status=503, headers={"Retry-After": "1"})
     except Exception as e:
         log_exception("Error uploading image:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 async def save_model_user_info(request):
 
@@ -590,13 +1079,13 @@ async def save_model_user_info(request):
             with open(file_path, 'w', encoding='utf-8') as file:
                 file.write(text_to_save)
 
-            return web.json_response({"success": True})
+            return json_response({"success": True})
 
         assert ValueError
 
     except Exception as e:
         log_exception("Error saving text:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 def load_info(request):
     type = "loras"
@@ -631,10 +1120,10 @@ def load_info(request):
             try:
                 with open(file, 'r', encoding='utf-8') as opened_file:
                     loaded_text = opened_file.read()
-                return web.json_response({"success": True, "payload" : loaded_text})
+                return json_response({"success": True, "payload" : loaded_text})
             except Exception as e:
                 log_exception("Error loading text:", e)
-                return web.json_response({"success": False, "error": str(e)})
+                return json_response({"success": False, "error": str(e)})
 
     return web.Response(status=404)
 
@@ -649,7 +1138,7 @@ async def find_files(request):
             path = Path(resolve_file_path(request_json["path"]))
 
         if not path or not os.path.isdir(path):
-            return web.json_response({"success": False, "error": "Invalid or missing directory path"})
+            return json_response({"success": False, "error": "Invalid or missing directory path"})
 
         # Optional flags
         recursive = bool(request_json.get("recursive", False))
@@ -673,11 +1162,11 @@ async def find_files(request):
                 else:
                     files.append(str(f.relative_to(path)))
 
-        return web.json_response({"success": True, "files": files})
+        return json_response({"success": True, "files": files})
 
     except Exception as e:
         log_exception("Error finding files:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 async def save_text(request):
     try:
@@ -699,11 +1188,11 @@ async def save_text(request):
 
             path.write_text(text_to_save, encoding="utf-8")
 
-            return web.json_response({"success": True})
+            return json_response({"success": True})
 
     except Exception as e:
         log_exception("Error saving text:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 async def load_text(request):
     try:
@@ -715,10 +1204,10 @@ async def load_text(request):
                 with open(path, 'r', encoding='utf-8') as file:
                     loaded_text = file.read()
     
-            return web.json_response({"success": True, "payload" : loaded_text})
+            return json_response({"success": True, "payload" : loaded_text})
     except Exception as e:
         log_exception("Error loading text:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 def save_settings(request, settings):
     um = UserManager()
@@ -736,24 +1225,24 @@ async def post_setting(request):
         if "id" in request_json:
             setting_id = request_json["id"]
         if not setting_id:
-            return web.json_response({"success": False, "error": "No 'id' found in request!"})
+            return json_response({"success": False, "error": "No 'id' found in request!"})
 
         setting_value = None
         if "value" in request_json:
             setting_value = request_json["value"]
         if not setting_value:
-            return web.json_response({"success": False, "error": "No 'value' found in request!"})
+            return json_response({"success": False, "error": "No 'value' found in request!"})
             
         if setting_id and setting_value:
             settings = get_settings(request)
             settings[setting_id] = setting_value
             save_settings(request, settings)
     
-            return web.json_response({"success": True})
+            return json_response({"success": True})
 
     except Exception as e:
         log_exception("Error saving text:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 async def post_all_settings(request):
     try:
@@ -766,13 +1255,13 @@ async def post_all_settings(request):
 
         if settings:
             save_settings(request, settings)
-            return web.json_response({"success": True})
+            return json_response({"success": True})
         else:
-            return web.json_response({"success": False, "error": "No 'settings' found in request!"})
+            return json_response({"success": False, "error": "No 'settings' found in request!"})
 
     except Exception as e:
         log_exception("Error saving text:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 def get_settings(request):
     um = UserManager()
@@ -794,20 +1283,20 @@ async def get_setting(request):
             setting_id = request_json["id"]
 
         settings = get_settings(request)
-        return web.json_response({"success": True, "payload" : settings[setting_id]})
+        return json_response({"success": True, "payload" : settings[setting_id]})
     
     except Exception as e:
         log_exception("Error loading text:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 async def get_all_settings(request):
     try:       
         settings = get_settings(request)
-        return web.json_response({"success": True, "payload" : json.dumps(settings)})
+        return json_response({"success": True, "payload" : json.dumps(settings)})
 
     except Exception as e:
         log_exception("Error loading text:", e)
-        return web.json_response({"success": False, "error": str(e)})
+        return json_response({"success": False, "error": str(e)})
 
 async def delete_item(request):
     def delete_file(path):
@@ -821,20 +1310,20 @@ async def delete_item(request):
                     send2trash(path)
                     message = f"File '{path}' sent to trash/recycle bin successfully."
                     print(message)
-                    return web.json_response({"success": True, "type": "send2trash", "message": message})
+                    return json_response({"success": True, "type": "send2trash", "message": message})
                 except ImportError:
                     # If send2trash module not available, delete file permanently
                     os.remove(path)
                     message = f"File '{path}' deleted permanently. If you want to send to trash/recycle, consider installing send2trash (pip install send2trash)."
                     print(message)
-                    return web.json_response({"success": True, "type": "permanent", "message": message})
+                    return json_response({"success": True, "type": "permanent", "message": message})
             else:
                 message = f"'{path}' is not a valid file."
                 print(message)
-                return web.json_response({"success": False, "message": message})
+                return json_response({"success": False, "message": message})
         except Exception as e:
             log_exception(f"Error occurred while deleting '{path}':", e)
-            return web.json_response({"success": False, "message": message})
+            return json_response({"success": False, "message": message})
 
     result = await validate_and_return_file_from_request(request)
 
@@ -856,136 +1345,133 @@ async def delete_item(request):
     logger.warning("File could not be deleted: file not found")
     return web.Response(status=404)
 
-def _strip_surrogates(obj):
-    if isinstance(obj, str):
-        return re.sub(r'[\ud800-\udfff]', '', obj)
-    if isinstance(obj, dict):
-        return {k: _strip_surrogates(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_strip_surrogates(item) for item in obj]
-    return obj
+def write_image_metadata(file_path, metadata):
+    """Write metadata into an image file, re-saving it in place. Runs on the image work pool. Returns the response payload."""
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext == ".png":
+        with Image.open(file_path) as img:
+            pnginfo = PngInfo()
+            for k, v in metadata.items():
+                value = v
+                if isinstance(v, str) and (v.startswith("{") or v.startswith("[")):
+                    try:
+                        value = json.loads(v)
+                    except:
+                        pass
+                if isinstance(value, (dict, list)):
+                    text = json.dumps(value, ensure_ascii=True)
+                else:
+                    text = str(value)
+                pnginfo.add_text(k, text)
+            img.save(file_path, pnginfo=pnginfo)
+
+    elif ext in (".jpg", ".jpeg"):
+        with Image.open(file_path) as img:
+            existing_metadata = {}
+            try:
+                exif_data = piexif.load(file_path)
+                user_comment = exif_data.get("Exif", {}).get(piexif.ExifIFD.UserComment)
+                if user_comment:
+                    decoded = piexif.helper.UserComment.decode(user_comment)
+                    if decoded.startswith("UNICODE"):
+                        decoded = decoded[7:]
+                    existing_metadata = json.loads(decoded)
+            except:
+                pass
+
+            existing_metadata.update(metadata)
+
+            exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+            try:
+                old_exif = piexif.load(file_path)
+                exif_dict["0th"] = old_exif.get("0th", {})
+                exif_dict["GPS"] = old_exif.get("GPS", {})
+                exif_dict["1st"] = old_exif.get("1st", {})
+            except:
+                pass
+            exif_dict["Exif"][piexif.ExifIFD.UserComment] = json.dumps(existing_metadata).encode()
+            exif_bytes = piexif.dump(exif_dict)
+            img.save(file_path, exif=exif_bytes, quality=95)
+
+    elif ext == ".webp":
+        with Image.open(file_path) as img:
+            existing_metadata = {}
+            try:
+                exif_data = piexif.load(file_path)
+                user_comment = exif_data.get("Exif", {}).get(piexif.ExifIFD.UserComment)
+                if user_comment:
+                    decoded = piexif.helper.UserComment.decode(user_comment)
+                    if decoded.startswith("UNICODE"):
+                        decoded = decoded[7:]
+                    existing_metadata = json.loads(decoded)
+            except:
+                pass
+
+            existing_metadata.update(metadata)
+
+            exif_bytes = piexif.dump({
+                "Exif": {
+                    piexif.ExifIFD.UserComment: piexif.helper.UserComment.dump(
+                        json.dumps(existing_metadata, indent=2, sort_keys=True), encoding="unicode"
+                    )
+                }
+            })
+            is_animated = getattr(img, "is_animated", False)
+            if is_animated:
+                img.save(file_path, format="WEBP", exif=exif_bytes, save_all=True)
+            else:
+                img.save(file_path, format="WEBP", lossless=True, exif=exif_bytes)
+
+    elif ext == ".gif":
+        with Image.open(file_path) as img:
+            existing_metadata = {}
+            try:
+                existing_metadata = json.loads(img.info.get("comment", "{}"))
+            except:
+                pass
+            existing_metadata.update(metadata)
+
+            is_animated = getattr(img, "is_animated", False)
+            if is_animated:
+                frames = []
+                durations = []
+                for frame in ImageSequence.Iterator(img):
+                    frames.append(frame.copy())
+                    durations.append(frame.info.get("duration", 100))
+                frames[0].save(
+                    file_path,
+                    save_all=True,
+                    append_images=frames[1:],
+                    duration=durations,
+                    loop=0,
+                    comment=json.dumps(existing_metadata),
+                )
+            else:
+                img.save(file_path, comment=json.dumps(existing_metadata))
+    else:
+        return {"success": False, "error": f"Unsupported image format: {ext}"}
+
+    return {"success": True}
 
 async def edit_image_metadata(request):
     try:
         result = await validate_and_return_file_from_request(request)
 
         if result["success"] != True:
-            return web.json_response({"success": False, "error": "File not found"})
+            return json_response({"success": False, "error": "File not found"})
 
         file_path = result["payload"]["file"]
         request_data = await read_web_request_content(request.content)
         request_json = json.loads(request_data)
 
-        metadata = _strip_surrogates(request_json.get("metadata", {}))
+        metadata = normalize_json_value(request_json.get("metadata", {}))
         image_format = request_json.get("format", "")
 
-        ext = os.path.splitext(file_path)[1].lower()
-
-        if ext == ".png":
-            with Image.open(file_path) as img:
-                pnginfo = PngInfo()
-                for k, v in metadata.items():
-                    value = v
-                    if isinstance(v, str) and (v.startswith("{") or v.startswith("[")):
-                        try:
-                            value = json.loads(v)
-                        except:
-                            pass
-                    if isinstance(value, (dict, list)):
-                        text = json.dumps(value, ensure_ascii=True)
-                    else:
-                        text = str(value)
-                    pnginfo.add_text(k, text)
-                img.save(file_path, pnginfo=pnginfo)
-
-        elif ext in (".jpg", ".jpeg"):
-            with Image.open(file_path) as img:
-                existing_metadata = {}
-                try:
-                    exif_data = piexif.load(file_path)
-                    user_comment = exif_data.get("Exif", {}).get(piexif.ExifIFD.UserComment)
-                    if user_comment:
-                        decoded = piexif.helper.UserComment.decode(user_comment)
-                        if decoded.startswith("UNICODE"):
-                            decoded = decoded[7:]
-                        existing_metadata = json.loads(decoded)
-                except:
-                    pass
-
-                existing_metadata.update(metadata)
-
-                exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
-                try:
-                    old_exif = piexif.load(file_path)
-                    exif_dict["0th"] = old_exif.get("0th", {})
-                    exif_dict["GPS"] = old_exif.get("GPS", {})
-                    exif_dict["1st"] = old_exif.get("1st", {})
-                except:
-                    pass
-                exif_dict["Exif"][piexif.ExifIFD.UserComment] = json.dumps(existing_metadata).encode()
-                exif_bytes = piexif.dump(exif_dict)
-                img.save(file_path, exif=exif_bytes, quality=95)
-
-        elif ext == ".webp":
-            with Image.open(file_path) as img:
-                existing_metadata = {}
-                try:
-                    exif_data = piexif.load(file_path)
-                    user_comment = exif_data.get("Exif", {}).get(piexif.ExifIFD.UserComment)
-                    if user_comment:
-                        decoded = piexif.helper.UserComment.decode(user_comment)
-                        if decoded.startswith("UNICODE"):
-                            decoded = decoded[7:]
-                        existing_metadata = json.loads(decoded)
-                except:
-                    pass
-
-                existing_metadata.update(metadata)
-
-                exif_bytes = piexif.dump({
-                    "Exif": {
-                        piexif.ExifIFD.UserComment: piexif.helper.UserComment.dump(
-                            json.dumps(existing_metadata, indent=2, sort_keys=True), encoding="unicode"
-                        )
-                    }
-                })
-                is_animated = getattr(img, "is_animated", False)
-                if is_animated:
-                    img.save(file_path, format="WEBP", exif=exif_bytes, save_all=True)
-                else:
-                    img.save(file_path, format="WEBP", lossless=True, exif=exif_bytes)
-
-        elif ext == ".gif":
-            with Image.open(file_path) as img:
-                existing_metadata = {}
-                try:
-                    existing_metadata = json.loads(img.info.get("comment", "{}"))
-                except:
-                    pass
-                existing_metadata.update(metadata)
-
-                is_animated = getattr(img, "is_animated", False)
-                if is_animated:
-                    frames = []
-                    durations = []
-                    for frame in ImageSequence.Iterator(img):
-                        frames.append(frame.copy())
-                        durations.append(frame.info.get("duration", 100))
-                    frames[0].save(
-                        file_path,
-                        save_all=True,
-                        append_images=frames[1:],
-                        duration=durations,
-                        loop=0,
-                        comment=json.dumps(existing_metadata),
-                    )
-                else:
-                    img.save(file_path, comment=json.dumps(existing_metadata))
-        else:
-            return web.json_response({"success": False, "error": f"Unsupported image format: {ext}"})
-
-        return web.json_response({"success": True})
+        return json_response(await run_image_work(write_image_metadata, file_path, metadata, priority=USER_ACTION_IMAGE_WORK_PRIORITY))
 
+    except ImageWorkQueueFullError as e:
+        return json_response({"success": False, "error": str(e)}, status=503, headers={"Retry-After": "1"})
     except Exception as e:
         log_exception("Error editing image metadata:", e)
-        return web.json_response({"success": False, "error": str(e)})
\ No newline at end of file
+        return json_response({"success": False, "error": str(e)})
\ No newline at end of file
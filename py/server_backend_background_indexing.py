@@ -0,0 +1,69 @@
+import threading
+
+from collections import OrderedDict
+
+from .logger import *
+from .server_backend_get_subdirectory_images import read_item_records
+
+# Queued files are read this many at a time, so the index (and with it search) fills in as the pass goes
+BACKGROUND_INDEXING_BATCH_SIZE = 64
+
+# Beyond this many queued files the ones queued longest ago are dropped; they're queued again when next listed
+MAX_QUEUED_BACKGROUND_INDEXING_PATHS = 200000
+
+class BackgroundIndexer:
+    """
+    Extracts files into the media index on a single background thread.
+
+    Drawer listings are read from each file's stat alone, so without this the index would only learn about files
+    whose metadata a drawer happened to load. Indexed files are listed complete on their next scan and can be found
+    by /jnodes_search. Files listed most recently are read first, and files already current in the index
+    (e.g. read by a drawer meanwhile) are skipped by read_item_records.
+    """
+
+    def __init__(self):
+        self._pending_paths = OrderedDict() # path -> None, in the order they were queued
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def queue_paths(self, full_paths):
+        with self._condition:
+            for full_path in full_paths:
+                self._pending_paths[full_path] = None
+                self._pending_paths.move_to_end(full_path)
+            while len(self._pending_paths) > MAX_QUEUED_BACKGROUND_INDEXING_PATHS:
+                self._pending_paths.popitem(last=False)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="JNodesBackgroundIndexing", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _take_batch(self):
+        with self._condition:
+            while not self._pending_paths:
+                self._condition.wait()
+            batch_size = min(BACKGROUND_INDEXING_BATCH_SIZE, len(self._pending_paths))
+            return [self._pending_paths.popitem(last=True)[0] for _ in range(batch_size)]
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                read_item_records(batch)
+            except Exception as e:
+                log_exception("Error indexing files in the background:", e)
+
+_background_indexer = None
+_background_indexer_lock = threading.Lock()
+
+def get_background_indexer():
+    global _background_indexer
+    with _background_indexer_lock:
+        if _background_indexer is None:
+            _background_indexer = BackgroundIndexer()
+    return _background_indexer
+
+def queue_background_indexing(full_paths):
+    """Have files that a listing couldn't serve from the media index extracted into it in the background."""
+    get_background_indexer().queue_paths(full_paths)
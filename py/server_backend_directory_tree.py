@@ -0,0 +1,159 @@
+import os
+import time
+import threading
+
+from collections import OrderedDict
+
+from .logger import *
+from .utils import is_acceptable_image_or_video_for_browser_display
+
+# Directory listings kept in memory, least recently used are dropped first
+MAX_CACHED_DIRECTORIES = 100000
+
+# A directory changed this recently is listed again next time, since another change within the same
+# mtime tick (coarse on some network file systems) wouldn't change its mtime again
+MTIME_SETTLE_NANOSECONDS = 2 * 1000 * 1000 * 1000
+
+class DirectoryListing:
+    """The immediate subdirectories of one directory, and the number and total size of the media files directly in it."""
+
+    __slots__ = ("mtime_ns", "identity", "is_settled", "subdirectories", "media_count", "media_bytes")
+
+    def __init__(self, stat, subdirectories, media_count, media_bytes):
+        self.mtime_ns = stat.st_mtime_ns
+        self.identity = (stat.st_dev, stat.st_ino)
+        self.is_settled = time.time_ns() - stat.st_mtime_ns > MTIME_SETTLE_NANOSECONDS
+        self.subdirectories = subdirectories
+        self.media_count = media_count
+        self.media_bytes = media_bytes
+
+class DirectoryTreeCache:
+    """
+    Caches directory listings so subdirectory dropdowns don't walk the whole tree on every request.
+
+    A listing is reused for as long as its directory's mtime is unchanged, which holds until entries are added,
+    removed or renamed, so refreshing an unchanged tree costs one stat per directory. Files rewritten in place
+    don't change their directory's mtime; the drawer watcher invalidates their directories instead.
+    """
+
+    def __init__(self, max_directories=MAX_CACHED_DIRECTORIES):
+        self.max_directories = max_directories
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_listing(self, directory):
+        """Get the listing of a directory, reading it again only if it changed. Returns None if it isn't a directory."""
+        directory = os.path.normpath(directory)
+        try:
+            stat = os.stat(directory)
+        except OSError:
+            self.invalidate(directory)
+            return None
+
+        with self._lock:
+            listing = self._listings.get(directory)
+            if listing is not None and listing.is_settled and listing.mtime_ns == stat.st_mtime_ns:
+                self._listings.move_to_end(directory)
+                return listing
+
+        listing = self._list_directory(directory, stat)
+        if listing is None:
+            return None
+
+        with self._lock:
+            self._listings[directory] = listing
+            self._listings.move_to_end(directory)
+            while len(self._listings) > self.max_directories:
+                self._listings.popitem(last=False)
+
+        return listing
+
+    def _list_directory(self, directory, stat):
+        subdirectories = []
+        media_count = 0
+        media_bytes = 0
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            subdirectories.append(entry.name)
+                        elif is_acceptable_image_or_video_for_browser_display(entry.name) and entry.is_file():
+                            media_count += 1
+                            media_bytes += entry.stat().st_size
+                    except OSError:
+                        continue # Vanished or unreadable while listing
+        except (NotADirectoryError, FileNotFoundError):
+            return None
+
+        return DirectoryListing(stat, sorted(subdirectories), media_count, media_bytes)
+
+    def invalidate(self, directory):
+        """Forget a directory's listing, e.g. after a file in it was rewritten."""
+        with self._lock:
+            self._listings.pop(os.path.normpath(directory), None)
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
+    def walk(self, root_directory, job=None):
+        """
+        List root_directory and every directory below it.
+
+        Returns:
+            list: (relative_path, DirectoryListing) tuples in depth-first order, starting with ("", root listing).
+                Relative paths are joined with os.path.join. Directories reached twice through links are listed once.
+        """
+        results = []
+        visited_identities = set()
+        stack = [""]
+
+        while stack:
+            if job and job.should_cancel():
+                break
+
+            relative_path = stack.pop()
+            listing = self.get_listing(os.path.join(root_directory, relative_path))
+            if listing is None or listing.identity in visited_identities:
+                continue
+            visited_identities.add(listing.identity)
+
+            results.append((relative_path, listing))
+            for subdirectory in reversed(listing.subdirectories):
+                stack.append(os.path.join(relative_path, subdirectory))
+
+        return results
+
+    def get_tree(self, root_directory, job=None):
+        """
+        Get every directory under root_directory with its media counts.
+
+        Returns:
+            tuple: (paths, details). paths is the sorted list of relative paths, "" for the root itself.
+                details maps each path to {"media_count", "media_bytes"} for files directly in it and
+                {"total_media_count", "total_media_bytes"} including all of its subdirectories.
+        """
+        walked = self.walk(root_directory, job)
+
+        details = {}
+        for relative_path, listing in walked:
+            details[relative_path] = {
+                "media_count": listing.media_count,
+                "media_bytes": listing.media_bytes,
+                "total_media_count": listing.media_count,
+                "total_media_bytes": listing.media_bytes,
+            }
+
+        # Children come after their parents in depth-first order, so adding up in reverse finishes each child first
+        for relative_path, _ in reversed(walked):
+            if not relative_path:
+                continue
+            parent = details.get(os.path.dirname(relative_path))
+            if parent is not None:
+                parent["total_media_count"] += details[relative_path]["total_media_count"]
+                parent["total_media_bytes"] += details[relative_path]["total_media_bytes"]
+
+        return sorted(details.keys()), details
+
+directory_tree_cache = DirectoryTreeCache()
@@ -3,32 +3,107 @@ import re
 
 from .logger import *
 from .utils import *
+from .server_backend_media_index import get_media_index, is_index_entry_current
+from .server_backend_scan_pool import get_scan_worker_count, get_scan_worker_pool, is_scan_worker_pool_running, reset_scan_worker_pool
+from .server_backend_scan_tuning import get_scan_tuner, format_scan_configuration
+from .server_backend_single_flight import single_flight
 
-import concurrent
-import multiprocessing
-
-import cv2
 import json
-import subprocess
-import piexif
-from PIL import Image, PngImagePlugin, ExifTags
+import time
+import queue
+import threading
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+# Extraction lives in a slim module so pool workers don't import this package; the first two are re-exported for the watcher
+from .scan_worker.jnodes_scan_worker import process_acceptable_item, get_creation_time_from_stat, process_acceptable_item_with_stats
+from .scan_worker.jnodes_json_values import loads_json
+
+
+# How many directories are listed at once. Listing is I/O bound, so this can exceed the CPU count.
+DIRECTORY_SCAN_THREAD_COUNT = 8
+
+# How many listed directories may wait for extraction before listing pauses, so a walk can't run far ahead of it
+LISTED_DIRECTORY_QUEUE_SIZE = 256
+
+# How files are extracted. "auto" picks from timings of previous scans on the same storage (see ScanTuner),
+# falling back to thresholds by file count until there are some. The others force one way.
+SCAN_STRATEGIES = ("auto", "sequential", "threads", "processes")
+
+# Extraction threads used unless the tuner or the caller picks another count
+SCAN_THREAD_COUNT = 3
 
-DEBUG = False
+class ScannedFile:
+    """A file found while walking the tree, with the stat values needed to build or validate its record."""
+
+    __slots__ = ("item", "full_path", "directory", "subdirectory", "file_size", "mtime_ns", "file_age")
+
+    def __init__(self, item, full_path, directory, subdirectory, stat):
+        self.item = item
+        self.full_path = full_path
+        self.directory = directory
+        self.subdirectory = subdirectory
+        self.file_size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.file_age = get_creation_time_from_stat(stat)
+
+    def get_extraction_args(self):
+        return (self.item, self.subdirectory, self.full_path, (self.file_size, self.file_age))
 
 class GetSubdirectoryImages:
 
-    def __init__(self, in_directory, recursive, external_cancel_check=None):
+    def __init__(self, in_directory, recursive, external_cancel_check=None, use_index=True, result_callback=None, progress_callback=None, stat_only=False, unindexed_paths_callback=None, strategy="auto", thread_count=SCAN_THREAD_COUNT):
         self.CANCELLATION_REQUESTED = False
         self.external_cancel_check = external_cancel_check
 
+        # Called with each result as soon as it is available, used for streaming responses
+        self.result_callback = result_callback
+
+        # Called with (files_seen, files_processed) whenever either count changes
+        self.progress_callback = progress_callback
+        self.files_seen = 0
+
         self.in_directory = in_directory
         self.recursive = recursive
 
+        # Skip extraction and list files from their stat alone (records from the media index are still complete)
+        self.stat_only = stat_only
+
+        # Called once listing ends with the paths of the files listed from their stat alone because the media index
+        # had no current record for them, so they can be indexed later
+        self.unindexed_paths_callback = unindexed_paths_callback
+        self.unindexed_paths = []
+
+        if strategy not in SCAN_STRATEGIES:
+            raise ValueError(f"Unknown scan strategy '{strategy}', expected one of {SCAN_STRATEGIES}")
+        self.strategy = strategy
+        self.thread_count = thread_count
+
+        # Persistent cache of extracted results, None if unavailable or disabled
+        self.media_index = get_media_index() if use_index else None
+
         self.results = []
+        self._results_lock = threading.Lock()
 
     def should_cancel_task(self):
         return self.CANCELLATION_REQUESTED or (self.external_cancel_check and self.external_cancel_check())
 
+    def add_result(self, record):
+        with self._results_lock:
+            self.results.append(record)
+        if self.result_callback:
+            self.result_callback(record)
+        self.report_progress()
+
+    def add_files_seen(self, count):
+        with self._results_lock:
+            self.files_seen += count
+        self.report_progress()
+
+    def report_progress(self):
+        if self.progress_callback:
+            self.progress_callback(self.files_seen, len(self.results))
+
     def get_subdirectory_images(self):
         
         """
@@ -42,259 +117,378 @@ class GetSubdirectoryImages:
             list: A list of dictionaries containing information about images.
         """
 
-        import time
         start_time = time.time()
 
-        self.walk_through_subdirectories_and_files("")
+        # Each directory's files that need extraction are queued as soon as it has been listed, so extraction
+        # (and with it a streamed response) starts with the first folder instead of after the whole tree
+        listed_files_queue = queue.Queue(maxsize=LISTED_DIRECTORY_QUEUE_SIZE)
+        walk_stop_requested = threading.Event()
+        listed_contents_by_directory = {}
+        new_index_entries_by_directory = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=DIRECTORY_SCAN_THREAD_COUNT) as executor:
+            self.walk_through_subdirectories_and_files(executor, listed_files_queue, listed_contents_by_directory, walk_stop_requested)
+
+            is_walk_finished = False
+            try:
+                while not is_walk_finished and not self.should_cancel_task():
+                    files_to_extract, is_walk_finished = take_listed_files(listed_files_queue)
+                    if files_to_extract and not self.should_cancel_task():
+                        for directory, entries in self.extract_files(files_to_extract).items():
+                            new_index_entries_by_directory.setdefault(directory, []).extend(entries)
+            finally:
+                if not is_walk_finished:
+                    # Stop listing and let the threads blocked on a full queue finish
+                    walk_stop_requested.set()
+                    while listed_files_queue.get() is not None:
+                        pass
+
+        # Also after a cancellation: whatever was extracted is kept, and directories that were listed in full can be pruned
+        if self.media_index:
+            self.update_media_index(new_index_entries_by_directory, listed_contents_by_directory)
+
+        if self.unindexed_paths_callback and self.unindexed_paths:
+            self.unindexed_paths_callback(self.unindexed_paths)
 
         end_time = time.time()
         print(f"Execution time (get_subdirectory_images): got {len(self.results)} results in {end_time - start_time} seconds")
 
         return self.results
 
-    def walk_through_subdirectories_and_files(self, current_subdirectory):
+    def walk_through_subdirectories_and_files(self, executor, listed_files_queue, listed_contents_by_directory, walk_stop_requested):
         """
-        Recursively list files and directories within the specified directory.
-
-        Args:
-            current_subdirectory (str): The directory to process.
+        Start listing the tree with os.scandir, reusing each DirEntry's stat rather than querying files one property at a time.
+        Directories are queued on executor, so idle threads pick up sibling folders as soon as they are found.
+        Files with a current media index record are added to the results right away.
+
+        Returns without waiting. As each directory is listed, the sets of media paths and subdirectory names present
+        in it are stored in listed_contents_by_directory and the list of ScannedFile that need extraction (if any)
+        is put on listed_files_queue.
+        None is put on the queue once the whole tree has been listed, or listing stopped after walk_stop_requested was set.
         """
-        if self.should_cancel_task():
-            return
+        state_lock = threading.Lock()
 
-        full_directory = os.path.join(self.in_directory, current_subdirectory)
-        if not os.path.isdir(full_directory):
-            return   
+        pending_directories = [0]
 
-        def evaluate_result(result):
-            if result[0] == False:
-                full_path = result[1]
-                if self.recursive and os.path.isdir(full_path):
+        def scan_directory(executor, current_subdirectory):
+            try:
+                if not self.should_cancel_task() and not walk_stop_requested.is_set():
+                    list_directory(executor, current_subdirectory)
+            except Exception as e:
+                log_exception(f"Error scanning '{current_subdirectory}':", e)
+            finally:
+                finish_directory()
+
+        def finish_directory():
+            with state_lock:
+                pending_directories[0] -= 1
+                is_walk_finished = pending_directories[0] == 0
+            if is_walk_finished:
+                listed_files_queue.put(None)
+
+        def queue_directory(executor, current_subdirectory):
+            with state_lock:
+                pending_directories[0] += 1
+            try:
+                executor.submit(scan_directory, executor, current_subdirectory)
+            except RuntimeError:
+                finish_directory()
+                raise
+
+        def list_directory(executor, current_subdirectory):
+            full_directory = os.path.normpath(os.path.join(self.in_directory, current_subdirectory))
+            if not os.path.isdir(full_directory):
+                return
+
+            indexed_entries = self.media_index.get_directory_records(full_directory) if self.media_index else {}
+            present_paths = set()
+            present_subdirectory_names = set()
+            directory_unindexed_paths = []
+            directory_files_to_extract = []
+
+            with os.scandir(full_directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            present_subdirectory_names.add(entry.name)
+                            if self.recursive:
+                                queue_directory(executor, os.path.join(current_subdirectory, entry.name))
+                            continue
+
+                        if not is_acceptable_image_or_video_for_browser_display(entry.name):
+                            continue
+
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+
+                    present_paths.add(entry.path)
+
+                    entry_from_index = indexed_entries.get(entry.path)
+                    if is_index_entry_current(entry_from_index, stat.st_size, stat.st_mtime_ns):
+                        self.add_result(restore_index_record(entry_from_index[2], entry.name, current_subdirectory))
+                    elif self.stat_only:
+                        self.add_result(make_stat_only_record(entry.name, current_subdirectory, stat))
+                        directory_unindexed_paths.append(entry.path)
+                    else:
+                        directory_files_to_extract.append(
+                            ScannedFile(entry.name, entry.path, full_directory, current_subdirectory, stat))
+
+            with state_lock:
+                listed_contents_by_directory[full_directory] = (present_paths, present_subdirectory_names)
+                self.unindexed_paths.extend(directory_unindexed_paths)
+
+            # Files restored from the index were already counted as processed, so count them as seen too
+            self.add_files_seen(len(present_paths))
+
+            if directory_files_to_extract:
+                listed_files_queue.put(directory_files_to_extract)
+
+        queue_directory(executor, "")
+
+    def extract_files(self, files_to_extract):
+        """
+        Extract records for a batch of files that weren't served from the media index, e.g. every file listed while
+        the previous batch was being extracted. Files from all of the batch's directories are extracted as one stream.
 
-                    new_subd = os.path.join(current_subdirectory, os.path.basename(full_path.replace("\\", "/")))
-                    self.walk_through_subdirectories_and_files(new_subd)
+        Returns:
+            dict: directory -> list of media index entries for the records that were read successfully.
+        """
+        new_index_entries_by_directory = {}
+        extracted_paths = set()
 
-            else:
-                self.results.append(result[1])
+        def evaluate_result(scanned_file, record):
+            extracted_paths.add(scanned_file.full_path)
+            self.add_result(record)
 
-        def do_multiprocess(in_items): 
-            proc_count = multiprocessing.cpu_count()
-            proc_count_recursive = max(1, int(proc_count / 2)) # To ensure we don't overflow in recursive multiprocess loads
-            args = [(item, full_directory, current_subdirectory) for item in in_items]
-            with multiprocessing.Pool(processes= 1 if DEBUG else proc_count_recursive if self.recursive else proc_count) as pool:
-                results_from_pool = pool.starmap(process_item, args)
-                for result in results_from_pool:
-                    evaluate_result(result)
+            if record['metadata_read']:
+                new_index_entries_by_directory.setdefault(scanned_file.directory, []).append(
+                    (scanned_file.full_path, scanned_file.file_size, scanned_file.mtime_ns, make_index_record(record)))
 
-        def do_multithreading(in_items):
-            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-                futures = [executor.submit(process_item, item, full_directory, current_subdirectory) for item in in_items]
+        def do_multiprocess(in_files): 
+            pool = get_scan_worker_pool()
+            chunk_size = max(1, min(32, len(in_files) // (get_scan_worker_count() * 4)))
+            try:
+                results_from_pool = pool.map(
+                    process_acceptable_item_with_stats, [scanned_file.get_extraction_args() for scanned_file in in_files],
+                    chunksize=chunk_size)
+                for scanned_file, record in zip(in_files, results_from_pool):
+                    evaluate_result(scanned_file, record)
+                    if self.should_cancel_task():
+                        break
+            except BrokenProcessPool:
+                # A worker died, so start fresh next time
+                reset_scan_worker_pool()
+                raise
+
+        def do_multithreading(in_files, thread_count):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=thread_count) as executor:
+                futures = {
+                    executor.submit(process_acceptable_item_with_stats, scanned_file.get_extraction_args()): scanned_file
+                    for scanned_file in in_files
+                }
 
                 for future in concurrent.futures.as_completed(futures):
-                    result = future.result()
-                    evaluate_result(result)
-
-        def do_sequential(in_items): 
-            for item in in_items:
-                result = process_item(item, full_directory, current_subdirectory)
-                evaluate_result(result)
-
-        def prefer_multithreading(items):
+                    evaluate_result(futures[future], future.result())
+                    if self.should_cancel_task():
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+
+        def do_sequential(in_files): 
+            for scanned_file in in_files:
+                if self.should_cancel_task():
+                    break
+                evaluate_result(scanned_file, process_acceptable_item_with_stats(scanned_file.get_extraction_args()))
+
+        def remaining(in_files):
+            # Files whose results were already added before a failure shouldn't be processed again
+            return [scanned_file for scanned_file in in_files if scanned_file.full_path not in extracted_paths]
+
+        def prefer_multithreading(files, thread_count):
             try: 
-                do_multithreading(items)
+                do_multithreading(files, thread_count)
 
             except Exception as e2: 
 
                 log_exception("Error:", e2)
+                extraction_state["has_fallen_back"] = True
 
-                do_sequential(items)
+                do_sequential(remaining(files))
 
-        def prefer_multiprocess(items):
+        def prefer_multiprocess(files):
             try: 
-                do_multiprocess(items)
+                do_multiprocess(files)
 
             except Exception as e1:
 
                 log_exception("Error:", e1)
+                extraction_state["has_fallen_back"] = True
 
-                prefer_multithreading(items)
-
-        def do_auto(items):
-
-            # Sort out items by type
-            videos = []
-            others = []
-
-            for item in items:
-                if is_video(item):
-                    videos.append(item)
-                else:
-                    others.append(item)
-
-            # At 5000+ images or 60+ videos multiprocess becomes faster, 
-            # but multithreaded performance is better in recursion
-            # At small numbers of items, sequential is much faster than multithreading
-            # in terms of percentage, but the end user won't feel a difference
-            # And in recursive workloads sequential performs worse when multiple subfolders are present
-            if len(videos) > 0:
-                if len(videos) > (200 if self.recursive else 60):
-                    prefer_multiprocess(videos)
-                else:
-                    prefer_multithreading(videos)
-
-            if len(others) > 0:
-                if len(others) > (10000 if self.recursive else 5000):
-                    prefer_multiprocess(others)
-                else:
-                    prefer_multithreading(others)
-
-        items = os.listdir(full_directory)  
-        do_auto(items)
-
-def process_item(item, full_directory, current_subdirectory):
-    """
-    Process a single file or directory item.
+                prefer_multithreading(remaining(files), self.thread_count)
 
-    Args:
-        item (str): The name of the file or directory.
-    """
-
-    full_path = os.path.join(full_directory, item)
-
-    if os.path.isfile(full_path) and is_acceptable_image_or_video_for_browser_display(item):
-
-        return True, process_acceptable_item(item, current_subdirectory, full_path)
-            
-    return False, full_path, item
-
-def extract_png_metadata(img):
-    """Extracts PNG metadata."""
-    metadata = {}
-    if isinstance(img.info, dict):
-        for key, value in img.info.items():
-            metadata[key] = value
-    return metadata
-
-def extract_jpg_exif(img):
-    """Extracts EXIF metadata from JPG/WebP."""
-    exif_data = {}
-    try:
-        exif_raw = img._getexif()
-        if exif_raw:
-            exif_data = {ExifTags.TAGS.get(tag, tag): value for tag, value in exif_raw.items()}
-            # Decode UserComment if it's JSON
-            if "UserComment" in exif_data:
-                try:
-                    exif_data = json.loads(piexif.helper.UserComment.load(exif_data["UserComment"]))
-                except json.JSONDecodeError:
-                    pass
-    except Exception as e:
-        logger.warning(f"Unable to extract EXIF data: {e}")
-    return exif_data
-
-def extract_gif_comment(img):
-    """Extracts JSON metadata stored in a GIF comment, if available."""
-    try:
-        comment = img.info.get("comment", "").decode("utf-8")
-        return json.loads(comment) if comment else None
-    except (json.JSONDecodeError, AttributeError):
-        return comment  # Return raw text if it's not JSON
-
-def extract_video_metadata(full_path):
-    """Extracts video metadata using ffprobe via subprocess."""
-    metadata = {}
-    try:
-        # Run ffprobe and capture JSON output
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_format", "-print_format", "json", full_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-
-        # Parse JSON output
-        probe = json.loads(result.stdout)
-        format_tags = probe.get("format", {}).get("tags", {})
-        
-        # Handle comment field
-        if "comment" in format_tags:
-            try:
-                metadata = json.loads(format_tags["comment"])
-            except json.JSONDecodeError:
-                metadata["comment"] = format_tags["comment"]
-    except Exception as e:
-        logger.warning(f"Unable to extract video metadata: {e}")
+        # Sort out files by type
+        videos = []
+        others = []
 
-    return metadata
+        for scanned_file in files_to_extract:
+            if is_video(scanned_file.item):
+                videos.append(scanned_file)
+            else:
+                others.append(scanned_file)
+
+        # Whether the current extraction had to fall back to a slower way, which makes its timing useless for tuning
+        extraction_state = {"has_fallen_back": False}
+
+        def extract_with_strategy(files, kind, multiprocess_threshold):
+            strategy = self.strategy
+            thread_count = self.thread_count
+
+            tuner = get_scan_tuner() if strategy == "auto" else None
+            if strategy == "auto":
+                strategy = "processes" if len(files) > multiprocess_threshold else "threads"
+                choice = tuner.choose(self.in_directory, kind, len(files), format_scan_configuration(strategy, thread_count)) if tuner else None
+                if choice:
+                    strategy, worker_count = choice
+                    thread_count = worker_count or thread_count
+
+            extraction_state["has_fallen_back"] = False
+            was_pool_running = is_scan_worker_pool_running()
+            start_time = time.monotonic()
+
+            if strategy == "processes":
+                prefer_multiprocess(files)
+            elif strategy == "threads":
+                prefer_multithreading(files, thread_count)
+            else:
+                do_sequential(files)
+
+            if tuner and not extraction_state["has_fallen_back"] and not self.should_cancel_task():
+                # The tuner takes the pool's one-off startup back out if this batch paid for it
+                started_pool = strategy == "processes" and not was_pool_running and is_scan_worker_pool_running()
+                tuner.record(
+                    self.in_directory, kind, strategy, thread_count, len(files), time.monotonic() - start_time,
+                    started_scan_worker_pool=started_pool)
+
+        # At 5000+ images or 60+ videos multiprocess becomes faster,
+        # but multithreaded performance is better in recursion
+        # At small numbers of items, sequential is much faster than multithreading
+        # in terms of percentage, but the end user won't feel a difference
+        if len(videos) > 0:
+            extract_with_strategy(videos, "video", 200 if self.recursive else 60)
+
+        if len(others) > 0 and not self.should_cancel_task():
+            extract_with_strategy(others, "image", 10000 if self.recursive else 5000)
+
+        return new_index_entries_by_directory
+
+    def update_media_index(self, new_index_entries_by_directory, listed_contents_by_directory):
+        try:
+            for directory, entries in new_index_entries_by_directory.items():
+                self.media_index.put_records(directory, entries)
+            for directory, (present_paths, present_subdirectory_names) in listed_contents_by_directory.items():
+                self.media_index.remove_missing(directory, present_paths, present_subdirectory_names)
+        except Exception as e:
+            log_exception("Error updating media index:", e)
+
+def take_listed_files(listed_files_queue):
+    """
+    Wait for the next listed directory's files, then take those of every other directory already listed.
 
-def process_acceptable_item(item, current_subdirectory, full_path):
-    file_size = os.path.getsize(full_path)
-    dimensions = [0, 0]
+    Returns:
+        tuple: (list of ScannedFile, whether the walk has finished and nothing more will be queued)
+    """
+    files = []
+    directory_files = listed_files_queue.get()
+    while directory_files is not None:
+        files.extend(directory_files)
+        try:
+            directory_files = listed_files_queue.get_nowait()
+        except queue.Empty:
+            return files, False
+    return files, True
+
+def make_stat_only_record(item, current_subdirectory, stat):
+    """Build a record from a file's stat alone, with the fields extraction would fill left at their defaults."""
     is_video_item = is_video(item)
-    file_age = get_creation_time(full_path)
-    frame_count = -1
-    fps = -1
-
-    metadata_read = True
-    metadata = {}
-
-    try:
-        if is_video_item:
-            metadata = extract_video_metadata(full_path)
-
-            try: # Attempt on GPU first
-                cap = cv2.cudacodec.VideoReader(full_path)
-            except:
-                cap = cv2.VideoCapture(full_path)
-            if cap.isOpened():
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                dimensions = [width, height]
-
-                frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                fps = cap.get(cv2.CAP_PROP_FPS)
-
-                cap.release()
-        else:
-            with Image.open(full_path) as img:
-                dimensions = img.size
-                ext = full_path.lower()
-
-                if ext.endswith(".png"):
-                    metadata = extract_png_metadata(img)
-                elif ext.endswith(".jpg") or ext.endswith(".jpeg") or ext.endswith(".webp"):
-                    metadata = extract_jpg_exif(img)
-                elif ext.endswith(".gif"):
-                    metadata["comment"] = extract_gif_comment(img)
-
-        # Filter out json-incompatible metadata
-        json_serializable_meta = {}
-        for tag, value in metadata.items():
-            
-            try:
-                as_dict = {tag: value}
-                json.dump(as_dict)
-            
-                json_serializable_meta[tag] = value
-            except:
-                json_serializable_meta[tag] = str(value)
-        metadata = json_serializable_meta
-
-    except Exception as e:
-        metadata_read = False
-        logger.warning(f"Unable to get metadata for '{full_path}': {e}")
-
     return {
         'item': item,
         'format': f"{'video' if is_video_item else 'image'}/{get_file_extension_without_dot(item)}",
-        "file_age": file_age, 
-        'file_size': file_size,
-        'dimensions': dimensions,
+        'file_age': get_creation_time_from_stat(stat),
+        'file_size': stat.st_size,
+        'dimensions': [0, 0],
         'is_video': is_video_item,
-        'metadata_read': metadata_read,
-        "subdirectory": current_subdirectory,
-        'metadata': metadata,
-        'frame_count': frame_count, 
-        'fps': fps, 
-        'duration_in_seconds': frame_count / fps if frame_count > 1 and fps > 1 else -1
-    }
\ No newline at end of file
+        'metadata_read': False,
+        'subdirectory': current_subdirectory,
+        'metadata': {},
+        'frame_count': -1,
+        'fps': -1,
+        'duration_in_seconds': -1
+    }
+
+def read_item_records(full_paths):
+    """
+    Get the records for specific files, from the media index where it's current and by extraction otherwise.
+
+    Args:
+        full_paths (list): Absolute paths of images or videos.
+
+    Returns:
+        dict: path -> record without 'item' and 'subdirectory', for every path that exists.
+    """
+    media_index = get_media_index()
+    records = {}
+    files_to_extract = []
+
+    paths_by_directory = {}
+    for full_path in full_paths:
+        full_path = os.path.normpath(full_path)
+        paths_by_directory.setdefault(os.path.dirname(full_path), []).append(full_path)
+
+    for directory, paths in paths_by_directory.items():
+        indexed_entries = media_index.get_directory_records(directory) if media_index else {}
+        for full_path in paths:
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+
+            entry_from_index = indexed_entries.get(full_path)
+            if is_index_entry_current(entry_from_index, stat.st_size, stat.st_mtime_ns):
+                records[full_path] = loads_json(entry_from_index[2])
+            else:
+                files_to_extract.append(ScannedFile(os.path.basename(full_path), full_path, directory, "", stat))
+
+    new_index_entries_by_directory = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=SCAN_THREAD_COUNT) as executor:
+        # Files asked for by several requests at once (e.g. drawers in two tabs) are probed once
+        extracted = executor.map(
+            lambda scanned_file: single_flight.call(
+                ("item_record", scanned_file.full_path, scanned_file.file_size, scanned_file.mtime_ns),
+                process_acceptable_item_with_stats, scanned_file.get_extraction_args()),
+            files_to_extract)
+        for scanned_file, record in zip(files_to_extract, extracted):
+            record = make_index_record(record)
+            records[scanned_file.full_path] = record
+            if record['metadata_read']:
+                new_index_entries_by_directory.setdefault(scanned_file.directory, []).append(
+                    (scanned_file.full_path, scanned_file.file_size, scanned_file.mtime_ns, record))
+
+    if media_index:
+        try:
+            for directory, entries in new_index_entries_by_directory.items():
+                media_index.put_records(directory, entries)
+        except Exception as e:
+            log_exception("Error updating media index:", e)
+
+    return records
+
+def make_index_record(record):
+    """Strip the location-dependent fields from a result so it can be stored in the media index."""
+    return {key: value for key, value in record.items() if key not in ('item', 'subdirectory')}
+
+def restore_index_record(record_json, item, current_subdirectory):
+    """Rebuild a result from a media index record for the scan that found it."""
+    record = loads_json(record_json)
+    record['item'] = item
+    record['subdirectory'] = current_subdirectory
+    return record
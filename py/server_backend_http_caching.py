@@ -0,0 +1,75 @@
+from email.utils import formatdate
+
+from aiohttp import web
+
+# Browsers keep /jnodes_view_image responses but check them with the server before each reuse, which is answered
+# with an empty 304 while the file is unchanged. Files are often rewritten under the same name (new generations,
+# metadata edits), so responses are never reused without asking.
+VIEW_IMAGE_CACHE_CONTROL = "private, no-cache"
+
+def get_cache_validators(stat, version):
+    """
+    Headers that let a browser cache a response made from a file and check it again later.
+
+    Args:
+        stat: The os.stat() of the source file.
+        version: A string identifying this exact response, e.g. a thumbnail cache key, used as the ETag.
+    """
+    return {
+        "ETag": f'"{version}"',
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": VIEW_IMAGE_CACHE_CONTROL,
+    }
+
+def etag_matches(header_value, etag):
+    """Whether an If-None-Match or If-Range header value names etag. Weak tags match, as If-None-Match requires."""
+    for candidate in header_value.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def is_not_modified(request, etag, stat):
+    """Whether a conditional request already has the current response, and can be answered with 304."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None: # Takes precedence over If-Modified-Since when both are sent
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.if_modified_since
+    return if_modified_since is not None and int(stat.st_mtime) <= if_modified_since.timestamp()
+
+def make_not_modified_response(headers):
+    return web.Response(status=304, headers=headers)
+
+def make_ranged_response(request, body, content_type, headers):
+    """
+    Respond with body, or with the single byte range the request asks for (206), so media players can seek
+    in responses that aren't served from a file. Ranges that don't fit the body get 416.
+    """
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    size = len(body)
+
+    if_range = request.headers.get("If-Range")
+    if if_range is not None and not etag_matches(if_range, headers.get("ETag", "")):
+        return web.Response(body=body, content_type=content_type, headers=headers) # Changed since, send it all
+
+    try:
+        byte_range = request.http_range # A slice, its start is negative for the last N bytes ("bytes=-N")
+    except ValueError: # Malformed, or more than one range
+        return web.Response(status=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    start, stop = byte_range.start, byte_range.stop
+    if start is None and stop is None:
+        return web.Response(body=body, content_type=content_type, headers=headers)
+
+    if start is None:
+        start = 0
+    elif start < 0:
+        start, stop = max(size + start, 0), size
+    stop = size if stop is None else min(stop, size)
+
+    if start >= stop:
+        return web.Response(status=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    return web.Response(status=206, body=body[start:stop], content_type=content_type, headers=headers)
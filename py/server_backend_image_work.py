@@ -0,0 +1,138 @@
+import os
+import heapq
+import asyncio
+import itertools
+import functools
+import threading
+import concurrent.futures
+
+from .logger import *
+
+# Set JNODES_IMAGE_WORKERS to change how many images are decoded, encoded or written at once
+IMAGE_WORKER_COUNT_ENVIRONMENT_VARIABLE = "JNODES_IMAGE_WORKERS"
+DEFAULT_MAX_IMAGE_WORKERS = 4
+
+# Set JNODES_IMAGE_QUEUE to change how many requests may wait for a worker before new ones are turned away
+IMAGE_QUEUE_SIZE_ENVIRONMENT_VARIABLE = "JNODES_IMAGE_QUEUE"
+DEFAULT_MAX_QUEUED_IMAGE_TASKS = 512
+
+# Priorities clients may give image work, e.g. tiles on screen above those being prefetched. Higher runs first.
+MIN_IMAGE_WORK_PRIORITY = -10
+MAX_IMAGE_WORK_PRIORITY = 10
+
+# Work the user asked for directly, such as copying, uploading or editing a file. It goes ahead of every preview
+# and isn't turned away when the queue is full.
+USER_ACTION_IMAGE_WORK_PRIORITY = MAX_IMAGE_WORK_PRIORITY + 1
+
+class ImageWorkQueueFullError(Exception):
+    """Raised when too many requests are already waiting for image work, so the caller can answer 503."""
+
+class ImageWorkAbandonedError(Exception):
+    """Raised instead of running queued work whose requests were all abandoned, e.g. by clients that went away."""
+
+def parse_image_work_priority(value):
+    """Read a "priority" request parameter, clamped to the supported range. Returns 0 when it's missing or invalid."""
+    try:
+        priority = int(value)
+    except (TypeError, ValueError):
+        return 0
+    return max(MIN_IMAGE_WORK_PRIORITY, min(priority, MAX_IMAGE_WORK_PRIORITY))
+
+def get_image_worker_count():
+    try:
+        return max(1, int(os.environ[IMAGE_WORKER_COUNT_ENVIRONMENT_VARIABLE]))
+    except (KeyError, ValueError):
+        return max(1, min(DEFAULT_MAX_IMAGE_WORKERS, os.cpu_count() or 1))
+
+def get_max_queued_image_tasks():
+    try:
+        return max(0, int(os.environ[IMAGE_QUEUE_SIZE_ENVIRONMENT_VARIABLE]))
+    except (KeyError, ValueError):
+        return DEFAULT_MAX_QUEUED_IMAGE_TASKS
+
+class ImageWorkExecutor:
+    """
+    Runs blocking image work (PIL decoding and encoding, file copies and writes) for async request handlers
+    on a small dedicated thread pool, so it never blocks the event loop that serves ComfyUI's websocket
+    and every other request, nor takes over the default executor used by listings.
+
+    Work is only handed to the pool when a thread is free. Requests beyond that wait on the event loop, where
+    they cost nothing, and are started by priority, the newest first among equals: while scrolling quickly,
+    the tiles asked for last are the ones on screen. Waiting work is dropped before it starts if its request
+    is cancelled or its is_abandoned check says no one wants it anymore (e.g. a drawer scrolled past a preview).
+    Once max_queued requests are waiting, new ones are refused with ImageWorkQueueFullError.
+    """
+
+    def __init__(self, max_workers, max_queued):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="JNodesImageWork")
+        # Only touched on the event loop
+        self._free_worker_count = max_workers
+        self._waiters = [] # Heap of (-priority, -sequence, asyncio.Future granting a worker)
+        self._sequence = itertools.count()
+
+    async def run(self, function, *args, priority=0, is_abandoned=None, **kwargs):
+        """
+        Run function(*args, **kwargs) on the image work pool and return its result.
+
+        Args:
+            priority (int): Higher priorities are started first.
+            is_abandoned (callable): Checked just before starting; if it returns True the work is dropped
+                with ImageWorkAbandonedError.
+        """
+        loop = asyncio.get_running_loop()
+        await self._acquire_worker(loop, priority)
+
+        try:
+            if is_abandoned and is_abandoned():
+                raise ImageWorkAbandonedError("Image work was abandoned before it started")
+            future = self._executor.submit(functools.partial(function, *args, **kwargs))
+        except BaseException:
+            self._release_worker()
+            raise
+
+        # Free the worker when the work itself finishes, not when the awaiting request is cancelled
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release_worker))
+        return await asyncio.wrap_future(future)
+
+    async def _acquire_worker(self, loop, priority):
+        if self._free_worker_count > 0 and not self._waiters:
+            self._free_worker_count -= 1
+            return
+
+        if len(self._waiters) >= self.max_queued and priority < USER_ACTION_IMAGE_WORK_PRIORITY:
+            raise ImageWorkQueueFullError(f"{len(self._waiters)} image requests are already waiting")
+
+        waiter = loop.create_future()
+        heapq.heappush(self._waiters, (-priority, -next(self._sequence), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled(): # Granted a worker just as the request was cancelled
+                self._release_worker()
+            raise
+
+    def _release_worker(self):
+        """Hand a worker to the most urgent waiter still there, or put it back."""
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done(): # Cancelled waiters are dropped here without ever starting
+                waiter.set_result(None)
+                return
+        self._free_worker_count += 1
+
+_image_work_executor = None
+_image_work_executor_lock = threading.Lock()
+
+def get_image_work_executor():
+    global _image_work_executor
+    with _image_work_executor_lock:
+        if _image_work_executor is None:
+            _image_work_executor = ImageWorkExecutor(get_image_worker_count(), get_max_queued_image_tasks())
+    return _image_work_executor
+
+async def run_image_work(function, *args, priority=0, is_abandoned=None, **kwargs):
+    """Run blocking image work for a request handler off the event loop. See ImageWorkExecutor."""
+    return await get_image_work_executor().run(function, *args, priority=priority, is_abandoned=is_abandoned, **kwargs)
@@ -0,0 +1,166 @@
+import time
+import uuid
+import threading
+
+from collections import deque
+from contextlib import contextmanager
+
+from .logger import *
+
+import server
+
+# The websocket event carrying a job's progress
+JOB_PROGRESS_EVENT = "jnodes.job.progress"
+
+# Progress events for a job are sent at most this often, plus once when it finishes
+PROGRESS_EVENT_INTERVAL_SECONDS = 0.25
+
+# How many cancellations for jobs that haven't started yet are remembered
+MAX_EARLY_CANCELLATIONS = 64
+
+class Job:
+    """
+    One long-running backend operation, such as a directory scan or a model listing.
+    Work checks should_cancel() between items and calls report_progress() as it goes.
+    """
+
+    def __init__(self, job_id, kind):
+        self.id = job_id
+        self.kind = kind
+        self.start_time = time.monotonic()
+
+        self.files_seen = 0
+        self.files_processed = 0
+        self.is_finished = False
+
+        self._cancel_event = threading.Event()
+        self._last_progress_time = 0.0
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def should_cancel(self):
+        return self._cancel_event.is_set()
+
+    def report_progress(self, files_seen=None, files_processed=None, force=False):
+        """Update the job's counts and send a progress event, unless one was sent very recently."""
+        with self._lock:
+            if files_seen is not None:
+                self.files_seen = files_seen
+            if files_processed is not None:
+                self.files_processed = files_processed
+
+            now = time.monotonic()
+            if not force and now - self._last_progress_time < PROGRESS_EVENT_INTERVAL_SECONDS:
+                return
+            self._last_progress_time = now
+
+            progress = self.get_progress()
+
+        try:
+            server.PromptServer.instance.send_sync(JOB_PROGRESS_EVENT, progress)
+        except Exception as e:
+            log_exception("Error sending job progress:", e)
+
+    def get_progress(self):
+        elapsed_seconds = time.monotonic() - self.start_time
+
+        # Estimate from the average rate so far; files still being discovered will push the estimate out
+        eta_seconds = None
+        remaining = self.files_seen - self.files_processed
+        if self.files_processed > 0 and remaining >= 0:
+            eta_seconds = remaining * elapsed_seconds / self.files_processed
+
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "files_seen": self.files_seen,
+            "files_processed": self.files_processed,
+            "elapsed_seconds": elapsed_seconds,
+            "eta_seconds": eta_seconds,
+            "finished": self.is_finished,
+            "cancelled": self.should_cancel(),
+        }
+
+class JobManager:
+    """Tracks running jobs by id so that cancelling one request doesn't affect any other."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._early_cancellations = deque(maxlen=MAX_EARLY_CANCELLATIONS)
+        self._lock = threading.Lock()
+
+    def start_job(self, kind, job_id=None):
+        """
+        Register a new job.
+
+        Args:
+            kind (str): What the job does, e.g. "list_images". Sent with progress events.
+            job_id (str): An id chosen by the client so it can cancel the job before the response arrives.
+                A new id is generated when omitted.
+        """
+        job = Job(job_id or uuid.uuid4().hex, kind)
+
+        with self._lock:
+            previous_job = self._jobs.get(job.id)
+            if previous_job is not None:
+                previous_job.cancel()
+            self._jobs[job.id] = job
+
+            # The client may have cancelled this job while its request was still on the way
+            if job.id in self._early_cancellations:
+                self._early_cancellations.remove(job.id)
+                job.cancel()
+
+        return job
+
+    def finish_job(self, job):
+        with self._lock:
+            if self._jobs.get(job.id) is job:
+                del self._jobs[job.id]
+
+        job.is_finished = True
+        job.report_progress(force=True)
+
+    @contextmanager
+    def run_job(self, kind, job_id=None):
+        """Start a job for the duration of a with-block, finishing it however the block exits."""
+        job = self.start_job(kind, job_id)
+        try:
+            yield job
+        finally:
+            self.finish_job(job)
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel_job(self, job_id):
+        """
+        Cancel one job. If it hasn't started yet, it will be cancelled as soon as it does.
+
+        Returns:
+            bool: Whether a running job was found.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                if job_id not in self._early_cancellations:
+                    self._early_cancellations.append(job_id)
+                return False
+
+        job.cancel()
+        return True
+
+    def cancel_all_jobs(self):
+        """Cancel every running job. Returns the number of jobs cancelled."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+
+        for job in jobs:
+            job.cancel()
+
+        return len(jobs)
+
+job_manager = JobManager()
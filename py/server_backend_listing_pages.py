@@ -0,0 +1,129 @@
+import time
+import json
+import uuid
+import base64
+import threading
+
+from collections import OrderedDict
+
+LISTING_SORT_KEYS = {
+    "file_age": lambda record: record.get("file_age", 0),
+    "file_size": lambda record: record.get("file_size", 0),
+    "name": lambda record: (record.get("item", "").lower(), record.get("subdirectory", "").lower()),
+    "dimensions": lambda record: _get_pixel_count(record),
+    "duration": lambda record: record.get("duration_in_seconds", -1),
+}
+
+DEFAULT_LISTING_SORT = "file_age"
+DEFAULT_LISTING_ORDER = "desc"
+DEFAULT_LISTING_PAGE_SIZE = 500
+MAX_LISTING_PAGE_SIZE = 5000
+
+def _get_pixel_count(record):
+    dimensions = record.get("dimensions") or [0, 0]
+    try:
+        return int(dimensions[0]) * int(dimensions[1])
+    except (TypeError, ValueError, IndexError):
+        return 0
+
+class ListingSnapshot:
+    """
+    The full result of one directory scan, kept in memory so it can be served one page at a time.
+    Sorted orderings are computed once per sort key and reused by every page that asks for them.
+    """
+
+    def __init__(self, results):
+        self.id = uuid.uuid4().hex
+        self.results = results
+        self.created_time = time.monotonic()
+
+        self._sort_indices = {}
+        self._lock = threading.Lock()
+
+    def get_sort_index(self, sort):
+        """
+        Get the record positions in ascending order. Descending pages are read from its end.
+
+        Args:
+            sort (str): One of the keys of LISTING_SORT_KEYS.
+
+        Returns:
+            list: Indices into self.results.
+        """
+        with self._lock:
+            ascending = self._sort_indices.get(sort)
+            if ascending is None:
+                key = LISTING_SORT_KEYS[sort]
+                ascending = sorted(range(len(self.results)), key=lambda index: key(self.results[index]))
+                self._sort_indices[sort] = ascending
+
+        return ascending
+
+    def get_page(self, sort, order, offset, limit):
+        ascending = self.get_sort_index(sort)
+        if order == "asc":
+            positions = ascending[offset:offset + limit]
+        else:
+            stop = max(len(ascending) - offset, 0)
+            positions = reversed(ascending[max(stop - limit, 0):stop])
+        return [self.results[index] for index in positions]
+
+class ListingSnapshotCache:
+    """A small LRU of listing snapshots so paging through a listing never triggers another scan."""
+
+    def __init__(self, max_snapshots=8, time_to_live_seconds=15 * 60):
+        self.max_snapshots = max_snapshots
+        self.time_to_live_seconds = time_to_live_seconds
+
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, results):
+        snapshot = ListingSnapshot(results)
+        with self._lock:
+            self._snapshots[snapshot.id] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def get(self, snapshot_id):
+        with self._lock:
+            snapshot = self._snapshots.get(snapshot_id)
+            if snapshot is None:
+                return None
+
+            if time.monotonic() - snapshot.created_time > self.time_to_live_seconds:
+                del self._snapshots[snapshot_id]
+                return None
+
+            self._snapshots.move_to_end(snapshot_id)
+            return snapshot
+
+def encode_listing_cursor(snapshot_id, sort, order, offset):
+    """Make an opaque cursor pointing at a position in a listing snapshot."""
+    as_json = json.dumps({"s": snapshot_id, "k": sort, "d": order, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(as_json.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_listing_cursor(cursor):
+    """
+    Read a cursor made by encode_listing_cursor.
+
+    Returns:
+        tuple: (snapshot_id, sort, order, offset)
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        as_dict = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        sort, order, offset = as_dict["k"], as_dict["d"], int(as_dict["o"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    if sort not in LISTING_SORT_KEYS or order not in ("asc", "desc") or offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    return as_dict["s"], sort, order, offset
+
+listing_snapshot_cache = ListingSnapshotCache()
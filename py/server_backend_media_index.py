@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+
+from .logger import *
+from .utils import get_jnodes_user_directory
+from .scan_worker.jnodes_json_values import dumps_json
+
+MEDIA_INDEX_FILENAME = "media_index.sqlite3"
+MEDIA_INDEX_SCHEMA_VERSION = 3
+
+SEARCH_TOKEN_PATTERN = re.compile(r"[^\W_]{2,64}", re.UNICODE)
+MAX_SEARCH_TOKENS_PER_ITEM = 4096
+
+class MediaIndex:
+    """
+    A persistent cache of `process_acceptable_item` results stored in SQLite.
+
+    Rows are keyed by absolute file path and are only considered valid while the file's
+    size and mtime match what was recorded, so a rescan only needs to stat files and
+    re-extract the ones that are new or have changed.
+    """
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self._lock = threading.Lock()
+
+        # A single connection shared between scan threads; all access goes through self._lock
+        self._connection = sqlite3.connect(database_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._connection:
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != MEDIA_INDEX_SCHEMA_VERSION:
+                # The index is only a cache, so an outdated schema is simply rebuilt
+                self._connection.execute("DROP TABLE IF EXISTS items")
+                self._connection.execute("DROP TABLE IF EXISTS tokens")
+                self._connection.execute(f"PRAGMA user_version = {MEDIA_INDEX_SCHEMA_VERSION}")
+
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS items (
+                    path TEXT PRIMARY KEY,
+                    directory TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    record TEXT NOT NULL
+                )
+                """
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_items_directory ON items(directory)")
+
+            # Inverted index of metadata and filename words used by search()
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tokens (
+                    token TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    PRIMARY KEY (token, path)
+                ) WITHOUT ROWID
+                """
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_tokens_path ON tokens(path)")
+
+    def get_directory_records(self, directory):
+        """
+        Get every indexed record for files directly inside a directory.
+
+        Args:
+            directory (str): The absolute directory path.
+
+        Returns:
+            dict: A dictionary of path -> (size, mtime_ns, record_json).
+        """
+        directory = os.path.normpath(directory)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, size, mtime_ns, record FROM items WHERE directory = ?", (directory,)).fetchall()
+        return {path: (size, mtime_ns, record) for path, size, mtime_ns, record in rows}
+
+    def put_records(self, directory, entries):
+        """
+        Insert or replace records for files directly inside a directory.
+
+        Args:
+            directory (str): The absolute directory path.
+            entries (list): A list of (path, size, mtime_ns, record) tuples where record is a dictionary.
+        """
+        if not entries:
+            return
+
+        directory = os.path.normpath(directory)
+        rows = [
+            (path, directory, size, mtime_ns, dumps_json(record).decode("utf-8"))
+            for path, size, mtime_ns, record in entries
+        ]
+        token_rows = [
+            (token, path)
+            for path, _, _, record in entries
+            for token in extract_search_tokens(os.path.basename(path), record.get('metadata'))
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO items (path, directory, size, mtime_ns, record) VALUES (?, ?, ?, ?, ?)", rows)
+            self._connection.executemany("DELETE FROM tokens WHERE path = ?", [(row[0],) for row in rows])
+            self._connection.executemany("INSERT OR IGNORE INTO tokens (token, path) VALUES (?, ?)", token_rows)
+
+    def remove_missing(self, directory, present_paths, present_subdirectory_names):
+        """
+        Remove records for files that are no longer present in a directory, and for everything below
+        its subdirectories that no longer exist.
+
+        Args:
+            directory (str): The absolute directory path.
+            present_paths (set): The paths that still exist in the directory.
+            present_subdirectory_names (set): The names of the directories that still exist in the directory.
+        """
+        directory = os.path.normpath(directory)
+        with self._lock:
+            indexed_paths = [row[0] for row in self._connection.execute(
+                "SELECT path FROM items WHERE directory = ?", (directory,)).fetchall()]
+            indexed_subdirectories = [row[0] for row in self._connection.execute(
+                "SELECT DISTINCT directory FROM items WHERE directory >= ? AND directory < ?",
+                get_descendant_directory_range(directory)).fetchall()]
+        self.remove_records([path for path in indexed_paths if path not in present_paths])
+
+        # Any directory below this one is reached through one of its immediate subdirectories
+        missing_subdirectory_names = {
+            os.path.relpath(subdirectory, directory).split(os.sep)[0] for subdirectory in indexed_subdirectories
+        } - set(present_subdirectory_names)
+        for name in missing_subdirectory_names:
+            self.remove_directory_tree(os.path.join(directory, name))
+
+    def remove_directory_tree(self, directory):
+        """Remove the records for every file in a directory and all directories below it."""
+        directory = os.path.normpath(directory)
+        scope = "directory = ? OR (directory >= ? AND directory < ?)"
+        scope_parameters = (directory, *get_descendant_directory_range(directory))
+        with self._lock, self._connection:
+            self._connection.execute(f"DELETE FROM tokens WHERE path IN (SELECT path FROM items WHERE {scope})", scope_parameters)
+            self._connection.execute(f"DELETE FROM items WHERE {scope}", scope_parameters)
+
+    def remove_records(self, paths):
+        """Remove the records for specific absolute file paths."""
+        rows = [(os.path.normpath(path),) for path in paths]
+        if rows:
+            with self._lock, self._connection:
+                self._connection.executemany("DELETE FROM items WHERE path = ?", rows)
+                self._connection.executemany("DELETE FROM tokens WHERE path = ?", rows)
+
+    def search(self, query_tokens, match_all, directory, recursive, limit, offset):
+        """
+        Find indexed files whose metadata or filename contain the query tokens.
+        Only directories that have been scanned at least once are searchable.
+
+        Args:
+            query_tokens (list): Lowercase tokens. A token ending in '*' matches by prefix.
+            match_all (bool): True to require every token (AND), False to require any token (OR).
+            directory (str): The absolute directory to search in.
+            recursive (bool): Whether to include files in subdirectories of the directory.
+            limit (int): The maximum number of paths to return.
+            offset (int): The number of matching paths to skip.
+
+        Returns:
+            tuple: (list of matching paths, newest first, total number of matches)
+        """
+        if not query_tokens:
+            return [], 0
+
+        token_queries = []
+        token_parameters = []
+        for token in query_tokens:
+            if token.endswith("*") and len(token) > 1:
+                prefix = token[:-1]
+                token_queries.append("SELECT path FROM tokens WHERE token >= ? AND token < ?")
+                token_parameters.extend([prefix, prefix + "\U0010ffff"])
+            else:
+                token_queries.append("SELECT path FROM tokens WHERE token = ?")
+                token_parameters.append(token)
+        matches = (" INTERSECT " if match_all else " UNION ").join(token_queries)
+
+        directory = os.path.normpath(directory)
+        scope = "items.directory = ?"
+        scope_parameters = [directory]
+        if recursive:
+            scope = "(items.directory = ? OR (items.directory >= ? AND items.directory < ?))"
+            scope_parameters.extend(get_descendant_directory_range(directory))
+
+        query = f"FROM items JOIN ({matches}) AS matches ON matches.path = items.path WHERE {scope}"
+        with self._lock:
+            total = self._connection.execute(f"SELECT COUNT(*) {query}", token_parameters + scope_parameters).fetchone()[0]
+            rows = self._connection.execute(
+                f"SELECT items.path {query} ORDER BY items.mtime_ns DESC LIMIT ? OFFSET ?",
+                token_parameters + scope_parameters + [limit, offset]).fetchall()
+
+        return [row[0] for row in rows], total
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+def get_descendant_directory_range(directory):
+    """
+    Get the (lower, upper) bounds of the directory paths below a normalized directory, for "path >= ? AND path < ?".
+    Every directory below this one sorts between "directory/" and "directory" + the next character after the separator.
+    """
+    return directory + os.sep, directory + chr(ord(os.sep) + 1)
+
+def tokenize_search_text(text):
+    """Split text into lowercase search tokens."""
+    return SEARCH_TOKEN_PATTERN.findall(str(text).lower())
+
+def extract_search_tokens(filename, metadata):
+    """
+    Collect the unique search tokens for a file from its name and every string found in its metadata.
+    Strings holding JSON (such as "prompt" and "workflow") are parsed so only their values are indexed.
+    """
+    tokens = set(tokenize_search_text(os.path.splitext(filename)[0]))
+
+    def collect(value):
+        if len(tokens) >= MAX_SEARCH_TOKENS_PER_ITEM:
+            return
+        if isinstance(value, dict):
+            for nested_value in value.values():
+                collect(nested_value)
+        elif isinstance(value, (list, tuple)):
+            for nested_value in value:
+                collect(nested_value)
+        elif isinstance(value, str):
+            stripped = value.strip()
+            if stripped[:1] in ("{", "["):
+                try:
+                    collect(json.loads(stripped))
+                    return
+                except json.JSONDecodeError:
+                    pass
+            tokens.update(tokenize_search_text(value))
+
+    collect(metadata)
+
+    return list(tokens)[:MAX_SEARCH_TOKENS_PER_ITEM]
+
+def is_index_entry_current(entry, size, mtime_ns):
+    """Whether an entry from `MediaIndex.get_directory_records` still describes a file with the given stat values."""
+    return entry is not None and entry[0] == size and entry[1] == mtime_ns
+
+_media_index = None
+_media_index_lock = threading.Lock()
+_media_index_unavailable = False
+
+def get_media_index():
+    """
+    Get the shared MediaIndex, creating it under the JNodes user directory on first use.
+    Returns None if the index cannot be opened, in which case scans fall back to full extraction.
+    """
+    global _media_index, _media_index_unavailable
+
+    if _media_index is not None or _media_index_unavailable:
+        return _media_index
+
+    with _media_index_lock:
+        if _media_index is None and not _media_index_unavailable:
+            try:
+                _media_index = MediaIndex(os.path.join(get_jnodes_user_directory(), MEDIA_INDEX_FILENAME))
+            except Exception as e:
+                _media_index_unavailable = True
+                log_exception("Unable to open media index, scans will not be cached:", e)
+
+    return _media_index
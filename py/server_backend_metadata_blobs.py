@@ -0,0 +1,95 @@
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+# Metadata strings at least this long (usually "workflow" and "prompt") are sent once per listing and referenced by hash
+METADATA_BLOB_MIN_LENGTH = 1024
+
+# The key of the placeholder object that replaces a deduplicated value: {"jnodes_metadata_blob": hash}
+METADATA_BLOB_KEY = "jnodes_metadata_blob"
+
+# Blobs kept in memory for /jnodes_metadata_blob, least recently used are dropped first
+MAX_METADATA_BLOB_STORE_BYTES = 64 * 1024 * 1024
+
+def hash_metadata_blob(value):
+    return hashlib.blake2b(value.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+class MetadataBlobStore:
+    """Remembers recently listed metadata blobs by hash so they can be fetched individually later."""
+
+    def __init__(self, max_bytes=MAX_METADATA_BLOB_STORE_BYTES):
+        self.max_bytes = max_bytes
+        self._blobs = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, blob_hash, value):
+        with self._lock:
+            if blob_hash in self._blobs:
+                self._blobs.move_to_end(blob_hash)
+                return
+
+            self._blobs[blob_hash] = value
+            self._total_bytes += len(value)
+            while self._total_bytes > self.max_bytes and len(self._blobs) > 1:
+                _, removed = self._blobs.popitem(last=False)
+                self._total_bytes -= len(removed)
+
+    def get(self, blob_hash):
+        with self._lock:
+            value = self._blobs.get(blob_hash)
+            if value is not None:
+                self._blobs.move_to_end(blob_hash)
+            return value
+
+metadata_blob_store = MetadataBlobStore()
+
+class MetadataDeduplicator:
+    """
+    Replaces large metadata strings in listing records with {"jnodes_metadata_blob": hash} placeholders.
+    Each distinct value is collected once in self.blobs (hash -> value), to be sent alongside the records.
+    """
+
+    def __init__(self):
+        self.blobs = {}
+
+        # Hashes already handed out by take_new_blobs, for streams that send blobs as they're first referenced
+        self._sent_hashes = set()
+
+        # Records restored from the index hold separate but equal strings, so remember hashes by value as well
+        self._hashes_by_value = {}
+
+    def deduplicate_record(self, record):
+        """Return a shallow copy of a listing record with its large metadata values replaced by placeholders."""
+        metadata = record.get("metadata")
+        if not isinstance(metadata, dict):
+            return record
+
+        deduplicated = dict(record)
+        deduplicated["metadata"] = self._deduplicate_value(metadata)
+        return deduplicated
+
+    def deduplicate_records(self, records):
+        return [self.deduplicate_record(record) for record in records]
+
+    def take_new_blobs(self):
+        """Get the blobs collected since the last call."""
+        new_blobs = {blob_hash: value for blob_hash, value in self.blobs.items() if blob_hash not in self._sent_hashes}
+        self._sent_hashes.update(new_blobs.keys())
+        return new_blobs
+
+    def _deduplicate_value(self, value):
+        if isinstance(value, dict):
+            return {key: self._deduplicate_value(nested_value) for key, nested_value in value.items()}
+
+        if isinstance(value, str) and len(value) >= METADATA_BLOB_MIN_LENGTH:
+            blob_hash = self._hashes_by_value.get(value)
+            if blob_hash is None:
+                blob_hash = hash_metadata_blob(value)
+                self._hashes_by_value[value] = blob_hash
+                self.blobs[blob_hash] = value
+                metadata_blob_store.add(blob_hash, value)
+            return {METADATA_BLOB_KEY: blob_hash}
+
+        return value
@@ -0,0 +1,214 @@
+from io import BytesIO
+
+from PIL import Image
+
+try:
+    import pillow_avif # Registers AVIF with Pillow versions that can't encode it natively
+except ImportError:
+    pass
+
+# Preview formats a client may ask for with "preview=<format>;<quality>": name -> (PIL format, content type, file extension)
+PREVIEW_FORMATS = {
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+}
+
+Image.init()
+if "AVIF" in Image.SAVE:
+    PREVIEW_FORMATS["avif"] = ("AVIF", "image/avif", ".avif")
+
+# Extra encoder options by format. AVIF's default speed is several times slower for little gain at preview sizes.
+PREVIEW_SAVE_OPTIONS = {
+    "avif": {"speed": 8},
+}
+
+DEFAULT_PREVIEW_QUALITY = 90
+
+# "preview=auto;<quality>" picks the first of these formats the client accepts (see negotiate_preview_format)
+NEGOTIATED_PREVIEW_FORMAT = "auto"
+NEGOTIATED_PREVIEW_FORMAT_PREFERENCE = ("avif", "webp", "jpeg")
+
+# Named qualities a preview may ask for instead of a number, by format, as formats reach similar quality at different numbers
+PREVIEW_QUALITY_LADDER = {
+    "small": {"avif": 40, "webp": 60, "jpeg": 65},
+    "medium": {"avif": 55, "webp": 75, "jpeg": 80},
+    "large": {"avif": 70, "webp": 88, "jpeg": 90},
+}
+
+# Resizing with "w"/"h" alone (no "preview") encodes with this
+DEFAULT_RESIZED_PREVIEW = "webp;90"
+
+# How a preview is fit to "w" and "h": inside the box keeping its aspect ratio, or covering it and cropped to it
+PREVIEW_FITS = ("contain", "cover")
+
+MAX_PREVIEW_DIMENSION = 8192
+
+# Images are shrunk by whole factors (reduce()) to at most this multiple of the target before the final resample
+PREVIEW_REDUCING_GAP = 3.0
+
+def parse_preview_dimension(value):
+    """Read a "w" or "h" query parameter. Returns None when it's missing or not a positive number."""
+    try:
+        dimension = int(value)
+    except (TypeError, ValueError):
+        return None
+    return min(dimension, MAX_PREVIEW_DIMENSION) if dimension > 0 else None
+
+def get_accepted_media_types(accept_header):
+    """The media types an Accept header allows (q above 0), lowercased. Wildcards are kept as is."""
+    accepted = set()
+    for media_range in (accept_header or "").split(","):
+        media_type, *media_parameters = media_range.split(";")
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for media_parameter in media_parameters:
+            name, _, value = media_parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        if media_type and quality > 0:
+            accepted.add(media_type)
+    return accepted
+
+def negotiate_preview_format(accept_header, needs_alpha=False):
+    """
+    Pick the best preview format a client can display from its Accept header, out of NEGOTIATED_PREVIEW_FORMAT_PREFERENCE.
+    Formats must be listed explicitly, as "*/*" is also sent by clients that can't decode newer ones (e.g. fetch()).
+    Falls back to JPEG, or webp when the preview must keep an alpha channel.
+    """
+    accepted = get_accepted_media_types(accept_header)
+    for image_format in NEGOTIATED_PREVIEW_FORMAT_PREFERENCE:
+        if image_format in PREVIEW_FORMATS and PREVIEW_FORMATS[image_format][1] in accepted:
+            if not (needs_alpha and image_format == "jpeg"):
+                return image_format
+    return "webp" if needs_alpha else "jpeg"
+
+def is_negotiated_preview_request(query):
+    """Whether a preview's format depends on the request's Accept header, so responses must vary by it."""
+    return query.get('preview', '').split(';')[0] == NEGOTIATED_PREVIEW_FORMAT
+
+def is_preview_request(query):
+    """Whether /jnodes_view_image should re-encode the image rather than send the original file."""
+    return 'preview' in query or parse_preview_dimension(query.get('w')) or parse_preview_dimension(query.get('h'))
+
+def parse_preview_parameters(query, accept_header=None):
+    """
+    Read how a preview should be encoded from /jnodes_view_image's query parameters.
+
+    "preview" is "<format>;<quality>" as in ComfyUI's /view, e.g. "webp;90". Unsupported formats and
+    previews that must keep an alpha channel fall back to webp. The format may also be "auto", to pick
+    the best one accept_header allows, and the quality one of PREVIEW_QUALITY_LADDER's names, e.g. "auto;medium".
+    "w" and "h" give the largest size wanted in pixels (either may be left out) and "fit" one of PREVIEW_FITS.
+    Images are never enlarged.
+
+    Returns:
+        dict: {"image_format", "quality", "channel", "width", "height", "fit"},
+            ready to be used as thumbnail cache key parameters.
+    """
+    preview_info = query.get('preview', DEFAULT_RESIZED_PREVIEW).split(';')
+    channel = query.get('channel', '')
+
+    fit = query.get('fit', PREVIEW_FITS[0])
+    if fit not in PREVIEW_FITS:
+        fit = PREVIEW_FITS[0]
+
+    image_format = "jpeg" if preview_info[0] == "jpg" else preview_info[0]
+    if image_format == NEGOTIATED_PREVIEW_FORMAT:
+        image_format = negotiate_preview_format(accept_header, 'a' in channel)
+    elif image_format not in PREVIEW_FORMATS or 'a' in channel:
+        image_format = 'webp'
+
+    quality = DEFAULT_PREVIEW_QUALITY
+    if preview_info[-1].isdigit():
+        quality = min(int(preview_info[-1]), 100)
+    elif preview_info[-1] in PREVIEW_QUALITY_LADDER:
+        quality = PREVIEW_QUALITY_LADDER[preview_info[-1]][image_format]
+
+    return {
+        "image_format": image_format,
+        "quality": quality,
+        "channel": channel,
+        "width": parse_preview_dimension(query.get('w')),
+        "height": parse_preview_dimension(query.get('h')),
+        "fit": fit,
+    }
+
+def get_scaled_size(source_size, width, height, fit):
+    """
+    The size to scale an image of source_size to for a preview of at most width x height (either may be None).
+    With "cover" and both dimensions, the result covers the box and is cropped to it afterwards.
+    """
+    source_width, source_height = source_size
+    scales = []
+    if width:
+        scales.append(width / source_width)
+    if height:
+        scales.append(height / source_height)
+    if not scales:
+        return source_size
+
+    scale = max(scales) if fit == "cover" else min(scales)
+    if scale >= 1.0:
+        return source_size
+    return max(1, round(source_width * scale)), max(1, round(source_height * scale))
+
+def resize_for_preview(img, width, height, fit):
+    """
+    Shrink a freshly opened (not yet loaded) image for a preview.
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale straight from their DCT coefficients with draft(), so a 4K
+    photo bound for a 256px tile never decodes at full size. Other formats are first shrunk by a whole factor
+    with reduce() (through resize's reducing_gap), which is much cheaper than resampling from full size.
+    """
+    scaled_size = get_scaled_size(img.size, width, height, fit)
+    if scaled_size == img.size:
+        return img
+
+    img.draft(None, scaled_size) # Only does anything for JPEG, picks a decode scale at least as large as scaled_size
+    if img.mode == "P":
+        img = img.convert("RGBA") # Palette images can only be resampled with NEAREST
+    img = img.resize(scaled_size, Image.LANCZOS, reducing_gap=PREVIEW_REDUCING_GAP)
+
+    if fit == "cover" and width and height:
+        crop_width, crop_height = min(width, scaled_size[0]), min(height, scaled_size[1])
+        left = (scaled_size[0] - crop_width) // 2
+        top = (scaled_size[1] - crop_height) // 2
+        img = img.crop((left, top, left + crop_width, top + crop_height))
+
+    return img
+
+def encode_image_preview(file_path, image_format, quality, channel, width=None, height=None, fit=PREVIEW_FITS[0]):
+    """Decode an image and encode it again, optionally smaller, in a lighter format for display. Returns the encoded bytes."""
+    with Image.open(file_path) as img:
+        img = resize_for_preview(img, width, height, fit)
+        if image_format == 'jpeg' or channel == 'rgb':
+            img = img.convert("RGB")
+
+        buffer = BytesIO()
+        img.save(buffer, format=PREVIEW_FORMATS[image_format][0], quality=quality, **PREVIEW_SAVE_OPTIONS.get(image_format, {}))
+        return buffer.getvalue()
+
+def encode_image_channel(file_path, channel):
+    """Encode the "rgb" or alpha ("a") channels of an image as a PNG. Returns the encoded bytes."""
+    with Image.open(file_path) as img:
+        if channel == 'rgb':
+            if img.mode == "RGBA":
+                r, g, b, a = img.split()
+                new_img = Image.merge('RGB', (r, g, b))
+            else:
+                new_img = img.convert("RGB")
+        else:
+            if img.mode == "RGBA":
+                _, _, _, a = img.split()
+            else:
+                a = Image.new('L', img.size, 255)
+
+            # alpha img
+            new_img = Image.new('RGBA', img.size)
+            new_img.putalpha(a)
+
+        buffer = BytesIO()
+        new_img.save(buffer, format='PNG')
+        return buffer.getvalue()
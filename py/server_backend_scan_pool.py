@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import runpy
+import atexit
+import threading
+import contextlib
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .logger import *
+
+# Run in each worker as it starts, so tasks naming functions in py/scan_worker resolve without importing this package
+SCAN_WORKER_STARTUP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scan_worker", "jnodes_worker_startup.py")
+SCAN_WORKER_PACKAGE_NAME = f"{__package__}.scan_worker"
+
+# Set JNODES_SCAN_WORKERS to override the number of scan processes
+SCAN_WORKER_COUNT_ENVIRONMENT_VARIABLE = "JNODES_SCAN_WORKERS"
+
+# How long workers wait for each other to start before the pool is given up on
+SCAN_WORKER_STARTUP_TIMEOUT_SECONDS = 120
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_startup_seconds = None
+
+def get_scan_worker_count():
+    try:
+        return max(1, int(os.environ[SCAN_WORKER_COUNT_ENVIRONMENT_VARIABLE]))
+    except (KeyError, ValueError):
+        return max(1, multiprocessing.cpu_count())
+
+@contextlib.contextmanager
+def _main_module_hidden_from_spawn():
+    """
+    Spawned processes import the parent's main module as __mp_main__ when its __spec__ or __file__ says where it
+    came from. For ComfyUI that's main.py, which loads torch, comfy and every custom node. Clearing both while
+    workers are spawned starts them with nothing but the standard library and what their initializer imports.
+    """
+    main_module = sys.modules["__main__"]
+    hidden_attributes = {name: main_module.__dict__[name] for name in ("__spec__", "__file__") if name in main_module.__dict__}
+    main_module.__spec__ = None
+    main_module.__dict__.pop("__file__", None)
+    try:
+        yield
+    finally:
+        main_module.__dict__.update(hidden_attributes)
+
+def get_scan_worker_pool():
+    """
+    Get the process pool shared by every drawer scan, starting it on first use.
+    The pool lives until ComfyUI exits or reset_scan_worker_pool is called.
+    """
+    global _pool, _pool_startup_seconds
+
+    with _pool_lock:
+        if _pool is None:
+            start_time = time.monotonic()
+            worker_count = get_scan_worker_count()
+            context = multiprocessing.get_context("spawn")
+            startup_globals = {
+                "scan_worker_package_name": SCAN_WORKER_PACKAGE_NAME,
+                "startup_barrier": context.Barrier(worker_count, timeout=SCAN_WORKER_STARTUP_TIMEOUT_SECONDS),
+            }
+            pool = ProcessPoolExecutor(
+                max_workers=worker_count, mp_context=context,
+                initializer=runpy.run_path, initargs=(SCAN_WORKER_STARTUP_PATH, startup_globals))
+
+            # Start every worker now rather than as scan tasks arrive, so their startup is paid and measured once.
+            # Each submission without an idle worker starts another one, and none is idle before all have started
+            # (see startup_barrier), so the pool never spawns a worker after the main module is restored.
+            with _main_module_hidden_from_spawn():
+                startup_futures = [pool.submit(os.getpid) for _ in range(worker_count)]
+            for future in startup_futures:
+                future.result()
+
+            _pool_startup_seconds = time.monotonic() - start_time
+            logger.info(f"Started drawer scan pool with {worker_count} worker processes in {_pool_startup_seconds:.2f} seconds")
+            _pool = pool
+
+        return _pool
+
+def is_scan_worker_pool_running():
+    return _pool is not None
+
+def get_scan_worker_pool_startup_seconds():
+    """How long the last pool took to start, or None if none has been started in this session."""
+    return _pool_startup_seconds
+
+def reset_scan_worker_pool():
+    """Shut down the shared pool, e.g. after a worker died. The next get_scan_worker_pool call starts a new one."""
+    global _pool
+
+    with _pool_lock:
+        pool = _pool
+        _pool = None
+
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(reset_scan_worker_pool)
@@ -0,0 +1,220 @@
+import os
+import json
+import atexit
+import random
+import threading
+
+from .logger import *
+from .utils import get_jnodes_user_directory
+from .server_backend_scan_pool import is_scan_worker_pool_running, get_scan_worker_pool_startup_seconds
+
+SCAN_TIMINGS_FILENAME = "scan_timings.json"
+SCAN_TIMINGS_VERSION = 1
+
+# Set JNODES_SCAN_TUNING=0 to always use the fixed thresholds
+SCAN_TUNING_ENVIRONMENT_VARIABLE = "JNODES_SCAN_TUNING"
+
+# Set JNODES_SCAN_TIMINGS to keep the timings in another file, e.g. so a benchmark doesn't change the real ones
+SCAN_TIMINGS_PATH_ENVIRONMENT_VARIABLE = "JNODES_SCAN_TIMINGS"
+
+# The execution configurations tried for each storage device and kind of file
+SCAN_CONFIGURATIONS = ["sequential", "threads:3", "threads:8", "threads:16", "threads:32", "processes"]
+
+# Batches smaller than this are too noisy to learn from and too quick for the choice to matter
+MIN_TUNING_FILE_COUNT = 32
+
+# Untried configurations are only explored on batches up to this size, so a huge scan is never the experiment
+MAX_EXPLORATION_FILE_COUNT = 2000
+
+# Sequential extraction is only explored on batches up to this size, where even a slow device finishes it quickly
+MAX_SEQUENTIAL_EXPLORATION_FILE_COUNT = 200
+
+# How often a moderate batch re-measures a configuration other than the best one, to follow changing conditions
+EXPLORATION_RATE = 0.05
+
+# Weight of the newest measurement in each configuration's moving average
+TIMING_SMOOTHING = 0.3
+
+# Assumed cost of starting the process pool when it isn't running and hasn't been measured yet
+DEFAULT_POOL_STARTUP_SECONDS = 3.0
+
+# New timings are written out at most this often rather than after every batch
+SCAN_TIMINGS_SAVE_DELAY_SECONDS = 10.0
+
+def parse_scan_configuration(configuration):
+    """Split a configuration such as "threads:8" into ("threads", 8). Worker counts are None where they don't apply."""
+    strategy, _, worker_count = configuration.partition(":")
+    return strategy, int(worker_count) if worker_count else None
+
+def format_scan_configuration(strategy, worker_count):
+    """The configuration name for a strategy and worker count, e.g. ("threads", 8) -> "threads:8"."""
+    return f"{strategy}:{worker_count}" if strategy == "threads" else strategy
+
+def find_mount_point(path):
+    """The mount point of the storage holding path, which identifies the device across restarts."""
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+class ScanTuner:
+    """
+    Learns how long each execution configuration takes per file on each storage device and picks the fastest.
+
+    Timings are kept separately per mount point and per kind of file ("image" or "video"), since a network share
+    and a local SSD, or ffprobe and header parsing, favour very different amounts of concurrency.
+    """
+
+    def __init__(self, timings_path):
+        self.timings_path = timings_path
+        self._lock = threading.Lock()
+        self._timings = self._load()
+        self._mount_points = {} # directory -> find_mount_point(directory)
+        self._save_timer = None # Pending save of new timings, see record
+        atexit.register(self.flush)
+
+    def _load(self):
+        try:
+            with open(self.timings_path, "r", encoding="utf-8") as timings_file:
+                timings = json.load(timings_file)
+            if timings.get("version") == SCAN_TIMINGS_VERSION:
+                return timings
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log_exception("Unable to read scan timings, starting over:", e)
+
+        return {"version": SCAN_TIMINGS_VERSION, "pool_startup_seconds": None, "storage": {}}
+
+    def _save(self):
+        temporary_path = f"{self.timings_path}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as timings_file:
+                json.dump(self._timings, timings_file, indent=2)
+            os.replace(temporary_path, self.timings_path)
+        except Exception as e:
+            log_exception("Unable to save scan timings:", e)
+
+    def flush(self):
+        """Write out timings recorded since the last save now instead of after SCAN_TIMINGS_SAVE_DELAY_SECONDS."""
+        with self._lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            self._save()
+
+    def _get_configuration_timings(self, directory, kind):
+        mount_point = self._mount_points.get(directory)
+        if mount_point is None:
+            mount_point = self._mount_points[directory] = find_mount_point(directory)
+        storage = self._timings["storage"].setdefault(mount_point, {})
+        return storage.setdefault(kind, {})
+
+    def _get_explorable_configurations(self, file_count, default_configuration):
+        """The configurations a batch of file_count files may be used to measure, the default one first."""
+        if file_count > MAX_EXPLORATION_FILE_COUNT:
+            return []
+
+        return sorted(
+            (configuration for configuration in SCAN_CONFIGURATIONS
+             if configuration != "sequential" or file_count <= MAX_SEQUENTIAL_EXPLORATION_FILE_COUNT),
+            key=lambda configuration: configuration != default_configuration)
+
+    def _estimate_seconds(self, configuration, seconds_per_file, file_count):
+        estimate = seconds_per_file * file_count
+        if configuration == "processes" and not is_scan_worker_pool_running():
+            estimate += self._timings.get("pool_startup_seconds") or DEFAULT_POOL_STARTUP_SECONDS
+        return estimate
+
+    def choose(self, directory, kind, file_count, default_configuration):
+        """
+        Pick how to extract a batch of files.
+
+        Args:
+            default_configuration (str): What the fixed thresholds pick for this batch, e.g. "threads:3".
+                It's measured first, so the first scans on a device run the way they would without tuning.
+
+        Returns:
+            tuple: (strategy, worker_count), or None to use the fixed thresholds because nothing is known yet.
+        """
+        if file_count < MIN_TUNING_FILE_COUNT:
+            return None
+
+        with self._lock:
+            configuration_timings = dict(self._get_configuration_timings(directory, kind))
+
+        explorable_configurations = self._get_explorable_configurations(file_count, default_configuration)
+        untried = [configuration for configuration in explorable_configurations if configuration not in configuration_timings]
+        if untried:
+            return parse_scan_configuration(untried[0])
+
+        if not configuration_timings:
+            return None
+
+        if explorable_configurations and random.random() < EXPLORATION_RATE:
+            return parse_scan_configuration(random.choice(explorable_configurations))
+
+        best_configuration = min(
+            configuration_timings,
+            key=lambda configuration: self._estimate_seconds(
+                configuration, configuration_timings[configuration]["seconds_per_file"], file_count))
+        return parse_scan_configuration(best_configuration)
+
+    def record(self, directory, kind, strategy, worker_count, file_count, seconds, started_scan_worker_pool=False):
+        """
+        Fold the duration of one batch into the moving average for its configuration.
+
+        Args:
+            started_scan_worker_pool (bool): Whether the batch had to start the scan pool first. Its startup time
+                is taken out, since _estimate_seconds adds it back only for scans that will have to pay it again.
+        """
+        pool_startup_seconds = get_scan_worker_pool_startup_seconds()
+        if started_scan_worker_pool and pool_startup_seconds is not None:
+            seconds -= pool_startup_seconds
+
+        if file_count < MIN_TUNING_FILE_COUNT or seconds <= 0:
+            return
+
+        configuration = format_scan_configuration(strategy, worker_count)
+        if configuration not in SCAN_CONFIGURATIONS:
+            return
+
+        seconds_per_file = seconds / file_count
+        with self._lock:
+            configuration_timings = self._get_configuration_timings(directory, kind)
+            timing = configuration_timings.get(configuration)
+            if timing is None:
+                configuration_timings[configuration] = {"seconds_per_file": seconds_per_file, "samples": 1}
+            else:
+                timing["seconds_per_file"] += (seconds_per_file - timing["seconds_per_file"]) * TIMING_SMOOTHING
+                timing["samples"] += 1
+
+            if pool_startup_seconds is not None:
+                self._timings["pool_startup_seconds"] = pool_startup_seconds
+
+            # Scans extract in several batches, so their timings are written together once they're done
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SCAN_TIMINGS_SAVE_DELAY_SECONDS, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+_scan_tuner = None
+_scan_tuner_lock = threading.Lock()
+
+def get_scan_tuner():
+    """Get the shared ScanTuner, or None if tuning is disabled with JNODES_SCAN_TUNING=0."""
+    global _scan_tuner
+
+    if os.environ.get(SCAN_TUNING_ENVIRONMENT_VARIABLE, "1") == "0":
+        return None
+
+    with _scan_tuner_lock:
+        if _scan_tuner is None:
+            timings_path = os.environ.get(SCAN_TIMINGS_PATH_ENVIRONMENT_VARIABLE) or os.path.join(get_jnodes_user_directory(), SCAN_TIMINGS_FILENAME)
+            _scan_tuner = ScanTuner(timings_path)
+
+    return _scan_tuner
@@ -0,0 +1,116 @@
+import gzip
+import zlib
+
+from aiohttp import web
+
+from .logger import *
+# JSON encoding is shared with the scan workers and the media index, which can't import aiohttp
+from .scan_worker.jnodes_json_values import normalize_json_value, dumps_json, loads_json
+
+# brotli is optional; without it responses are compressed with gzip
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Responses smaller than this aren't worth the time it takes to compress them
+MIN_COMPRESSED_RESPONSE_BYTES = 16 * 1024
+
+# Favour speed: listings are compressed on every request and mostly made of repeated workflow text
+GZIP_COMPRESSION_LEVEL = 5
+BROTLI_COMPRESSION_QUALITY = 4
+
+def get_accepted_encodings(request):
+    """The content codings the client accepts, from its Accept-Encoding header, ignoring any with q=0."""
+    encodings = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, parameters = part.strip().partition(";")
+        parameters = parameters.replace(" ", "")
+        if coding and parameters not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(coding.lower())
+    return encodings
+
+_is_server_compressing_responses = None
+
+def is_server_compressing_responses():
+    """Whether ComfyUI was started with --enable-compress-response-body, which compresses JSON responses itself."""
+    global _is_server_compressing_responses
+    if _is_server_compressing_responses is None:
+        try:
+            from comfy.cli_args import args
+            _is_server_compressing_responses = bool(getattr(args, "enable_compress_response_body", False))
+        except Exception:
+            _is_server_compressing_responses = False
+    return _is_server_compressing_responses
+
+def choose_content_encoding(request):
+    """Pick "br" or "gzip" for a response to this request, or None if the client accepts neither."""
+    if request is None:
+        return None
+    encodings = get_accepted_encodings(request)
+    if brotli is not None and "br" in encodings:
+        return "br"
+    if "gzip" in encodings:
+        return "gzip"
+    return None
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_COMPRESSION_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_COMPRESSION_LEVEL)
+
+def json_response(data, status=200, headers=None, request=None):
+    """
+    Drop-in replacement for web.json_response used by every /jnodes_* handler.
+
+    Args:
+        request (web.Request): When given, bodies of at least MIN_COMPRESSED_RESPONSE_BYTES are compressed
+            with brotli or gzip if the client accepts it. Compression happens here rather than in aiohttp
+            so it runs on the handler's executor thread instead of the event loop.
+    """
+    body = dumps_json(data)
+    headers = dict(headers or {})
+
+    # Leave compression to ComfyUI when it does it, so the body isn't compressed twice
+    if len(body) >= MIN_COMPRESSED_RESPONSE_BYTES and not is_server_compressing_responses():
+        encoding = choose_content_encoding(request)
+        if encoding:
+            try:
+                body = compress_body(body, encoding)
+                headers["Content-Encoding"] = encoding
+            except Exception as e:
+                log_exception("Error compressing response:", e)
+        headers["Vary"] = "Accept-Encoding"
+
+    return web.Response(body=body, status=status, headers=headers, content_type="application/json", charset="utf-8")
+
+class StreamCompressor:
+    """
+    Compresses a streamed response incrementally. Every call to compress() flushes, so each chunk written
+    can be decoded by the client as soon as it arrives and items still render while the scan is running.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_COMPRESSION_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+def make_stream_compressor(request):
+    """A StreamCompressor for a streamed response to this request, or None if the client accepts no compression."""
+    encoding = choose_content_encoding(request)
+    return StreamCompressor(encoding) if encoding else None
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import concurrent.futures
+
+class _Flight:
+    """One coalesced coroutine and the abandonment checks of everyone waiting for it."""
+
+    __slots__ = ("task", "abandonment_checks")
+
+    def __init__(self):
+        self.task = None
+        self.abandonment_checks = []
+
+    def is_abandoned(self):
+        # Callers without a check always want the result
+        return all(check is not None and check() for check in self.abandonment_checks)
+
+def _always_abandoned():
+    return True
+
+class SingleFlight:
+    """
+    Coalesces identical work that is requested again while it's still running: the first caller for a key does it,
+    callers arriving before it's done wait for and share its result (or exception), and the key is forgotten once
+    it completes. Nothing is cached beyond that; keys should identify the exact inputs, e.g. a file's path with
+    its mtime and size and the normalized request parameters, so waiters never get a result for an older file.
+
+    run() is for coroutines on the event loop, call() for blocking functions on any thread.
+    Results are shared as is, so callers must not modify them.
+    """
+
+    def __init__(self):
+        self._flights = {} # key -> _Flight, only touched on the event loop
+        self._calls = {} # key -> concurrent.futures.Future
+        self._lock = threading.Lock()
+
+    async def run(self, key, coroutine_function, *args, is_abandoned=None, **kwargs):
+        """
+        Await coroutine_function(*args, **kwargs), or the same call already running for key.
+
+        Args:
+            is_abandoned (callable): Whether this caller no longer wants the result, e.g. because its client went away.
+                If the first caller gives one, coroutine_function is passed is_abandoned too: a check that is True once
+                every caller waiting for key is abandoned, so the shared work can be dropped before it starts.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            if is_abandoned:
+                kwargs["is_abandoned"] = flight.is_abandoned
+            flight.task = asyncio.ensure_future(coroutine_function(*args, **kwargs))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda finished_task: self._forget_flight(key, flight))
+
+        check_index = len(flight.abandonment_checks)
+        flight.abandonment_checks.append(is_abandoned)
+        try:
+            # A waiter going away doesn't cancel the work for the others
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.abandonment_checks[check_index] = _always_abandoned
+            raise
+
+    def _forget_flight(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            flight.task.exception() # Retrieved here too, so it isn't reported as unhandled when every waiter went away
+
+    def call(self, key, function, *args, **kwargs):
+        """Return function(*args, **kwargs), or wait for the same call already running for key on another thread."""
+        with self._lock:
+            future = self._calls.get(key)
+            is_first_caller = future is None
+            if is_first_caller:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+
+        if not is_first_caller:
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+single_flight = SingleFlight()
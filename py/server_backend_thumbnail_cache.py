@@ -0,0 +1,184 @@
+import os
+import uuid
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+from .logger import *
+from .utils import get_jnodes_user_directory
+
+THUMBNAIL_CACHE_DIRECTORY_NAME = "thumbnail_cache"
+
+# Set JNODES_THUMBNAIL_CACHE_MB to change how much disk space cached previews may use, or to 0 to disable the cache
+THUMBNAIL_CACHE_SIZE_ENVIRONMENT_VARIABLE = "JNODES_THUMBNAIL_CACHE_MB"
+DEFAULT_THUMBNAIL_CACHE_MEGABYTES = 1024
+
+def make_thumbnail_cache_key(full_path, stat, **parameters):
+    """
+    Identify one rendition of a file. Any change to the source (its mtime or size) or to how the preview
+    is made (dimensions, format, quality, channel...) gives a different key, so stale entries are never served;
+    they just age out of the cache.
+    """
+    description = repr((os.path.normcase(os.path.abspath(full_path)), stat.st_mtime_ns, stat.st_size, sorted(parameters.items())))
+    return hashlib.blake2b(description.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+class ThumbnailCache:
+    """
+    Encoded previews stored on disk, evicting the least recently used once they exceed max_bytes.
+
+    Files are named after their key and sharded by its first two characters. Recency is kept in memory
+    and in each file's mtime, which is updated on every hit, so the order survives restarts.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        # key -> (path, size), least recently used first
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        found = []
+        for shard in os.listdir(self.directory):
+            shard_directory = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_directory):
+                continue
+            for file_name in os.listdir(shard_directory):
+                path = os.path.join(shard_directory, file_name)
+                try:
+                    if file_name.endswith(".tmp"): # Left over from a write that was interrupted
+                        os.remove(path)
+                        continue
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime_ns, os.path.splitext(file_name)[0], path, stat.st_size))
+
+        for _, key, path, size in sorted(found):
+            self._entries[key] = (path, size)
+            self._total_bytes += size
+
+        self._remove_files(self._evict())
+
+    def _get_path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f"{key}{extension}")
+
+    def get(self, key):
+        """Get the path of a cached preview, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+
+        path = entry[0]
+        try:
+            os.utime(path)
+        except OSError: # Removed behind our back
+            with self._lock:
+                if self._entries.pop(key, None) is not None:
+                    self._total_bytes -= entry[1]
+            return None
+
+        return path
+
+    def read(self, key):
+        """Get the bytes of a cached preview, or None on a miss."""
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as cache_file:
+                return cache_file.read()
+        except OSError:
+            return None
+
+    def put(self, key, data, extension):
+        """Store an encoded preview. extension (e.g. ".webp") lets responses served from the file get the right type."""
+        path = self._get_path(key, extension)
+        temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temporary_path, "wb") as cache_file:
+                cache_file.write(data)
+            os.replace(temporary_path, path)
+        except OSError as e:
+            log_exception("Unable to write to the thumbnail cache:", e)
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            previous_entry = self._entries.pop(key, None)
+            if previous_entry is not None:
+                self._total_bytes -= previous_entry[1]
+            self._entries[key] = (path, len(data))
+            self._total_bytes += len(data)
+            evicted_paths = self._evict()
+
+        self._remove_files(evicted_paths)
+
+    def _evict(self):
+        """Drop entries until the cache fits, returning their paths to remove. Always keeps the newest entry."""
+        evicted_paths = []
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (path, size) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            evicted_paths.append(path)
+        return evicted_paths
+
+    def _remove_files(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass # Still being served on Windows, or already gone; found again and evicted on the next start
+
+    def clear(self):
+        with self._lock:
+            paths = [path for path, _ in self._entries.values()]
+            self._entries.clear()
+            self._total_bytes = 0
+        self._remove_files(paths)
+
+_thumbnail_cache = None
+_thumbnail_cache_unavailable = False
+_thumbnail_cache_lock = threading.Lock()
+
+def get_thumbnail_cache_max_bytes():
+    try:
+        megabytes = float(os.environ[THUMBNAIL_CACHE_SIZE_ENVIRONMENT_VARIABLE])
+    except (KeyError, ValueError):
+        megabytes = DEFAULT_THUMBNAIL_CACHE_MEGABYTES
+    return int(max(megabytes, 0) * 1024 * 1024)
+
+def get_thumbnail_cache():
+    """
+    Get the shared ThumbnailCache, creating it under the JNodes user directory on first use.
+    Returns None if the cache is disabled or cannot be created, in which case previews are encoded for every request.
+    """
+    global _thumbnail_cache, _thumbnail_cache_unavailable
+
+    if _thumbnail_cache is not None or _thumbnail_cache_unavailable:
+        return _thumbnail_cache
+
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is None and not _thumbnail_cache_unavailable:
+            max_bytes = get_thumbnail_cache_max_bytes()
+            if max_bytes <= 0:
+                _thumbnail_cache_unavailable = True
+                return None
+            try:
+                _thumbnail_cache = ThumbnailCache(get_jnodes_user_directory(THUMBNAIL_CACHE_DIRECTORY_NAME), max_bytes)
+            except Exception as e:
+                _thumbnail_cache_unavailable = True
+                log_exception("Unable to open thumbnail cache, previews will not be cached:", e)
+
+    return _thumbnail_cache
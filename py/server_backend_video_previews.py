@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+
+from io import BytesIO
+
+from PIL import Image
+
+from .logger import *
+from .server_backend_previews import PREVIEW_FORMATS, DEFAULT_PREVIEW_QUALITY, parse_preview_dimension
+
+# What /jnodes_view_video_preview can make of a video: kind -> (content type, file extension)
+VIDEO_PREVIEW_KINDS = {
+    "poster": ("image/webp", ".webp"), # The first frame, as a still for tiles that aren't playing
+    "loop": ("video/mp4", ".mp4"), # A short, small, silent clip for tiles to play in place of the original
+}
+
+DEFAULT_VIDEO_PREVIEW_WIDTH = 512
+
+# Loops are cut to this many seconds, at most this wide and at this frame rate, and encoded with this x264 CRF
+VIDEO_LOOP_SECONDS = 6
+MAX_VIDEO_LOOP_WIDTH = 640
+VIDEO_LOOP_FPS = 15
+VIDEO_LOOP_CRF = 30
+
+# ffmpeg is stopped after this many seconds, e.g. on a file still being written
+FFMPEG_TIMEOUT_SECONDS = 60
+
+_ffmpeg_path = None
+_has_searched_for_ffmpeg = False
+_ffmpeg_lock = threading.Lock()
+
+def get_ffmpeg_path():
+    """Find ffmpeg on PATH, or the one bundled with imageio-ffmpeg. Returns None if there is neither."""
+    global _ffmpeg_path, _has_searched_for_ffmpeg
+
+    with _ffmpeg_lock:
+        if not _has_searched_for_ffmpeg:
+            _has_searched_for_ffmpeg = True
+            _ffmpeg_path = shutil.which("ffmpeg")
+            if _ffmpeg_path is None:
+                try:
+                    from imageio_ffmpeg import get_ffmpeg_exe
+                    _ffmpeg_path = get_ffmpeg_exe()
+                except Exception:
+                    logger.warning("ffmpeg could not be found. Video previews have been disabled")
+
+    return _ffmpeg_path
+
+def parse_video_preview_parameters(query):
+    """
+    Read which video preview /jnodes_view_video_preview should make from its query parameters:
+    "kind" is one of VIDEO_PREVIEW_KINDS and "w" the largest width wanted. Videos are never enlarged.
+
+    Returns:
+        dict: {"kind", "width"}, ready to be used as thumbnail cache key parameters. None for an unknown kind.
+    """
+    kind = query.get("kind", "poster")
+    if kind not in VIDEO_PREVIEW_KINDS:
+        return None
+
+    width = parse_preview_dimension(query.get("w")) or DEFAULT_VIDEO_PREVIEW_WIDTH
+    if kind == "loop":
+        width = min(width, MAX_VIDEO_LOOP_WIDTH)
+
+    return {"kind": kind, "width": width}
+
+def run_ffmpeg(arguments):
+    """Run ffmpeg with arguments and return what it wrote to stdout. Raises RuntimeError if it fails."""
+    ffmpeg_path = get_ffmpeg_path()
+    if ffmpeg_path is None:
+        raise RuntimeError("ffmpeg could not be found")
+
+    result = subprocess.run(
+        [ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin", *arguments],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=FFMPEG_TIMEOUT_SECONDS
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {result.returncode}: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+def get_scale_filter(width):
+    # Only ever shrink, and keep both sides even as yuv420p requires
+    return f"scale='trunc(min({width},iw)/2)*2':-2"
+
+def encode_video_poster(file_path, width):
+    """Grab the first frame of a video and encode it as a webp at most width wide. Returns the encoded bytes."""
+    frame = run_ffmpeg([
+        "-i", file_path, "-an", "-frames:v", "1", "-vf", get_scale_filter(width),
+        "-f", "image2pipe", "-c:v", "png", "-"
+    ])
+    if not frame:
+        raise RuntimeError("ffmpeg returned no frame")
+
+    with Image.open(BytesIO(frame)) as img:
+        buffer = BytesIO()
+        img.save(buffer, format=PREVIEW_FORMATS["webp"][0], quality=DEFAULT_PREVIEW_QUALITY)
+        return buffer.getvalue()
+
+def encode_video_loop(file_path, width):
+    """Encode the start of a video as a short, silent, low bitrate mp4 at most width wide. Returns the encoded bytes."""
+    # mp4 needs a seekable output to put its index first (faststart), so encode to a file rather than a pipe
+    file_descriptor, temporary_path = tempfile.mkstemp(prefix="jnodes_loop_", suffix=".mp4")
+    os.close(file_descriptor)
+
+    try:
+        run_ffmpeg([
+            "-t", str(VIDEO_LOOP_SECONDS), "-i", file_path, "-an",
+            "-vf", f"{get_scale_filter(width)},fps={VIDEO_LOOP_FPS}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", str(VIDEO_LOOP_CRF), "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart", "-f", "mp4", "-y", temporary_path
+        ])
+        with open(temporary_path, "rb") as loop_file:
+            return loop_file.read()
+    finally:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+def encode_video_preview(file_path, kind, width):
+    """Make a video preview of the given kind (see VIDEO_PREVIEW_KINDS). Returns the encoded bytes."""
+    if kind == "loop":
+        return encode_video_loop(file_path, width)
+    return encode_video_poster(file_path, width)
@@ -0,0 +1,316 @@
+import os
+import time
+import atexit
+import threading
+
+from collections import OrderedDict
+
+from .logger import *
+from .utils import *
+from .server_backend_media_index import get_media_index
+from .server_backend_directory_tree import directory_tree_cache
+from .server_backend_get_subdirectory_images import process_acceptable_item, get_creation_time_from_stat, make_index_record
+
+import server
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# The root directories the drawer exposes that may be watched
+WATCHABLE_ROOT_DIRECTORIES = ["output", "input", "temp"]
+
+# The websocket event carrying batches of changes to open drawers
+DRAWER_UPDATE_EVENT = "jnodes.drawer.update"
+
+# Set JNODES_DISABLE_DRAWER_WATCHER=1 to never watch directories
+WATCHER_DISABLE_ENVIRONMENT_VARIABLE = "JNODES_DISABLE_DRAWER_WATCHER"
+
+# A file must go this long without new events before it's reported, so files still being written are read once
+SETTLE_TIME_SECONDS = 1.0
+FLUSH_INTERVAL_SECONDS = 0.5
+POLL_INTERVAL_SECONDS = 5.0
+
+# Without watchdog, only the directories most recently listed by drawers are polled, up to this many
+MAX_POLLED_DIRECTORIES = 8
+
+# Polling waits at least this many times as long as the last pass took, so a large tree on a slow drive isn't re-listed nonstop
+POLL_BACKOFF_FACTOR = 20
+
+class _WatchdogEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.queue_change(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.queue_change(event.src_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher.queue_change(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.queue_change(event.src_path)
+            self.watcher.queue_change(event.dest_path)
+
+class DrawerWatcher:
+    """
+    Watches one drawer root directory and sends added/modified/removed records to open drawers over the websocket.
+
+    Uses watchdog (inotify, FSEvents, ReadDirectoryChangesW) when it's installed. Otherwise a polling thread
+    compares directory mtimes, which catches files being added or removed but not files rewritten in place.
+    Polling only covers the directories drawers listed most recently (see watch_directory), not the whole root.
+    """
+
+    def __init__(self, root_name, root_path):
+        self.root_name = root_name
+        self.root_path = os.path.normpath(root_path)
+
+        # path -> time of the last event seen for it
+        self._pending_changes = {}
+        self._pending_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        self._observer = None
+        self._threads = []
+
+        # Polling state: directory -> (mtime_ns, {file name: (size, mtime_ns)}, set of subdirectory names)
+        self._polled_directories = {}
+        self._visited_directories = set() # Directories polled in the current pass
+
+        # Directories drawers listed, most recent last: directory -> (whether its subdirectories are included, time listed in ns)
+        self._open_directories = OrderedDict()
+        self._open_directories_lock = threading.Lock()
+
+    def start(self):
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_WatchdogEventHandler(self), self.root_path, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+            logger.info(f"Watching '{self.root_path}' for drawer updates with watchdog")
+        else:
+            self._start_thread(self._poll_loop)
+            logger.info(f"Watching '{self.root_path}' for drawer updates by polling (install watchdog for instant updates)")
+
+        self._start_thread(self._flush_loop)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+
+    def _start_thread(self, target):
+        thread = threading.Thread(target=target, name=f"JNodesDrawerWatcher-{self.root_name}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def watch_directory(self, directory, recursive):
+        """Poll a directory a drawer just listed, dropping the least recently listed one past MAX_POLLED_DIRECTORIES."""
+        directory = os.path.normpath(directory)
+        with self._open_directories_lock:
+            previous = self._open_directories.get(directory)
+            self._open_directories[directory] = (recursive or (previous is not None and previous[0]), time.time_ns())
+            self._open_directories.move_to_end(directory)
+            while len(self._open_directories) > MAX_POLLED_DIRECTORIES:
+                self._open_directories.popitem(last=False)
+
+    def queue_change(self, path):
+        if not is_acceptable_image_or_video_for_browser_display(os.path.basename(path)):
+            return
+        with self._pending_lock:
+            self._pending_changes[os.path.normpath(path)] = time.monotonic()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(FLUSH_INTERVAL_SECONDS):
+            try:
+                self._flush_settled_changes()
+            except Exception as e:
+                log_exception("Error sending drawer updates:", e)
+
+    def _flush_settled_changes(self):
+        now = time.monotonic()
+        with self._pending_lock:
+            settled_paths = [path for path, last_event_time in self._pending_changes.items() if now - last_event_time >= SETTLE_TIME_SECONDS]
+            for path in settled_paths:
+                del self._pending_changes[path]
+
+        if not settled_paths:
+            return
+
+        media_index = get_media_index()
+        index_entries_by_directory = {}
+        changes = []
+        for path in settled_paths:
+            item = os.path.basename(path)
+            subdirectory = os.path.relpath(os.path.dirname(path), self.root_path)
+            subdirectory = "" if subdirectory == "." else subdirectory.replace("\\", "/")
+
+            # Rewriting a file in place doesn't change its directory's mtime, so its cached counts must be dropped here
+            directory_tree_cache.invalidate(os.path.dirname(path))
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if media_index:
+                    media_index.remove_records([path])
+                changes.append({"type": "removed", "subdirectory": subdirectory, "item": item, "record": None})
+                continue
+
+            directory = os.path.dirname(path)
+            if directory not in index_entries_by_directory:
+                index_entries_by_directory[directory] = media_index.get_directory_records(directory) if media_index else {}
+            change_type = "modified" if path in index_entries_by_directory[directory] else "added"
+
+            record = process_acceptable_item(item, subdirectory, path, (stat.st_size, get_creation_time_from_stat(stat)))
+            if media_index and record['metadata_read']:
+                media_index.put_records(directory, [(path, stat.st_size, stat.st_mtime_ns, make_index_record(record))])
+
+            changes.append({"type": change_type, "subdirectory": subdirectory, "item": item, "record": record})
+
+        server.PromptServer.instance.send_sync(DRAWER_UPDATE_EVENT, {"root_directory": self.root_name, "changes": changes})
+
+    def _poll_directory(self, directory, recursive, listed_time_ns):
+        """
+        Re-list a directory whose mtime changed, queueing changes for files that appeared, vanished or changed size.
+        The first time a directory is polled, files changed since listed_time_ns are queued, since the drawer's listing may have missed them.
+        """
+        if directory in self._visited_directories:
+            return
+        self._visited_directories.add(directory)
+
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            self._forget_directory(directory, queue_removals=True)
+            return
+
+        previous = self._polled_directories.get(directory)
+        if previous is not None and previous[0] == mtime_ns:
+            if recursive:
+                for subdirectory_name in previous[2]:
+                    self._poll_directory(os.path.join(directory, subdirectory_name), recursive, listed_time_ns)
+            return
+
+        files = {}
+        subdirectory_names = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            subdirectory_names.add(entry.name)
+                        elif is_acceptable_image_or_video_for_browser_display(entry.name):
+                            entry_stat = entry.stat()
+                            files[entry.name] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            self._forget_directory(directory, queue_removals=True)
+            return
+
+        if previous is None:
+            for name, (_, file_mtime_ns) in files.items():
+                if file_mtime_ns >= listed_time_ns:
+                    self.queue_change(os.path.join(directory, name))
+        else:
+            previous_files = previous[1]
+            for name in files.keys() | previous_files.keys():
+                if files.get(name) != previous_files.get(name):
+                    self.queue_change(os.path.join(directory, name))
+            for subdirectory_name in previous[2] - subdirectory_names:
+                self._forget_directory(os.path.join(directory, subdirectory_name), queue_removals=True)
+
+        self._polled_directories[directory] = (mtime_ns, files, subdirectory_names)
+
+        if not recursive:
+            return
+
+        for subdirectory_name in subdirectory_names:
+            subdirectory = os.path.join(directory, subdirectory_name)
+            is_new_directory = previous is not None and subdirectory not in self._polled_directories
+            self._poll_directory(subdirectory, recursive, listed_time_ns)
+            if is_new_directory:
+                # Everything in a directory that appeared after the first poll is new
+                for name in self._polled_directories.get(subdirectory, (0, {}, set()))[1]:
+                    self.queue_change(os.path.join(subdirectory, name))
+
+    def _forget_directory(self, directory, queue_removals):
+        previous = self._polled_directories.pop(directory, None)
+        if previous is None:
+            return
+        if queue_removals:
+            for name in previous[1]:
+                self.queue_change(os.path.join(directory, name))
+        for subdirectory_name in previous[2]:
+            self._forget_directory(os.path.join(directory, subdirectory_name), queue_removals)
+
+    def _poll_open_directories(self):
+        with self._open_directories_lock:
+            open_directories = list(self._open_directories.items())
+
+        self._visited_directories = set()
+        # Recursive listings first, so directories they cover aren't listed again on their own
+        for directory, (recursive, listed_time_ns) in sorted(open_directories, key=lambda open_directory: not open_directory[1][0]):
+            self._poll_directory(directory, recursive, listed_time_ns)
+
+        # Directories no drawer shows anymore are forgotten, and polled afresh if they're listed again
+        for directory in self._polled_directories.keys() - self._visited_directories:
+            del self._polled_directories[directory]
+
+    def _poll_loop(self):
+        poll_interval_seconds = POLL_INTERVAL_SECONDS
+        while not self._stop_event.wait(poll_interval_seconds):
+            start_time = time.monotonic()
+            try:
+                self._poll_open_directories()
+            except Exception as e:
+                log_exception("Error polling for drawer updates:", e)
+            poll_interval_seconds = max(POLL_INTERVAL_SECONDS, (time.monotonic() - start_time) * POLL_BACKOFF_FACTOR)
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+def start_drawer_watcher(root_name, selected_subdirectory="", recursive=False):
+    """
+    Start watching one of the drawer's root directories, if it isn't watched already, and poll the listed
+    subdirectory if watchdog isn't available (see DrawerWatcher.watch_directory).
+    Does nothing for roots other than WATCHABLE_ROOT_DIRECTORIES or when watching is disabled.
+    """
+    if root_name not in WATCHABLE_ROOT_DIRECTORIES or os.environ.get(WATCHER_DISABLE_ENVIRONMENT_VARIABLE, "") not in ("", "0"):
+        return
+
+    with _watchers_lock:
+        watcher = _watchers.get(root_name)
+        if watcher is None:
+            root_path = convert_relative_comfyui_path_to_full_path(root_name)
+            if not os.path.isdir(root_path):
+                return
+
+            try:
+                watcher = DrawerWatcher(root_name, root_path)
+                watcher.start()
+                _watchers[root_name] = watcher
+            except Exception as e:
+                log_exception(f"Unable to watch '{root_path}' for drawer updates:", e)
+                return
+
+    directory = os.path.normpath(os.path.join(watcher.root_path, selected_subdirectory))
+    if os.path.commonpath([watcher.root_path, directory]) == watcher.root_path:
+        watcher.watch_directory(directory, recursive)
+
+def stop_drawer_watchers():
+    with _watchers_lock:
+        for watcher in _watchers.values():
+            watcher.stop()
+        _watchers.clear()
+
+atexit.register(stop_drawer_watchers)
@@ -390,6 +390,12 @@ def is_pil_image(obj):
 def is_torch_tensor(obj):
     return isinstance(obj, torch.Tensor)
 
+def get_jnodes_user_directory(*subdirectories):
+    """Get (and create if needed) a directory under ComfyUI's user directory reserved for JNodes data."""
+    directory = os.path.join(folder_paths.get_user_directory(), "jnodes", *subdirectories)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
 def get_creation_time(file_path):
     """Get file creation time if available, otherwise fallback to modification time."""
     try:
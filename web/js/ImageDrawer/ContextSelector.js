@@ -133,9 +133,14 @@ class ImageDrawerContextSelector extends ImageDrawerComponent {
 			// Add an event listener for the "change" event
 			this.ContextSelector.addEventListener("change", async () => {
 				const selectedValue = this.ContextSelector.value;
+
+				// Stop whatever the context we're leaving was still loading
+				const lastContextObject = this.lastSelectedContextOption ? this.getContextObjectFromName(this.lastSelectedContextOption) : null;
+				if (lastContextObject) {
+					await lastContextObject.cancelBackendJob();
+				}
+
 				await this._onOptionSelected(selectedValue); // don't call setOptionSelected to avoid infinite recursion
-				await api.fetchApi(
-					'/jnodes_request_task_cancellation', { method: "POST"});
 			});
 		}
 
@@ -167,6 +167,45 @@ export class ImageDrawerContext {
 		return false;
 	}
 
+	// Start tracking a new long-running backend request. Returns the job id to send with it as "job_id".
+	startBackendJob() {
+		this.stopTrackingBackendJobProgress();
+		this.activeJobId = utilitiesInstance.createJobId();
+		return this.activeJobId;
+	}
+
+	// Cancel this context's running backend request without affecting other tabs or contexts
+	async cancelBackendJob() {
+		if (!this.activeJobId) { return; }
+
+		const jobId = this.activeJobId;
+		this.activeJobId = null;
+		this.stopTrackingBackendJobProgress();
+		await utilitiesInstance.requestJobCancellation(jobId);
+	}
+
+	// Show the progress of a backend job in a label until the job finishes
+	trackBackendJobProgress(jobId, label, textPrefix) {
+		this.stopTrackingBackendJobProgress();
+
+		this._jobProgressListener = ({ detail }) => {
+			if (detail?.job_id != jobId) { return; }
+			if (detail.finished) {
+				this.stopTrackingBackendJobProgress();
+				return;
+			}
+			label.textContent = `${textPrefix} (${utilitiesInstance.formatJobProgress(detail)})`;
+		};
+		api.addEventListener("jnodes.job.progress", this._jobProgressListener);
+	}
+
+	stopTrackingBackendJobProgress() {
+		if (this._jobProgressListener) {
+			api.removeEventListener("jnodes.job.progress", this._jobProgressListener);
+			this._jobProgressListener = null;
+		}
+	}
+
 	onRequestShowInFileManager(item) {
 		if (item && item.showInFileManager) {
 			item.showInFileManager();
@@ -353,6 +392,27 @@ export class ContextRefreshable extends ImageDrawerContext {
 
 const SUBDIRECTORY_PLACEHOLDER = "Please select a subdirectory";
 
+// Record fields the subdirectory explorer lists: only what a stat gives, so a folder lists without opening its files.
+// Dimensions are loaded as tiles come into view (see ImageElements). Metadata is searched on the server (see
+// searchMediaIndex), loaded on demand for regex search, or read from the file itself once an element loads.
+const LISTING_FIELDS = "item,subdirectory,format,file_age,file_size,is_video";
+
+// Sorting by dimensions needs them for every item up front rather than as tiles come into view
+const DIMENSION_LISTING_FIELDS = `${LISTING_FIELDS},dimensions,metadata_read,frame_count,fps,duration_in_seconds`;
+const DIMENSION_SORT_TYPES = [SortTypes.SortTypeImageWidth, SortTypes.SortTypeImageHeight, SortTypes.SortTypeImageAspectRatio];
+
+// Folders with more items than this are listed a page at a time when the server can sort them the way the drawer is sorted
+const PAGED_LISTING_MIN_ITEM_COUNT = 5000;
+const LISTING_PAGE_SIZE = 500;
+// Matches of a server-side search are fetched this many at a time
+const SEARCH_PAGE_SIZE = 5000;
+
+const LISTING_SERVER_SORTS = new Map([
+	[SortTypes.SortTypeDate, "file_age"],
+	[SortTypes.SortTypeFilename, "name"],
+	[SortTypes.SortTypeFileSize, "file_size"],
+]);
+
 export class ContextModel extends ContextRefreshable {
 	constructor(name, description, imageDrawerInstance, type) {
 		super(name, description, imageDrawerInstance);
@@ -361,7 +421,7 @@ export class ContextModel extends ContextRefreshable {
 		this.subdirectorySelector = null;
 	}
 
-	async getModels(bForceRefresh = false, signal = undefined) { }
+	async getModels(bForceRefresh = false, signal = undefined, jobId = undefined) { }
 
 	async updateSubdirectorySelectorOptions() {
 
@@ -377,8 +437,7 @@ export class ContextModel extends ContextRefreshable {
 
 		let subdirectories;
 		try {
-			let decodedString = await utilitiesInstance.decodeReadableStream(subdirectoriesResponse.body);
-			decodedString = utilitiesInstance.sanitizeMetadataForJson(decodedString);
+			const decodedString = await utilitiesInstance.decodeReadableStream(subdirectoriesResponse.body);
 			const asJson = JSON.parse(decodedString);
 
 			if (asJson.success && asJson.payload) {
@@ -409,18 +468,18 @@ export class ContextModel extends ContextRefreshable {
 		// Abort any previous in-flight request
 		if (this._fetchAbortController) {
 			this._fetchAbortController.abort();
-			await api.fetchApi('/jnodes_request_task_cancellation', { method: "POST" });
+			await this.cancelBackendJob();
 		}
 
 		const abortController = new AbortController();
 		this._fetchAbortController = abortController;
+		const jobId = this.startBackendJob();
 
 		const cancelButton = $el("button.JNodes-image-drawer-btn", {
 			textContent: 'Cancel',
 			onclick: async () => {
 				abortController.abort();
-				await api.fetchApi(
-					'/jnodes_request_task_cancellation', { method: "POST" });
+				await this.cancelBackendJob();
 				cancelButton.textContent = 'Canceling...';
 			},
 			style: {
@@ -431,17 +490,19 @@ export class ContextModel extends ContextRefreshable {
 
 		// Add loading indicator
 		const imageDrawerListInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerList");
+		const loadingLabel = $el("label", { textContent: `Loading ${this.name}...` });
 		await imageDrawerListInstance.replaceImageListChildren([
 			$el('div', [
-				$el("label", { textContent: `Loading ${this.name}...` }),
+				loadingLabel,
 				cancelButton
 			])
 		]);
+		this.trackBackendJobProgress(jobId, loadingLabel, `Loading ${this.name}...`);
 		
 		// Get models
 		let modelDicts;
 		try {
-			modelDicts = await this.getModels(bForceRefresh, abortController.signal);
+			modelDicts = await this.getModels(bForceRefresh, abortController.signal, jobId);
 		} catch (e) {
 			if (e.name === 'AbortError') {
 				await imageDrawerListInstance.replaceImageListChildren([$el("label", { textContent: "Cancelled." })]);
@@ -621,6 +682,80 @@ export class ContextSubdirectoryExplorer extends ContextRefreshable {
 		this.fileList = null;
 		this.subdirectorySelector = null;
 		this.bShouldForceLoad = bShouldForceLoad; // Whether or not to lazy load. Lazy load = !bShouldForceLoad
+		this.loadedSubdirectory = null; // The subdirectory currently shown, null until something has been loaded
+		this.subdirectoryDetails = {}; // Item counts and sizes per subdirectory, from the last subdirectory listing
+		this.pagedListing = null; // The folder being listed a page at a time, see fetchFirstFolderItemPage
+		this.listedFields = LISTING_FIELDS; // The fields the shown folder was listed with
+
+		// Apply files added, changed or removed on the server while this context is showing
+		api.addEventListener("jnodes.drawer.update", async ({ detail }) => {
+			if (detail?.root_directory != this.rootDirectoryName || this.loadedSubdirectory === null || !this.fileList) { return; }
+
+			const imageDrawerContextSelectorInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerContextSelector");
+			if (imageDrawerContextSelectorInstance.getCurrentContextName() == this.name) {
+				await this.applyDrawerUpdate(detail.changes);
+			}
+		});
+	}
+
+	async applyDrawerUpdate(changes) {
+
+		const imageDrawerListInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerList");
+		const selectedSubdirectory = this.loadedSubdirectory;
+
+		let bChanged = false;
+		for (const change of changes) {
+
+			// Skip files outside of what's shown, otherwise make the subdirectory relative to the selected one like listed files
+			let relativeSubdirectory;
+			if (change.subdirectory == selectedSubdirectory) {
+				relativeSubdirectory = "";
+			} else if (this.bIncludeSubdirectories && selectedSubdirectory == "") {
+				relativeSubdirectory = change.subdirectory;
+			} else if (this.bIncludeSubdirectories && change.subdirectory.startsWith(`${selectedSubdirectory}/`)) {
+				relativeSubdirectory = change.subdirectory.substring(selectedSubdirectory.length + 1);
+			} else {
+				continue;
+			}
+
+			const existingElement = Array.from(imageDrawerListInstance.getImageListChildren()).find(
+				(element) => element.fileInfo?.filename == change.item && (element.fileInfo.subdirectory || "") == change.subdirectory);
+			if (existingElement) {
+				await imageDrawerListInstance.removeElementFromImageList(existingElement, false);
+			}
+			this.fileList = this.fileList.filter((file) => !(file.item == change.item && (file.subdirectory || "") == relativeSubdirectory));
+
+			if (change.type != "removed" && change.record) {
+				change.record.subdirectory = relativeSubdirectory;
+				this.fileList.push(change.record);
+
+				const elements = await this.createElementsFromFiles([change.record], selectedSubdirectory);
+				for (const element of elements) {
+					await imageDrawerListInstance.addElementToImageList(element, false);
+				}
+			}
+
+			bChanged = true;
+		}
+
+		if (bChanged) {
+			this.finishLoadingImagesInFolder();
+		}
+	}
+
+	// Tooltip and count text for a subdirectory option from its entry in the listing's "details"
+	getSubdirectoryOptionDetails(details) {
+		if (!details) { return ["", ""]; }
+
+		const formatCount = (count) => count.toLocaleString("en-US");
+		const formatSize = (bytes) => bytes > 0 ? utilitiesInstance.formatBytesToString(bytes, 1) : "0 Bytes";
+
+		const tooltip =
+			`${formatCount(details.media_count)} items (${formatSize(details.media_bytes)}) directly inside, ` +
+			`${formatCount(details.total_media_count)} items (${formatSize(details.total_media_bytes)}) including subdirectories`;
+		const detail = `${formatCount(details.total_media_count)} · ${formatSize(details.total_media_bytes)}`;
+
+		return [tooltip, detail];
 	}
 
 	async updateSubdirectorySelectorOptions() {
@@ -638,30 +773,32 @@ export class ContextSubdirectoryExplorer extends ContextRefreshable {
 			`/jnodes_list_comfyui_subdirectories?root_directory=${this.rootDirectoryName}`, { method: "GET", cache: "no-store" });
 
 		let subdirectories;
+		let subdirectoryDetails = {};
 		try {
 			// Decode into a string
-			let decodedString = await utilitiesInstance.decodeReadableStream(subdirectoriesResponse.body);
-
-			decodedString = utilitiesInstance.sanitizeMetadataForJson(decodedString);
+			const decodedString = await utilitiesInstance.decodeReadableStream(subdirectoriesResponse.body);
 
 			const asJson = JSON.parse(decodedString);
 
 			if (asJson.success && asJson.payload) {
 				subdirectories = asJson.payload;
+				subdirectoryDetails = asJson.details || {};
 			}
 		} catch (e) {
 			console.error(`Could not get list of files when loading "${this.rootDirectoryName}": ${e}`)
 		}
+		this.subdirectoryDetails = subdirectoryDetails;
 
 		this.subdirectorySelector.data.clearOptions();
 
 		this.subdirectorySelector.data.addOptionUnique(SUBDIRECTORY_PLACEHOLDER, SUBDIRECTORY_PLACEHOLDER);
-		this.subdirectorySelector.data.addOptionUnique(this.rootDirectoryDisplayName, '');
+		this.subdirectorySelector.data.addOptionUnique(
+			this.rootDirectoryDisplayName, '', ...this.getSubdirectoryOptionDetails(subdirectoryDetails['']));
 
 		for (let directoryIndex = 0; directoryIndex < subdirectories.length; directoryIndex++) {
 			const result = subdirectories[directoryIndex];
 			if (result === "") { continue; }
-			this.subdirectorySelector.data.addOptionUnique(result, result);
+			this.subdirectorySelector.data.addOptionUnique(result, result, ...this.getSubdirectoryOptionDetails(subdirectoryDetails[result]));
 		}
 
 		this.subdirectorySelector.data.setOptionSelected(SUBDIRECTORY_PLACEHOLDER);
@@ -676,7 +813,7 @@ export class ContextSubdirectoryExplorer extends ContextRefreshable {
 		// Abort any previous in-flight request
 		if (this._fetchAbortController) {
 			this._fetchAbortController.abort();
-			await api.fetchApi('/jnodes_request_task_cancellation', { method: "POST" });
+			await this.cancelBackendJob();
 		}
 
 		const imageDrawerListSortingInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerListSorting");
@@ -687,13 +824,15 @@ export class ContextSubdirectoryExplorer extends ContextRefreshable {
 
 		const abortController = new AbortController();
 		this._fetchAbortController = abortController;
+		this.loadedSubdirectory = selectedSubdirectory;
+		this.pagedListing = null;
+		const jobId = this.startBackendJob();
 
 		const cancelButton = $el("button.JNodes-image-drawer-btn", {
 			textContent: 'Cancel',
 			onclick: async () => {
 				abortController.abort();
-				await api.fetchApi(
-					'/jnodes_request_task_cancellation', { method: "POST" });
+				await this.cancelBackendJob();
 				cancelButton.textContent = 'Canceling...';
 			},
 			style: {
@@ -702,17 +841,40 @@ export class ContextSubdirectoryExplorer extends ContextRefreshable {
 			},
 		});
 
+		const loadingText = `Loading directory '${selectedSubdirectory || this.rootDirectoryName}' ${withOrWithout} subdirectories...`;
+		const loadingLabel = $el("label", { textContent: loadingText });
 		imageDrawerListInstance.replaceImageListChildren(
 			[
 				$el('div', [
-					$el("label", {
-						textContent:
-							`Loading directory '${selectedSubdirectory || this.rootDirectoryName}' ${withOrWithout} subdirectories...`
-					}),
+					loadingLabel,
 					cancelButton
 				])
 			]
 		);
+		this.trackBackendJobProgress(jobId, loadingLabel, loadingText);
+
+		const sortType = imageDrawerListSortingInstance.getCurrentSortTypeObject();
+		const listingSort = this.getPagedListingSort(selectedSubdirectory, sortType);
+		this.listedFields = this.getListingFields(sortType);
+		const bIsLoaded = listingSort ?
+			await this.fetchFirstFolderItemPage(selectedSubdirectory, listingSort, jobId, abortController) :
+			await this.streamFolderItems(selectedSubdirectory, jobId, abortController);
+		if (!bIsLoaded) { return; }
+
+		if (bRefreshOptions) {
+			const lastSelectedName = this.subdirectorySelector.data.getSelectedOptionName();
+			await this.updateSubdirectorySelectorOptions();
+			if (lastSelectedName && this.subdirectorySelector.data.hasOption(lastSelectedName)) {
+				this.subdirectorySelector.data.setOptionSelected(lastSelectedName);
+			}
+		}
+
+	}
+
+	// List the whole folder in one streamed response. Returns false if the listing was cancelled.
+	async streamFolderItems(selectedSubdirectory, jobId, abortController) {
+
+		const imageDrawerListInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerList");
 
 		let allItems;
 		try {
@@ -720,44 +882,257 @@ export class ContextSubdirectoryExplorer extends ContextRefreshable {
 				'/jnodes_get_comfyui_subdirectory_images' +
 				`?root_directory=${this.rootDirectoryName}` +
 				`&selected_subdirectory=${selectedSubdirectory}` +
-				`&recursive=${this.bIncludeSubdirectories}`, { cache: "no-store", signal: abortController.signal });
+				`&recursive=${this.bIncludeSubdirectories}` +
+				`&stream=true` +
+				`&watch=true` +
+				`&job_id=${jobId}` +
+				`&fields=${this.listedFields}`, { cache: "no-store", signal: abortController.signal });
 		} catch (e) {
 			if (e.name === 'AbortError') {
 				await imageDrawerListInstance.replaceImageListChildren([$el("label", { textContent: "Cancelled." })]);
-				return;
+				return false;
 			}
 			console.error(`Could not get list of images when loading "${this.rootDirectoryName}": ${e}`);
 			this.fileList = [];
 			await this.loadImagesInFolder(selectedSubdirectory);
-			return;
-		}
+			return false;
+		}
+
+		// Render items in batches as they arrive so the first screen shows up before the scan finishes
+		this.fileList = [];
+		let pendingFiles = [];
+		let bHasRenderedFirstBatch = false;
+		let lastFlushTime = performance.now();
+		const firstBatchSize = 64;
+		const flushIntervalMs = 250;
+
+		const flushPendingFiles = async () => {
+			if (pendingFiles.length == 0) { return; }
+			const files = pendingFiles;
+			pendingFiles = [];
+			lastFlushTime = performance.now();
+
+			const elements = await this.createElementsFromFiles(files, selectedSubdirectory);
+			if (!bHasRenderedFirstBatch) {
+				bHasRenderedFirstBatch = true;
+				await imageDrawerListInstance.replaceImageListChildren(elements);
+			} else {
+				for (const element of elements) {
+					await imageDrawerListInstance.addElementToImageList(element, false);
+				}
+			}
+		};
 
-		let decodedString;
 		try {
-			// Decode into a string
-			decodedString = await utilitiesInstance.decodeReadableStream(allItems.body);
+			for await (const line of utilitiesInstance.readNdjsonStream(allItems.body)) {
+				if (this.shouldCancelAsyncOperation()) { break; }
 
-			decodedString = utilitiesInstance.sanitizeMetadataForJson(decodedString);
+				if (line.type == "item") {
+					this.fileList.push(line.payload);
+					pendingFiles.push(line.payload);
 
-			const asJson = JSON.parse(decodedString);
-
-			this.fileList = asJson.payload;
+					if ((!bHasRenderedFirstBatch && pendingFiles.length >= firstBatchSize) ||
+						performance.now() - lastFlushTime > flushIntervalMs) {
+						await flushPendingFiles();
+					}
+				} else if (line.type == "end" && !line.success) {
+					console.error(`Could not get list of images when loading "${this.rootDirectoryName}": ${line.error}`);
+				}
+			}
+			await flushPendingFiles();
 		} catch (e) {
+			if (e.name === 'AbortError') {
+				await imageDrawerListInstance.replaceImageListChildren([$el("label", { textContent: "Cancelled." })]);
+				return false;
+			}
 			console.error(`Could not get list of images when loading "${this.rootDirectoryName}": ${e}`)
-			this.fileList = []; // Set an empty list on failure. This allows the function to complete without further failures.
 		}
 
-		// Load root folder if no path is specified (even if there are no images within)
-		await this.loadImagesInFolder(selectedSubdirectory);
+		if (bHasRenderedFirstBatch) {
+			if (this.shouldCancelAsyncOperation()) { imageDrawerListInstance.clearImageListChildren(); return false; }
+			this.finishLoadingImagesInFolder();
+		} else {
+			// Load root folder if no path is specified (even if there are no images within)
+			await this.loadImagesInFolder(selectedSubdirectory);
+		}
 
-		if (bRefreshOptions) {
-			const lastSelectedName = this.subdirectorySelector.data.getSelectedOptionName();
-			await this.updateSubdirectorySelectorOptions();
-			if (lastSelectedName && this.subdirectorySelector.data.hasOption(lastSelectedName)) {
-				this.subdirectorySelector.data.setOptionSelected(lastSelectedName);
+		return true;
+	}
+
+	// Sorts by dimensions list them for every item, others leave them to be loaded as tiles come into view
+	getListingFields(sortType) {
+		return DIMENSION_SORT_TYPES.includes(sortType?.constructor) ? DIMENSION_LISTING_FIELDS : LISTING_FIELDS;
+	}
+
+	// The server-side sort and order to page through a folder with, or null if it should be listed all at once
+	// because it's small enough or because the server can't sort it like sortType
+	getPagedListingSort(selectedSubdirectory, sortType) {
+		const details = this.subdirectoryDetails[selectedSubdirectory];
+		const itemCount = (this.bIncludeSubdirectories ? details?.total_media_count : details?.media_count) || 0;
+		const sort = LISTING_SERVER_SORTS.get(sortType?.constructor);
+		if (itemCount <= PAGED_LISTING_MIN_ITEM_COUNT || !sort) { return null; }
+
+		return { sort: sort, order: sortType.bIsAscending ? "asc" : "desc" };
+	}
+
+	// List a large folder a page at a time in the order the server sorted it. Later pages are loaded as the list
+	// is scrolled near its end, so only what's been scrolled to is sent and rendered. Returns false if the listing was cancelled.
+	async fetchFirstFolderItemPage(selectedSubdirectory, listingSort, jobId, abortController) {
+
+		const imageDrawerListInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerList");
+		if (!this._onPagedListingScroll) {
+			this._onPagedListingScroll = () => this.loadNextFolderItemPageIfNeeded();
+			imageDrawerListInstance.getImageListContainerElement().addEventListener("scroll", this._onPagedListingScroll, { passive: true });
+		}
+
+		this.fileList = [];
+		const pagedListing = {
+			selectedSubdirectory: selectedSubdirectory,
+			listingSort: listingSort,
+			abortController: abortController,
+			nextCursor: null,
+			pageCount: 0,
+			pagePromise: null,
+		};
+		this.pagedListing = pagedListing;
+
+		const bIsLoaded = await this.fetchFolderItemPage(pagedListing,
+			`&root_directory=${this.rootDirectoryName}` +
+			`&selected_subdirectory=${selectedSubdirectory}` +
+			`&recursive=${this.bIncludeSubdirectories}` +
+			`&watch=true` +
+			`&job_id=${jobId}` +
+			`&sort=${listingSort.sort}` +
+			`&order=${listingSort.order}`);
+
+		if (bIsLoaded) {
+			this.loadNextFolderItemPageIfNeeded();
+		}
+		return bIsLoaded;
+	}
+
+	// Fetch one page of a paged listing and add its items to the list. Returns false if it couldn't be loaded
+	// or the listing was cancelled or replaced meanwhile.
+	async fetchFolderItemPage(pagedListing, query) {
+
+		const imageDrawerListInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerList");
+		const bIsFirstPage = pagedListing.pageCount == 0;
+
+		let page;
+		try {
+			const response = await api.fetchApi(
+				'/jnodes_get_comfyui_subdirectory_images' +
+				`?limit=${LISTING_PAGE_SIZE}` +
+				`&fields=${this.listedFields}` +
+				query, { cache: "no-store", signal: pagedListing.abortController.signal });
+			page = JSON.parse(await utilitiesInstance.decodeReadableStream(response.body));
+		} catch (e) {
+			if (e.name === 'AbortError') {
+				if (bIsFirstPage) {
+					await imageDrawerListInstance.replaceImageListChildren([$el("label", { textContent: "Cancelled." })]);
+				}
+				return false;
+			}
+			page = { success: false, error: e };
+		}
+
+		if (this.pagedListing !== pagedListing || this.shouldCancelAsyncOperation()) { return false; }
+
+		if (!page.success) {
+			if (page.cursor_expired) {
+				// The server has dropped the scan these pages came from, so list the folder again
+				this.fetchFolderItems(pagedListing.selectedSubdirectory);
+				return false;
+			}
+			console.error(`Could not get list of images when loading "${this.rootDirectoryName}": ${page.error}`);
+			if (bIsFirstPage) {
+				await this.loadImagesInFolder(pagedListing.selectedSubdirectory);
+			}
+			return false;
+		}
+
+		pagedListing.pageCount++;
+		pagedListing.nextCursor = page.next_cursor;
+		for (const file of page.payload) {
+			this.fileList.push(file);
+		}
+
+		if (bIsFirstPage && page.payload.length == 0) {
+			await this.loadImagesInFolder(pagedListing.selectedSubdirectory);
+			return true;
+		}
+
+		const elements = await this.createElementsFromFiles(page.payload, pagedListing.selectedSubdirectory);
+		if (this.pagedListing !== pagedListing || this.shouldCancelAsyncOperation()) { return false; }
+
+		if (bIsFirstPage) {
+			await imageDrawerListInstance.replaceImageListChildren(elements);
+		} else {
+			for (const element of elements) {
+				await imageDrawerListInstance.addElementToImageList(element, false);
+			}
+		}
+		this.finishLoadingImagesInFolder();
+
+		return true;
+	}
+
+	// Load the page after the ones already shown, sharing the request if it's already on its way
+	loadNextFolderItemPage(pagedListing) {
+		if (!pagedListing.pagePromise) {
+			pagedListing.pagePromise = this.fetchFolderItemPage(pagedListing, `&cursor=${encodeURIComponent(pagedListing.nextCursor)}`)
+				.then((bIsLoaded) => {
+					pagedListing.pagePromise = null;
+					if (bIsLoaded) {
+						this.loadNextFolderItemPageIfNeeded(); // In case the list was scrolled to its end again meanwhile
+					}
+					return bIsLoaded;
+				});
+		}
+		return pagedListing.pagePromise;
+	}
+
+	// Load the next page of a paged listing once the list is within a screen of its end
+	loadNextFolderItemPageIfNeeded() {
+		const pagedListing = this.pagedListing;
+		if (!pagedListing?.nextCursor || pagedListing.pagePromise || this.shouldCancelAsyncOperation()) { return; }
+
+		const imageDrawerListInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerList");
+		const container = imageDrawerListInstance.getImageListContainerElement();
+		if (container.scrollTop + container.clientHeight * 2 >= container.scrollHeight) {
+			this.loadNextFolderItemPage(pagedListing);
+		}
+	}
+
+	// Load every page of a paged listing that hasn't been loaded yet. Returns whether any page was loaded.
+	async loadRemainingFolderItemPages() {
+		const pagedListing = this.pagedListing;
+		let bLoadedPages = false;
+		while (pagedListing?.nextCursor && this.pagedListing === pagedListing) {
+			if (!await this.loadNextFolderItemPage(pagedListing)) { break; }
+			bLoadedPages = true;
+		}
+		return bLoadedPages;
+	}
+
+	setLastSelectedSorting(sortType) {
+		const value = super.setLastSelectedSorting(sortType);
+
+		if (this.loadedSubdirectory === null || this.shouldCancelAsyncOperation()) { return value; }
+
+		// A paged listing only has the start of the folder in the server's order, so list it again for any other order.
+		// A listing without dimensions is listed again with them to sort by them.
+		const pagedListing = this.pagedListing;
+		if (pagedListing?.nextCursor) {
+			const listingSort = this.getPagedListingSort(pagedListing.selectedSubdirectory, sortType);
+			if (listingSort?.sort != pagedListing.listingSort.sort || listingSort?.order != pagedListing.listingSort.order) {
+				this.fetchFolderItems(pagedListing.selectedSubdirectory);
 			}
+		} else if (this.listedFields != this.getListingFields(sortType) && this.listedFields == LISTING_FIELDS) {
+			this.fetchFolderItems(this.loadedSubdirectory);
 		}
 
+		return value;
 	}
 
 	async loadImagesInFolder(selectedSubdirectory) {
@@ -782,6 +1157,18 @@ export class ContextSubdirectoryExplorer extends ContextRefreshable {
 
 		if (this.shouldCancelAsyncOperation()) { imageDrawerListInstance.clearImageListChildren(); return; }
 
+		const elements = await this.createElementsFromFiles(this.fileList, selectedSubdirectory);
+		if (this.shouldCancelAsyncOperation()) { imageDrawerListInstance.clearImageListChildren(); return; }
+
+		imageDrawerListInstance.replaceImageListChildren(elements);
+
+		this.finishLoadingImagesInFolder();
+	}
+
+	async createElementsFromFiles(files, selectedSubdirectory) {
+
+		const imageDrawerListInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerList");
+
 		let elements = [];
 		let elementPreparationPromises = [];
 
@@ -805,21 +1192,117 @@ export class ContextSubdirectoryExplorer extends ContextRefreshable {
 		};
 
 		let elementCreationPromises = [];
-		for (let fileIndex = 0; fileIndex < this.fileList.length; fileIndex++) {
+		for (let fileIndex = 0; fileIndex < files.length; fileIndex++) {
 			if (this.shouldCancelAsyncOperation()) { break; }
 
-			const file = this.fileList[fileIndex];
+			const file = files[fileIndex];
 			// Push the promise to the array
 			elementCreationPromises.push(createElementFromFile(file));
 		}
 
 		// Wait for all promises to resolve
-		if (this.shouldCancelAsyncOperation()) { imageDrawerListInstance.clearImageListChildren(); return; }
 		await Promise.all(elementCreationPromises);
-		if (this.shouldCancelAsyncOperation()) { imageDrawerListInstance.clearImageListChildren(); return; }
 		await Promise.all(elementPreparationPromises);
 
-		imageDrawerListInstance.replaceImageListChildren(elements);
+		return elements;
+	}
+
+	// Listings leave metadata out (see LISTING_FIELDS), so search it in the server's media index instead.
+	// Returns a set of "subdirectory/item" keys, subdirectories relative to the root like element.fileInfo's, of the shown
+	// items whose filename or metadata have words starting with every term (or any, with bMatchAny), or null if the index
+	// couldn't be searched. A paged listing is loaded the rest of the way first so every match has an element to show.
+	// Searching again for the same terms while they're being searched (e.g. as those pages load) shares the request.
+	searchMediaIndex(terms, bMatchAny) {
+		const searchKey = JSON.stringify([this.loadedSubdirectory, this.bIncludeSubdirectories, terms, bMatchAny]);
+		if (this._mediaIndexSearch?.searchKey != searchKey) {
+			const promise = this.fetchMediaIndexMatches(terms, bMatchAny).finally(() => {
+				if (this._mediaIndexSearch?.promise === promise) {
+					this._mediaIndexSearch = null;
+				}
+			});
+			this._mediaIndexSearch = { searchKey: searchKey, promise: promise };
+		}
+		return this._mediaIndexSearch.promise;
+	}
+
+	async fetchMediaIndexMatches(terms, bMatchAny) {
+		const selectedSubdirectory = this.loadedSubdirectory;
+		if (selectedSubdirectory === null) { return null; }
+
+		try {
+			await this.loadRemainingFolderItemPages();
+
+			const query = terms.map((term) => `${term}*`).join(" ");
+			const matchingKeys = new Set();
+			let offset = 0;
+			while (offset !== null && offset !== undefined) {
+				const response = await api.fetchApi(
+					'/jnodes_search' +
+					`?q=${encodeURIComponent(query)}` +
+					`&mode=${bMatchAny ? "or" : "and"}` +
+					`&root_directory=${this.rootDirectoryName}` +
+					`&selected_subdirectory=${encodeURIComponent(selectedSubdirectory)}` +
+					`&recursive=${this.bIncludeSubdirectories}` +
+					`&limit=${SEARCH_PAGE_SIZE}` +
+					`&offset=${offset}`, { cache: "no-store" });
+				const page = await response.json();
+				if (!page.success) {
+					console.error(`Could not search "${this.rootDirectoryName}": ${page.error}`);
+					return null;
+				}
+
+				for (const match of page.payload) {
+					const subdirectory = match.subdirectory ?
+						selectedSubdirectory ? `${selectedSubdirectory}/${match.subdirectory}` : match.subdirectory : selectedSubdirectory;
+					matchingKeys.add(`${subdirectory}/${match.item}`);
+				}
+				offset = page.next_offset;
+			}
+
+			return this.loadedSubdirectory === selectedSubdirectory ? matchingKeys : null;
+		} catch (e) {
+			console.error(`Could not search "${this.rootDirectoryName}": ${e}`);
+			return null;
+		}
+	}
+
+	// Regular expressions can't be matched against the media index, so for them metadata is fetched for any elements
+	// without it before they're searched. A paged listing is loaded the rest of the way first so every item is searched.
+	// Returns whether any items or metadata were loaded.
+	async loadMissingSearchMetadata() {
+		if (this._bIsLoadingSearchMetadata) { return false; }
+
+		this._bIsLoadingSearchMetadata = true;
+		let bLoadedPages = false;
+		try {
+			bLoadedPages = await this.loadRemainingFolderItemPages();
+
+			const imageDrawerListInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerList");
+			const elements = Array.from(imageDrawerListInstance.getImageListChildren()).filter(
+				(element) => element.fileInfo?.file && element.fileInfo.file.metadata === undefined);
+			if (elements.length == 0) { return bLoadedPages; }
+
+			const records = await utilitiesInstance.fetchItemMetadata(
+				this.rootDirectoryName,
+				elements.map((element) => ({ item: element.fileInfo.filename, subdirectory: element.fileInfo.subdirectory || "" })),
+				["metadata"]);
+
+			for (let elementIndex = 0; elementIndex < elements.length; elementIndex++) {
+				const metadata = records[elementIndex]?.metadata || {};
+				elements[elementIndex].fileInfo.file.metadata = metadata;
+				ImageElements.appendListedMetadataToSearchTerms(elements[elementIndex], metadata);
+			}
+		} catch (e) {
+			console.error(`Could not load metadata for search in "${this.rootDirectoryName}": ${e}`);
+			return bLoadedPages;
+		} finally {
+			this._bIsLoadingSearchMetadata = false;
+		}
+
+		return true;
+	}
+
+	finishLoadingImagesInFolder() {
 
 		const imageDrawerListSortingInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerListSorting");
 		imageDrawerListSortingInstance.sortWithCurrentType();
@@ -1098,8 +1581,8 @@ export class ContextLora extends ContextModel {
 		super("Lora / Lycoris", "Lora and Lycoris models found in your Lora directory", imageDrawerInstance, "loras");
 	}
 
-	async getModels(bForceRefresh = false, signal = undefined) {
-		return await ExtraNetworks.getLoras(bForceRefresh, this.selectedSubdirectory, signal);
+	async getModels(bForceRefresh = false, signal = undefined, jobId = undefined) {
+		return await ExtraNetworks.getLoras(bForceRefresh, this.selectedSubdirectory, signal, jobId);
 	}
 }
 
@@ -1108,8 +1591,8 @@ export class ContextEmbeddings extends ContextModel {
 		super("Embeddings / Textual Inversions", "Embedding/textual inversion models found in your embeddings directory", imageDrawerInstance, "embeddings");
 	}
 
-	async getModels(bForceRefresh = false, signal = undefined) {
-		return await ExtraNetworks.getEmbeddings(bForceRefresh, this.selectedSubdirectory, signal);
+	async getModels(bForceRefresh = false, signal = undefined, jobId = undefined) {
+		return await ExtraNetworks.getEmbeddings(bForceRefresh, this.selectedSubdirectory, signal, jobId);
 	}
 }
 
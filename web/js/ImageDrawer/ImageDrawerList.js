@@ -149,6 +149,11 @@ class ImageDrawerList extends ImageDrawerComponent {
 				for (let visualElement of utilitiesInstance.getVisualElements(element)) {
 					unobserveVisualElement(visualElement);
 
+					// Stop loading a thumbnail that will never be shown
+					if (visualElement.tagName === 'IMG' && !visualElement.complete) {
+						visualElement.removeAttribute('src');
+					}
+
 					if (visualElement.tagName === 'VIDEO') {
 						// Try to pause the video before unloading
 						try {
@@ -1,5 +1,6 @@
 // Specialized search component for the Image Drawer that extends SearchBar with custom search execution behavior.
-// Filters image list elements by matching search terms against each element's search data.
+// Filters image list elements by matching search terms against each element's search data,
+// and against the server's media index for contexts that list items without their metadata.
 
 import { $el } from "/scripts/ui.js";
 
@@ -23,10 +24,23 @@ class ImageDrawerSearch extends ImageDrawerComponent {
 
         this._searchTimeout = null;
         this._searchTimeoutMs = 500;
+
+		// Keys of the items the media index matched, for the search text and mode they were searched with
+		this._mediaIndexMatches = null;
 	}
 
-	// Function to execute seach with an explicit searchTerm
-	_executeSearch(searchTerm) {
+	_matchesElement(element, itemText, parsed) {
+		if (SearchBar.prototype._matchesElement.call(this, element, itemText, parsed)) { return true; }
+
+		const matches = this._mediaIndexMatches;
+		if (!matches || !element.fileInfo || matches.searchTerm != this.getSearchText() || matches.bMatchAny != this._bMatchAny) {
+			return false;
+		}
+		return matches.keys.has(`${element.fileInfo.subdirectory || ""}/${element.fileInfo.filename}`);
+	}
+
+	// Filter the list and update what depends on which items are shown
+	_applySearch(searchTerm) {
 
 		// Call SearchBar's function
 		SearchBar.prototype._executeSearch.call(this, searchTerm);
@@ -35,6 +49,34 @@ class ImageDrawerSearch extends ImageDrawerComponent {
 		const batchSelectionManagerInstance = this.imageDrawerInstance.getComponentByName("BatchSelectionManager");
 		batchSelectionManagerInstance.updateWidget();
 	}
+
+	// Function to execute seach with an explicit searchTerm
+	_executeSearch(searchTerm) {
+
+		this._applySearch(searchTerm);
+
+		// Contexts that list items without their metadata search it on the server, then search again with the matches.
+		// Regular expressions can't be matched there, so those contexts load the metadata instead.
+		const parsedSearch = this._parseSearch(searchTerm);
+		const imageDrawerContextSelectorInstance = this.imageDrawerInstance.getComponentByName("ImageDrawerContextSelector");
+		const currentContext = imageDrawerContextSelectorInstance.getCurrentContextObject();
+
+		if (parsedSearch.type == "substring" && currentContext?.searchMediaIndex) {
+			const bMatchAny = this._bMatchAny;
+			currentContext.searchMediaIndex(parsedSearch.terms, bMatchAny).then((matchingKeys) => {
+				if (matchingKeys && this.getSearchText() == searchTerm && this._bMatchAny == bMatchAny) {
+					this._mediaIndexMatches = { searchTerm: searchTerm, bMatchAny: bMatchAny, keys: matchingKeys };
+					this._applySearch(searchTerm);
+				}
+			});
+		} else if (parsedSearch.type == "regex" && currentContext?.loadMissingSearchMetadata) {
+			currentContext.loadMissingSearchMetadata().then((bLoadedMetadata) => {
+				if (bLoadedMetadata && this.getSearchText() == searchTerm) {
+					this._applySearch(searchTerm);
+				}
+			});
+		}
+	}
 }
 
 // Apply all SearchBar methods and instance properties
@@ -24,18 +24,21 @@ let cachedEmbeddingsObject = undefined;
  * Gets a list of lora names
  * @param {boolean} bForceRefresh
  * @param {string} subdirectory - Optional subdirectory filter (e.g. "style")
+ * @param {AbortSignal} signal - Optional signal to abort the request
+ * @param {string} jobId - Optional job id so the backend request can be cancelled on its own
  * @returns An array of script urls to import
  */
-export async function getLoras(bForceRefresh = false, subdirectory = "", signal = undefined) {
+export async function getLoras(bForceRefresh = false, subdirectory = "", signal = undefined, jobId = undefined) {
+	const jobParameter = jobId ? `&job_id=${jobId}` : "";
 	if (!subdirectory && (bForceRefresh || !cachedLorasObject)) {
-		const resp = await api.fetchApi("/jnodes_model_items?type=loras", { cache: "no-store", signal });
+		const resp = await api.fetchApi(`/jnodes_model_items?type=loras${jobParameter}`, { cache: "no-store", signal });
 		const asJson = await resp.json();
 		cachedLorasObject = asJson;
 		return asJson;
 	}
 
 	if (subdirectory) {
-		const resp = await api.fetchApi(`/jnodes_model_items?type=loras&subdirectory=${encodeURIComponent(subdirectory)}`, { cache: "no-store", signal });
+		const resp = await api.fetchApi(`/jnodes_model_items?type=loras&subdirectory=${encodeURIComponent(subdirectory)}${jobParameter}`, { cache: "no-store", signal });
 		return await resp.json();
 	}
 
@@ -46,18 +49,21 @@ export async function getLoras(bForceRefresh = false, subdirectory = "", signal
  * Gets a list of embedding names
  * @param {boolean} bForceRefresh
  * @param {string} subdirectory - Optional subdirectory filter (e.g. "style")
+ * @param {AbortSignal} signal - Optional signal to abort the request
+ * @param {string} jobId - Optional job id so the backend request can be cancelled on its own
  * @returns An array of script urls to import
  */
-export async function getEmbeddings(bForceRefresh = false, subdirectory = "", signal = undefined) {
+export async function getEmbeddings(bForceRefresh = false, subdirectory = "", signal = undefined, jobId = undefined) {
+	const jobParameter = jobId ? `&job_id=${jobId}` : "";
 	if (!subdirectory && (bForceRefresh || !cachedEmbeddingsObject)) {
-		const resp = await api.fetchApi("/jnodes_model_items?type=embeddings", { cache: "no-store", signal });
+		const resp = await api.fetchApi(`/jnodes_model_items?type=embeddings${jobParameter}`, { cache: "no-store", signal });
 		const asJson = await resp.json();
 		cachedEmbeddingsObject = asJson;
 		return asJson;
 	}
 
 	if (subdirectory) {
-		const resp = await api.fetchApi(`/jnodes_model_items?type=embeddings&subdirectory=${encodeURIComponent(subdirectory)}`, { cache: "no-store", signal });
+		const resp = await api.fetchApi(`/jnodes_model_items?type=embeddings&subdirectory=${encodeURIComponent(subdirectory)}${jobParameter}`, { cache: "no-store", signal });
 		return await resp.json();
 	}
 
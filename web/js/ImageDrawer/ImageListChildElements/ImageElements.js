@@ -13,6 +13,90 @@ import { setVideoPlaybackRate, setVideoVolume, toggleVideoPlayback } from "../..
 
 import * as ImageElementUtils from "./ImageListChildElementUtils.js";
 
+// Add the metadata from a listing record to an element's search terms, except workflow and prompt from comfy
+export function appendListedMetadataToSearchTerms(imageElement, metadata) {
+	if (!metadata) { return; }
+
+	let metadataTerms = "";
+	for (const key of Object.keys(metadata)) {
+
+		if (key == "prompt" || key == "workflow") {
+			continue;
+		}
+		metadataTerms += metadata[key];
+	}
+
+	if (metadataTerms) {
+		imageElement.searchTerms = `${imageElement.searchTerms} ${metadataTerms.toLowerCase()}`.trim();
+	}
+}
+
+// Listed formats drawer tiles may show as downscaled thumbnails (see /jnodes_view_image's "w" parameter)
+const THUMBNAIL_FORMATS = ["image/png", "image/jpg", "image/jpeg"];
+
+// Thumbnails are wide enough for a large tile on this display, rounded up so few sizes end up in the server's cache
+function getThumbnailWidth() {
+	const thumbnailWidthStep = 256;
+	return Math.ceil(512 * (window.devicePixelRatio || 1) / thumbnailWidthStep) * thumbnailWidthStep;
+}
+
+// Record fields that stat-only listings leave out, loaded once a tile comes into view
+const LAZY_LISTING_FIELDS = ["dimensions", "metadata_read", "frame_count", "fps", "duration_in_seconds"];
+
+// Point fileInfo at the server's downscaled previews where they're worth it, which depends on the listed dimensions
+function setPreviewHrefs(fileInfo, href, bIsVideoFormat) {
+
+	// Large still images are shown from a server-side downscaled copy. Only formats that can't be animated qualify,
+	// and only when the listing knows the dimensions, since the tile's placeholder size comes from them.
+	const thumbnailWidth = getThumbnailWidth();
+	if (!bIsVideoFormat && THUMBNAIL_FORMATS.includes(fileInfo.file?.format) &&
+		fileInfo.file?.metadata_read && fileInfo.file.dimensions?.[0] > thumbnailWidth * 1.5) {
+		// The server picks the best format this browser accepts, at a quality for this connection.
+		// Tiles only load once they're in view, so their previews go ahead of other preview work.
+		const preview = `auto;${utilitiesInstance.getPreviewQuality()}`;
+		fileInfo.thumbnailHref = `${href}&w=${thumbnailWidth}&preview=${preview}&priority=1`;
+	}
+
+	// Videos play a short low resolution loop made by the server, showing its first frame until then.
+	// The original is only loaded when opened in a modal.
+	if (bIsVideoFormat && fileInfo.file?.metadata_read && setting_VideoPlaybackOptions.value.lowResolutionPreviews !== false) {
+		const videoPreviewHref = href.replace("/jnodes_view_image?", "/jnodes_view_video_preview?");
+		fileInfo.thumbnailHref = `${videoPreviewHref}&kind=loop&w=${thumbnailWidth}`;
+		fileInfo.posterHref = `${videoPreviewHref}&kind=poster&w=${thumbnailWidth}`;
+	}
+}
+
+// Size the tile's placeholder from the listed dimensions and fill in the listed media details.
+// Returns false if the dimensions aren't known.
+function setListedDimensions(imageElement) {
+	const file = imageElement.fileInfo.file;
+
+	if (!imageElement.displayData) {
+		imageElement.displayData = {};
+	}
+
+	if (file?.duration_in_seconds && file.duration_in_seconds > 0) {
+		imageElement.displayData.DurationInSeconds = file.duration_in_seconds;
+	}
+	if (file?.fps && file.fps > 0) {
+		imageElement.displayData.FramesPerSecond = file.fps;
+	}
+	if (file?.frame_count && file.frame_count > 0) {
+		imageElement.displayData.FrameCount = file.frame_count;
+	}
+
+	if (!file?.metadata_read) {
+		return false;
+	}
+
+	imageElement.displayData.FileDimensions = file.dimensions;
+
+	imageElement.displayData.AspectRatio = imageElement.displayData.FileDimensions[0] / imageElement.displayData.FileDimensions[1];
+	imageElement.style.aspectRatio = imageElement.displayData.AspectRatio;
+
+	return true;
+}
+
 export async function createImageElementFromFileInfo(fileInfo, imageDrawerInstance) {
 	if (!fileInfo) { return; }
 	let href = `/jnodes_view_image?`;
@@ -26,7 +110,10 @@ export async function createImageElementFromFileInfo(fileInfo, imageDrawerInstan
 		href += `subfolder=${encodeURIComponent(fileInfo.subdirectory || fileInfo.subfolder || "")}&`;
 	}
 
-	href += `t=${+new Date()}`; // Add Timestamp
+	// Listed files keep the same URL while they're unchanged, so the browser can reuse (after a cheap 304 check)
+	// what it downloaded before. Anything else gets a timestamp.
+	const fileVersion = fileInfo.file?.file_age !== undefined ? `${fileInfo.file.file_age}-${fileInfo.file.file_size}` : +new Date();
+	href += `t=${fileVersion}`;
 
 	fileInfo.imageHref = href;
 	
@@ -35,6 +122,11 @@ export async function createImageElementFromFileInfo(fileInfo, imageDrawerInstan
 	const fileExtension = fileInfo.filename.split('.').pop().toLowerCase();
 	const bIsVideoFormat = fileInfo.file?.is_video || browserVideoExtensions.includes(fileExtension);
 
+	// Stat-only listings leave the dimensions out, see LAZY_LISTING_FIELDS
+	const bHasLazyDimensions = fileInfo.file && !("metadata_read" in fileInfo.file);
+
+	setPreviewHrefs(fileInfo, href, bIsVideoFormat);
+
 	const imageElement =
 		$el("div.imageElement", {
 			bComplete: false,
@@ -102,7 +194,7 @@ export async function createImageElementFromFileInfo(fileInfo, imageDrawerInstan
 
 	const img = $el(bIsVideoFormat ? "video" : "img", {
 		// Store the image source as a data attribute for easy access
-		dataSrc: href,
+		dataSrc: fileInfo.thumbnailHref || href,
 		preload: fileInfo.bShouldForceLoad ? "auto" : "metadata",
 		lastSeekTime: 0.0,
 		style: {
@@ -117,6 +209,11 @@ export async function createImageElementFromFileInfo(fileInfo, imageDrawerInstan
 	imageElement.img = img;
 
 	img.forceLoad = function () {
+		// Posters are made on demand like the loops, so they're only asked for once the tile is in view
+		if (fileInfo.posterHref && img.dataSrc === fileInfo.thumbnailHref && !img.getAttribute("poster")) {
+			img.poster = fileInfo.posterHref;
+		}
+
 		img.src = img.dataSrc;
 
 		if (bIsVideoFormat) {
@@ -128,20 +225,49 @@ export async function createImageElementFromFileInfo(fileInfo, imageDrawerInstan
 		img.forceLoad();
 	};
 
+	// Stop loading a thumbnail that scrolled out of view, so the server drops it and works on the tiles in view instead.
+	// Without a src, it's loaded again when it comes back into view.
+	if (!bIsVideoFormat) {
+		img.onObserverUnintersect = function () {
+			if (fileInfo.thumbnailHref && img.dataSrc === fileInfo.thumbnailHref && img.getAttribute("src") && !img.complete) {
+				img.removeAttribute("src");
+			}
+		};
+	}
+
+	// If the server can't make a preview (no ffmpeg, unreadable file, too busy), show the original instead
+	img.addEventListener("error", () => {
+		if (!fileInfo.thumbnailHref || img.dataSrc === href) { return; }
+		img.dataSrc = href;
+		img.removeAttribute("poster");
+		img.forceLoad();
+	});
+
 	if (fileInfo.bShouldForceLoad) {
 		// imageElement.forceLoad(); // Immediately load img if we don't want to lazy load (like in feed)
 	}
 
 	// Placeholder dimensions
-	if (fileInfo.file?.metadata_read) {
-		if (!imageElement.displayData) {
-			imageElement.displayData = {};
-		}
-		imageElement.displayData.FileDimensions = fileInfo.file.dimensions;
+	if (bHasLazyDimensions) {
+		// Hold a square until the tile comes into view and its dimensions are loaded, then load it like a fully listed tile
+		imageElement.style.aspectRatio = 1;
+		img.onObserverIntersect = async function () {
+			img.onObserverIntersect = undefined; // Later intersections load it the usual way
+
+			const record = await utilitiesInstance.loadItemRecord(
+				fileInfo.type, fileInfo.filename, fileInfo.subdirectory || "", LAZY_LISTING_FIELDS);
+			Object.assign(fileInfo.file, { metadata_read: false }, record && Object.fromEntries(LAZY_LISTING_FIELDS.map((field) => [field, record[field]])));
+
+			setPreviewHrefs(fileInfo, href, bIsVideoFormat);
+			img.dataSrc = fileInfo.thumbnailHref || href;
+			if (!setListedDimensions(imageElement)) {
+				imageElement.style.aspectRatio = "";
+			}
+			imageElement.displayData = utilitiesInstance.sortJsonObjectByKeys(imageElement.displayData);
 
-		imageElement.displayData.AspectRatio = imageElement.displayData.FileDimensions[0] / imageElement.displayData.FileDimensions[1];
-		imageElement.style.aspectRatio = imageElement.displayData.AspectRatio;
-	} else {
+			img.forceLoad();
+		};
+	} else if (!setListedDimensions(imageElement)) {
 		// If we can't properly placehold, load the whole image now instead of later
 		imageElement.forceLoad();
 	}
@@ -185,33 +311,15 @@ export async function createImageElementFromFileInfo(fileInfo, imageDrawerInstan
 	imageElement.path = fileInfo.subdirectory ? `${fileInfo.subdirectory}/${fileInfo.filename}` : fileInfo.filename;
 	imageElement.displayData.FileSize = fileInfo.file?.file_size || -1;
 
-	if (fileInfo?.file?.duration_in_seconds && fileInfo.file.duration_in_seconds > 0) {
-		imageElement.displayData.DurationInSeconds = fileInfo.file.duration_in_seconds;
-	}
-	if (fileInfo?.file?.fps && fileInfo.file.fps > 0) {
-		imageElement.displayData.FramesPerSecond = fileInfo.file.fps;
-	}
-	if (fileInfo?.file?.frame_count && fileInfo.file.frame_count > 0) {
-		imageElement.displayData.FrameCount = fileInfo.file.frame_count;
-	}
-
 	imageElement.displayData = utilitiesInstance.sortJsonObjectByKeys(imageElement.displayData);
 
 	imageElement.searchTerms = `${imageElement.filename} ${imageElement.subdirectory} ${JSON.stringify(imageElement.displayData)} `; // Search terms to start with, onload will add more
 
-	// Add meta keys as well, except workflow and prompt from comfy
-	if (fileInfo.file?.hasOwnProperty("metadata")) {
-		for (const key of Object.keys(fileInfo.file.metadata)) {
-
-			if (key == "prompt" || key == "workflow") {
-				continue;
-			}
-			imageElement.searchTerms += fileInfo.file.metadata[key];
-		}
-	}
-
 	imageElement.searchTerms = imageElement.searchTerms.toLowerCase().trim();
 
+	// Listings may leave metadata out, in which case the context loads it when it's needed for search
+	appendListedMetadataToSearchTerms(imageElement, fileInfo.file?.metadata);
+
 	imageElement.getSearchTerms = function() { return imageElement.searchTerms; }
 
 	// Mouse Events
@@ -597,20 +597,20 @@ async function isValidPngFile(file) {
     return header.length >= 8 && pngSignature.every((byte, i) => header[i] === byte);
 }
 
-export async function getMetaData(file, format) {
+function appendA111Metadata(metadata) {
 
-    let metadata = null;
+    if (metadata && "parameters" in metadata) {
 
-    function appendA111Metadata(metadata) {
+        const a111Metadata = makeMetaDataFromA111(metadata.parameters);
+        metadata = { ...metadata, ...a111Metadata }; // Append a111 meta
+    }
 
-        if (metadata && "parameters" in metadata) {
+    return metadata;
+}
 
-            const a111Metadata = makeMetaDataFromA111(metadata.parameters);
-            metadata = { ...metadata, ...a111Metadata }; // Append a111 meta
-        }
+export async function getMetaData(file, format) {
 
-        return metadata;
-    }
+    let metadata = null;
     
     try {
         if (format === "image/png" && await isValidPngFile(file)) {
@@ -657,6 +657,23 @@ export async function onLoadImageElement(imageElement) {
             return;
         }
 
+        // Thumbnails don't carry the original's metadata, and downloading the original for it would undo
+        // their savings, so use the metadata the server extracted instead
+        if (imageElement.fileInfo.thumbnailHref) {
+            let metadata = imageElement.fileInfo.file?.metadata;
+            if (metadata === undefined) {
+                metadata = await utilitiesInstance.loadItemMetadata(
+                    imageElement.fileInfo.type, imageElement.fileInfo.filename, imageElement.fileInfo.subdirectory || "");
+                imageElement.fileInfo.file.metadata = metadata; // Spares the context loading it again for search
+            }
+            imageElement.metadata = appendA111Metadata(metadata);
+
+            setMetadataAndUpdateTooltipAndSearchTerms(imageElement, imageElement.metadata);
+
+            imageElement.bComplete = true;
+            return;
+        }
+
         const response = await fetch(imageElement.fileInfo.imageHref);
         const blob = await response.blob();
 
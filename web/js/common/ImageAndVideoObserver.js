@@ -113,11 +113,15 @@ const imageAndVideoObserver = new IntersectionObserver((entries) => {
 
         } else {
 
-            if (!bIsUnloadEnabled) {return;}
-            // Not visible — schedule unload
+            // Elements handling this themselves are told even when unloading is off, e.g. to stop a thumbnail download
             if (element.onObserverUnintersect) {
                 element.onObserverUnintersect();
-            } else if (element.tagName === 'VIDEO') {
+                return;
+            }
+
+            if (!bIsUnloadEnabled) {return;}
+            // Not visible — schedule unload
+            if (element.tagName === 'VIDEO') {
                 // Debounce unloading to prevent flicker when DOM changes
                 const timeout = setTimeout(() => {
                     tryStopVideo(element);
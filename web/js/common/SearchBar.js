@@ -250,6 +250,11 @@ export class SearchBar {
 		}
 	}
 
+	// Whether a child element passes the search. Override to match elements by more than their search terms.
+	_matchesElement(element, itemText, parsed) {
+		return this._matchesSearch(itemText, parsed);
+	}
+
 	// Function to execute search with an explicit searchTerm
 	_executeSearch(searchTerm) {
 
@@ -274,7 +279,7 @@ export class SearchBar {
 				let bDoesItemTextIncludeSearchTerm = false;
 				if (bShouldEvaluateSearch) {
 
-					bDoesItemTextIncludeSearchTerm = this._matchesSearch(itemsSearchTerms, parsedSearch);
+					bDoesItemTextIncludeSearchTerm = this._matchesElement(children[i], itemsSearchTerms, parsedSearch);
 				}
 
 				// If we don't want to evaluate search, just return true
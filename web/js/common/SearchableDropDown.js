@@ -91,8 +91,10 @@ export class SearchableDropDown {
      * @param {string} optionName - The display text of the option.
      * @param {string} [optionTooltip=""] - Optional tooltip for the option.
      * @param {string} [optionValue=""] - Optional value associated with the option.
+     * @param {string} [optionDetail=""] - Optional secondary text shown beside the option, such as a count.
+     *     It is not part of the option's name, so it doesn't affect selection or searching.
      */
-    addOption(optionName, optionValue, optionTooltip = "") {
+    addOption(optionName, optionValue, optionTooltip = "", optionDetail = "") {
 
         if (!this._labelPanel) { return; }
 
@@ -100,6 +102,9 @@ export class SearchableDropDown {
         option.textContent = optionName;
         option.value = optionValue;
         option.title = optionTooltip || optionName;
+        if (optionDetail) {
+            option.dataset.detail = optionDetail;
+        }
         option.addEventListener("click", () => {
             const bInvokeCallbacks = true;
             this._selectOption(optionName, bInvokeCallbacks);
@@ -118,11 +123,12 @@ export class SearchableDropDown {
      * @param {string} optionName - The display text of the option.
      * @param {string} [optionTooltip=""] - Optional tooltip for the option.
      * @param {string} [optionValue=""] - Optional value associated with the option.
+     * @param {string} [optionDetail=""] - Optional secondary text shown beside the option, such as a count.
      */
-    addOptionUnique(optionName, optionValue, optionTooltip = "") {
+    addOptionUnique(optionName, optionValue, optionTooltip = "", optionDetail = "") {
 
         if (!this.hasOption(optionName)) {
-            this.addOption(optionName, optionValue, optionTooltip);
+            this.addOption(optionName, optionValue, optionTooltip, optionDetail);
         }
     }
 
@@ -548,6 +554,13 @@ export class SearchableDropDown {
 		            border-radius: 5px;
                 }
                 
+                .option-panel label[data-detail]::after {
+                    content: attr(data-detail);
+                    float: right;
+                    margin-left: 1em;
+                    opacity: 0.6;
+                }
+                
                 .option-panel label:hover {
                     background-color: lightgreen;
                 }
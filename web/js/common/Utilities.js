@@ -509,12 +509,6 @@ class JNodesUtilities {
 				.replace(/\\r/g, '\r');
 	}
 
-	sanitizeMetadataForJson(metadata) {
-		metadata = metadata.replace(/NaN/g, "0");
-
-		return metadata;
-	}
-
 	autoResizeTextArea(element, maxHeight = 300) {
 
 		if (!element) { return; }
@@ -782,6 +776,165 @@ class JNodesUtilities {
 		}
 	}
 
+	// An id for a long-running backend request, passed as "job_id" so that request alone can be cancelled later.
+	// crypto.randomUUID isn't available outside of secure contexts, e.g. when ComfyUI is opened by LAN IP over http.
+	createJobId() {
+		return `${Date.now().toString(36)}-${Math.random().toString(36).substring(2, 12)}`;
+	}
+
+	async requestJobCancellation(jobId) {
+		await api.fetchApi('/jnodes_request_task_cancellation', {
+			method: "POST",
+			headers: { 'Content-Type': 'application/json' },
+			body: JSON.stringify({ job_id: jobId })
+		});
+	}
+
+	// Describe a "jnodes.job.progress" event, e.g. "120 / 800 files, about 6s left"
+	formatJobProgress(progress) {
+		let text = `${progress.files_processed} / ${progress.files_seen} files`;
+		if (progress.eta_seconds != null && progress.files_processed < progress.files_seen) {
+			text += `, about ${Math.ceil(progress.eta_seconds)}s left`;
+		}
+		return text;
+	}
+
+	// Get records for specific listed files ({ item, subdirectory } relative to rootDirectory), e.g. metadata left out of a listing.
+	// Returns one record per item, in order, or null for files that no longer exist.
+	// Workflows and prompts shared by several of the files are sent once and shared between their records.
+	async fetchItemMetadata(rootDirectory, items, fields = undefined) {
+		const maxItemsPerRequest = 1000;
+		const bIncludesMetadata = !fields || fields.includes("metadata");
+		let records = [];
+
+		for (let start = 0; start < items.length; start += maxItemsPerRequest) {
+			const response = await api.fetchApi(`/jnodes_get_item_metadata?dedupe_metadata=${bIncludesMetadata}`, {
+				method: "POST",
+				headers: { 'Content-Type': 'application/json' },
+				body: JSON.stringify({ root_directory: rootDirectory, items: items.slice(start, start + maxItemsPerRequest), fields: fields })
+			});
+
+			const asJson = JSON.parse(await this.decodeReadableStream(response.body));
+			if (!asJson.success) {
+				throw new Error(asJson.error);
+			}
+
+			if (asJson.metadata_blobs) {
+				const metadataBlobs = new Map(Object.entries(asJson.metadata_blobs));
+				for (const record of asJson.payload) {
+					this.resolveMetadataBlobs(record?.metadata, metadataBlobs);
+				}
+			}
+			records = records.concat(asJson.payload);
+		}
+
+		return records;
+	}
+
+	// Put back metadata values a response sent once by hash ({"jnodes_metadata_blob": hash}) from a Map of hash -> value.
+	// Every record sharing a blob ends up referencing the same string rather than a copy of it.
+	resolveMetadataBlobs(metadata, metadataBlobs) {
+		if (!metadata || typeof metadata !== 'object') { return metadata; }
+
+		for (const key of Object.keys(metadata)) {
+			const value = metadata[key];
+			if (!value || typeof value !== 'object') { continue; }
+
+			const blobHash = value.jnodes_metadata_blob;
+			if (blobHash !== undefined) {
+				if (metadataBlobs.has(blobHash)) {
+					metadata[key] = metadataBlobs.get(blobHash);
+				}
+			} else {
+				this.resolveMetadataBlobs(value, metadataBlobs);
+			}
+		}
+
+		return metadata;
+	}
+
+	// Get one listed file's record with the given fields. Requests for the same fields made within a short window are sent
+	// together as one fetchItemMetadata call, so elements loading as the drawer scrolls don't each make a request.
+	// Resolves with null if the file no longer exists or the record couldn't be loaded.
+	loadItemRecord(rootDirectory, item, subdirectory, fields) {
+		const batchDelayMs = 50;
+
+		if (!this._pendingItemRecordRequests) {
+			this._pendingItemRecordRequests = new Map(); // rootDirectory and fields -> [{ item, subdirectory, resolve }]
+		}
+
+		return new Promise((resolve) => {
+			const batchKey = JSON.stringify([rootDirectory, fields]);
+			let pending = this._pendingItemRecordRequests.get(batchKey);
+			if (!pending) {
+				pending = [];
+				this._pendingItemRecordRequests.set(batchKey, pending);
+
+				setTimeout(async () => {
+					this._pendingItemRecordRequests.delete(batchKey);
+					try {
+						const records = await this.fetchItemMetadata(
+							rootDirectory, pending.map((request) => ({ item: request.item, subdirectory: request.subdirectory })), fields);
+						pending.forEach((request, index) => request.resolve(records[index] || null));
+					} catch (e) {
+						console.error(`Could not load ${fields.join(", ")} in "${rootDirectory}": ${e}`);
+						pending.forEach((request) => request.resolve(null));
+					}
+				}, batchDelayMs);
+			}
+			pending.push({ item: item, subdirectory: subdirectory, resolve: resolve });
+		});
+	}
+
+	// Get one listed file's metadata, batched like loadItemRecord
+	async loadItemMetadata(rootDirectory, item, subdirectory) {
+		const record = await this.loadItemRecord(rootDirectory, item, subdirectory, ["metadata"]);
+		return record?.metadata || {};
+	}
+
+	// Which of the server's preview qualities ("small", "medium" or "large") suits this connection
+	getPreviewQuality() {
+		const connection = navigator.connection;
+		if (connection?.saveData || ["slow-2g", "2g", "3g"].includes(connection?.effectiveType)) {
+			return "small";
+		}
+		return "medium";
+	}
+
+	// Yields one parsed object per line of a newline-delimited JSON stream as soon as each line arrives
+	async *readNdjsonStream(readableStream) {
+		const reader = readableStream.getReader();
+		const decoder = new TextDecoder();
+		let buffered = "";
+
+		while (true) {
+			const { done, value } = await reader.read();
+
+			if (value) {
+				buffered += decoder.decode(value, { stream: !done });
+			} else if (done) {
+				buffered += decoder.decode();
+			}
+
+			let newlineIndex;
+			while ((newlineIndex = buffered.indexOf("\n")) > -1) {
+				const line = buffered.slice(0, newlineIndex).trim();
+				buffered = buffered.slice(newlineIndex + 1);
+				if (line) {
+					yield JSON.parse(line);
+				}
+			}
+
+			if (done) {
+				break;
+			}
+		}
+
+		if (buffered.trim()) {
+			yield JSON.parse(buffered.trim());
+		}
+	}
+
 	async decodeReadableStream(readableStream) {
 		const reader = readableStream.getReader();
 		const chunks = [];
@@ -1,7 +1,7 @@
 import { setVideoPlaybackRate, setVideoVolume } from "./VideoControl.js";
 
 export class options_VideoPlayback { 
-    autoplay = false; loop = true; controls = true; muted = true; solo = false; useWheelSeek = false; invertWheelSeek = true; defaultVolume = 50; defaultPlaybackRate = 1.00;
+    autoplay = false; loop = true; controls = true; muted = true; solo = false; useWheelSeek = false; invertWheelSeek = true; defaultVolume = 50; defaultPlaybackRate = 1.00; lowResolutionPreviews = true;
 }; 
 
 export class info_VideoPlaybackOptions {
@@ -16,6 +16,8 @@ export class info_VideoPlaybackOptions {
         forEachElement: forEachElement_genericPropagatation, widgetType: 'checkbox' };
     defaultVolume = { tooltip: 'The default volume at which videos should play if not muted', forEachElement: forEachElement_Volume, widgetType: 'range' };
     defaultPlaybackRate = { tooltip: 'The default rate at which videos should play', forEachElement: forEachElement_playbackRate, widgetType: 'number', min: 0.01, max: 100.00, step: 0.01 };
+    lowResolutionPreviews = { tooltip: 'Should videos in the drawer show a poster frame and play a short, low resolution preview made by the server (requires ffmpeg)? The original is loaded when a video is opened. Applies to videos listed after the change.', 
+        widgetType: 'checkbox' };
 };
 
 function forEachElement_Autoplay(element, propertyName, propertyValue) {